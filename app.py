@@ -4,7 +4,7 @@ from fastapi import FastAPI, Request, HTTPException, UploadFile, File, Form
 from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict, Tuple, Optional, Union, Any
+from typing import List, Dict, Tuple, Optional, Union, Any, Callable
 import google.generativeai as genai
 import os
 from dotenv import load_dotenv
@@ -12,13 +12,13 @@ import base64
 from PIL import Image
 import io
 import requests
-from bs4 import BeautifulSoup, SoupStrainer
+from bs4 import BeautifulSoup
 import re
 import random
 import logging
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type, before_sleep_log
 import time
-from urllib.parse import urlparse, urljoin, quote_plus, unquote
+from urllib.parse import urlparse, urljoin, quote_plus
 import json
 from io import BytesIO
 from reportlab.lib.pagesizes import letter, A4
@@ -31,11 +31,34 @@ import csv
 from datetime import date, datetime
 import math
 import concurrent.futures
-import brotli
+import threading
 from pdfminer.high_level import extract_text as pdf_extract_text
 import docx2txt
-import chardet
 import asyncio
+import http_pool
+import cassette
+import context_packer
+import map_reduce
+import rate_limiter
+import token_counter
+import sse
+from page_cache import PageCache, canonical_url
+from memory_cache import MemoryCache
+from search_cache import SearchCache, normalize_query
+from llm_cache import LLMCache
+import page_download
+import extraction
+import charset_detection
+import politeness
+import bm25
+import executors
+import job_relevance
+import search_engines
+import url_ranking
+from dedup import PageDeduplicator
+from engine_health import EngineHealth
+from search_coordinator import SearchCoordinator
+from single_flight import SingleFlight
 
 
 load_dotenv()
@@ -54,13 +77,55 @@ app.add_middleware(
 
 templates = Jinja2Templates(directory="templates")
 
+@app.on_event("startup")
+def purge_page_cache():
+    removed = page_cache.purge_expired()
+    if removed:
+        logging.info(f"Purged {removed} expired page cache entries")
+
+@app.on_event("startup")
+def purge_search_cache():
+    removed = search_cache.purge_expired()
+    if removed:
+        logging.info(f"Purged {removed} expired search cache entries")
+
+@app.on_event("startup")
+def purge_llm_cache():
+    removed = llm_cache.purge_expired()
+    if removed:
+        logging.info(f"Purged {removed} expired LLM cache entries")
+
+@app.on_event("startup")
+def start_executors():
+    executors.configure(io_workers=config.IO_WORKERS, cpu_workers=config.CPU_WORKERS)
+    executors.io_executor()
+    executors.cpu_executor()
+
+@app.on_event("shutdown")
+def close_http_pool():
+    http_pool.close_session()
+
+@app.on_event("shutdown")
+def stop_executors():
+    executors.shutdown(wait=False)
+
 class Config:
     API_KEY = os.getenv("GEMINI_API_KEY")
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
     SNIPPET_LENGTH = 5000
     DEEP_RESEARCH_SNIPPET_LENGTH = 10000
-    MAX_TOKENS_PER_CHUNK = 25000
+    MAX_TOKENS_PER_CHUNK = 25000  # Whole summary prompt, counted with token_counter
+    # Summaries are merged (map_reduce.py) until they fit here, so the report prompt has a fixed size
+    DEEP_RESEARCH_REPORT_TOKENS = int(os.getenv("DEEP_RESEARCH_REPORT_TOKENS", 16000))
+    DEEP_RESEARCH_REDUCE_FAN_IN = int(os.getenv("DEEP_RESEARCH_REDUCE_FAN_IN", 4))  # Summaries per merge call
+    # BM25 pre-filters (bm25.py): share of the best score an item needs to reach the LLM
+    SNIPPET_MIN_RELEVANCE = float(os.getenv("SNIPPET_MIN_RELEVANCE", 0.1))
     REQUEST_TIMEOUT = 60
+    MAX_PAGE_BYTES = int(os.getenv("MAX_PAGE_BYTES", page_download.DEFAULT_MAX_BYTES))  # Body download ceiling
+    HOST_MAX_CONCURRENCY = int(os.getenv("HOST_MAX_CONCURRENCY", 2))  # In-flight requests per host
+    HOST_MIN_INTERVAL = float(os.getenv("HOST_MIN_INTERVAL", 1.0))  # Seconds between request starts per host
+    HOST_MAX_WAIT = 15  # Skip a host rather than wait longer than this for it
+    RESPECT_ROBOTS_TXT = os.getenv("RESPECT_ROBOTS_TXT", "true").lower() != "false"
     USER_AGENTS = [
         'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
         'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Safari/605.1.15',
@@ -74,15 +139,33 @@ class Config:
         'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:90.0) Gecko/20100101 Firefox/90.0'
     ]
     SEARCH_ENGINES = ["google", "duckduckgo", "bing", "yahoo", "brave", "linkedin"]
+    FETCH_TOP_K = int(os.getenv("FETCH_TOP_K", 10))  # Pages downloaded per online search (see url_ranking.py)
+    DEEP_RESEARCH_TOP_K = int(os.getenv("DEEP_RESEARCH_TOP_K", 12))  # Pages downloaded per deep research iteration
+    SEARCH_TARGET_URLS = 20  # Stop waiting for engines once this many unique URLs are collected
+    SEARCH_LATENCY_BUDGET = float(os.getenv("SEARCH_LATENCY_BUDGET", 8))  # Seconds for all engines together
+    ENGINE_LATENCY_BUDGETS = {"google": 6, "bing": 6, "duckduckgo": 6, "yahoo": 5, "brave": 5, "linkedin": 4}
     JOB_SEARCH_ENGINES = ["linkedin", "indeed", "glassdoor"]
-    MAX_WORKERS = 10
+    IO_WORKERS = int(os.getenv("IO_WORKERS", executors.DEFAULT_IO_WORKERS))  # Shared pool for network-bound work
+    CPU_WORKERS = int(os.getenv("CPU_WORKERS", executors.DEFAULT_CPU_WORKERS))  # Shared pool for parsing/report work
     CACHE_ENABLED = True
-    CACHE = {}
-    CACHE_TIMEOUT = 300
+    CACHE_PATH = os.getenv("PAGE_CACHE_PATH", "page_cache.db")
+    CACHE_TIMEOUT = 300  # Seconds before a cached page is revalidated
+    MEMORY_CACHE_MAX_BYTES = int(os.getenv("MEMORY_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    MEMORY_CACHE_POLICY = os.getenv("MEMORY_CACHE_POLICY", "lru")  # "lru" or "lfu"
+    MEMORY_CACHE_SWEEP_INTERVAL = 60
+    SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", "search_cache.db")  # Per-engine TTLs live in search_cache.py
+    RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", "rate_limits.db")  # LLM quota state, shared by all workers
+    LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+    LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 24 * 3600))
+    LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 64 * 1024 * 1024))
     INDEED_BASE_DELAY = 2
     INDEED_MAX_DELAY = 10
     INDEED_RETRIES = 5
     JOB_RELEVANCE_MODEL = os.getenv("JOB_RELEVANCE_MODEL", "gemini-2.0-flash")
+    JOB_RELEVANCE_BATCH_TOKENS = int(os.getenv("JOB_RELEVANCE_BATCH_TOKENS", 12000))  # Whole batch prompt
+    JOB_RELEVANCE_MAX_BATCH = int(os.getenv("JOB_RELEVANCE_MAX_BATCH", 10))  # Jobs per relevance call
+    JOB_RELEVANCE_TOP_N = int(os.getenv("JOB_RELEVANCE_TOP_N", 40))  # Best BM25 matches to the resume sent to the LLM
+    JOB_RELEVANCE_MIN_RATIO = float(os.getenv("JOB_RELEVANCE_MIN_RATIO", 0.2))
     # REMOVED PDF PAGE LIMIT
 
     # ---  Prompts:  More Modular and Specific ---
@@ -115,6 +198,11 @@ class Config:
         "Focus on the main topic and avoid discussing the research process itself.\n\nContent Snippets:"
     )
 
+    DEEP_RESEARCH_REDUCE_PROMPT = (
+        "Merge these research summaries on: '{query}' into one concise summary. "
+        "Keep every distinct fact, figure, name and source; drop repetition and anything off-topic.\n\nSummaries:"
+    )
+
     DEEP_RESEARCH_REPORT_PROMPT = (
         "DEEP RESEARCH REPORT: Synthesize a comprehensive report from web research on: '{search_query}'.\n\n"
         "{report_structure}\n\n"
@@ -123,6 +211,25 @@ class Config:
     )
 
 config = Config()
+page_cache = PageCache(config.CACHE_PATH, ttl=config.CACHE_TIMEOUT,
+                       memory=MemoryCache(max_bytes=config.MEMORY_CACHE_MAX_BYTES, ttl=config.CACHE_TIMEOUT,
+                                          policy=config.MEMORY_CACHE_POLICY,
+                                          sweep_interval=config.MEMORY_CACHE_SWEEP_INTERVAL))
+host_scheduler = politeness.PolitenessScheduler(
+    max_per_host=config.HOST_MAX_CONCURRENCY, min_interval=config.HOST_MIN_INTERVAL, max_wait=config.HOST_MAX_WAIT,
+    robots_fetcher=lambda robots_url: http_pool.get_session().get(robots_url, timeout=politeness.ROBOTS_TIMEOUT))
+for _engine in search_engines.ENGINES.values():
+    if _engine.min_interval:
+        host_scheduler.set_min_interval(_engine.host, _engine.min_interval)  # Per-engine rate limits
+search_cache = SearchCache(config.SEARCH_CACHE_PATH)
+llm_cache = LLMCache(config.LLM_CACHE_PATH, ttl=config.LLM_CACHE_TTL, max_bytes=config.LLM_CACHE_MAX_BYTES)
+search_coordinator = SearchCoordinator(executors.io_executor, target_urls=config.SEARCH_TARGET_URLS,
+                                       budget=config.SEARCH_LATENCY_BUDGET,
+                                       engine_budgets=config.ENGINE_LATENCY_BUDGETS)
+engine_health = EngineHealth("search_engines")
+job_site_health = EngineHealth("job_sites")
+page_fetches = SingleFlight()  # Keyed by canonical URL
+search_flights = SingleFlight()  # Keyed by (engine, query)
 
 # --- Logging Configuration ---
 logging.basicConfig(level=config.LOG_LEVEL, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -134,23 +241,24 @@ if not config.API_KEY:
     exit(1)
 
 conversation_history = []
-deep_research_rate_limits = {
-    "gemini-2.0-flash": {"requests_per_minute": 15, "last_request": 0},
-    "gemini-2.0-flash-thinking-exp-01-21": {"requests_per_minute": 10, "last_request": 0}
+deep_research_rate_limits = {  # max_concurrent: chunk summaries in flight at once (process_in_chunks)
+    "gemini-2.0-flash": {"requests_per_minute": 15, "tokens_per_minute": 1_000_000, "max_concurrent": 4},
+    "gemini-2.0-flash-thinking-exp-01-21": {"requests_per_minute": 10, "tokens_per_minute": 4_000_000,
+                                            "max_concurrent": 2},
 }
 DEFAULT_DEEP_RESEARCH_MODEL = "gemini-2.0-flash"
-
-def rate_limit_model(model_name):
-    if model_name in deep_research_rate_limits:
-        rate_limit_data = deep_research_rate_limits[model_name]
-        now = time.time()
-        time_since_last_request = now - rate_limit_data["last_request"]
-        requests_per_minute = rate_limit_data["requests_per_minute"]
-        wait_time = max(0, 60 / requests_per_minute - time_since_last_request)
-        if wait_time > 0:
-            logging.info(f"Rate limiting {model_name}, waiting for {wait_time:.2f} seconds")
-            time.sleep(wait_time)
-        rate_limit_data["last_request"] = time.time()
+ONLINE_MODEL = "gemini-2.0-flash"
+DEFAULT_SUMMARY_CONCURRENCY = 2
+llm_limiter = rate_limiter.TokenBucketLimiter(deep_research_rate_limits, path=config.RATE_LIMIT_PATH)
+summary_slots = {model: threading.BoundedSemaphore(limits["max_concurrent"])
+                 for model, limits in deep_research_rate_limits.items()}
+
+def _gemini_text(response, model_name: str, prompt: str, estimated_tokens: int) -> str:
+    """Returns the response text, correcting the model's token bucket and token count with the real usage."""
+    usage = getattr(response, "usage_metadata", None)
+    llm_limiter.record_usage(model_name, estimated_tokens, getattr(usage, "total_token_count", None) or None)
+    token_counter.observe(model_name, prompt, getattr(usage, "prompt_token_count", None))
+    return response.text
 
 _user_agents = config.USER_AGENTS
 
@@ -173,13 +281,39 @@ def process_base64_image(base64_string):
         logging.error(f"Error processing image: {e}")
         return None
 
+def polite_get(url: str, respect_robots: bool = False, engine: Optional[str] = None,
+               health: Optional[EngineHealth] = None, **kwargs) -> requests.Response:
+    """
+    GETs a URL through the shared pool while holding a per-host politeness slot.
+    When ``engine`` is given, the outcome is recorded in its circuit (``health``, default engine_health).
+    """
+    health = health or engine_health
+    try:
+        if respect_robots and config.RESPECT_ROBOTS_TXT and not host_scheduler.can_fetch(url):
+            raise politeness.HostBackoff(f"robots.txt disallows {url}")
+        with host_scheduler.slot(url):
+            try:
+                response = http_pool.get_session().get(url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                if engine:
+                    health.record_failure(engine, type(e).__name__)
+                raise
+    except politeness.HostBackoff:
+        if engine:
+            health.release_probe(engine)  # Our own backoff, not an engine error; a half-open probe is handed back
+        raise
+    host_scheduler.record_response(url, response)
+    if engine:
+        health.record_response(engine, response)
+    return response
+
 def get_shortened_url(url):
     try:
         parsed_url = urlparse(url)
         if not parsed_url.scheme:
             url = "http://" + url  # Add scheme if missing
         tinyurl_api = f"https://tinyurl.com/api-create.php?url={quote_plus(url)}"
-        response = requests.get(tinyurl_api, timeout=5)
+        response = http_pool.get_session().get(tinyurl_api, timeout=5)
         response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
         return response.text
     except requests.exceptions.RequestException as e:
@@ -189,276 +323,134 @@ def get_shortened_url(url):
         logging.error(f"Unexpected error shortening URL '{url}': {e}")
         return url
 
-def fix_url(url):
-    try:
-        parsed = urlparse(url)
-        if not parsed.scheme:
-            url = "https://" + url
-            parsed = urlparse(url)  # Re-parse with scheme
-        if not parsed.netloc:
-            return None  # Invalid URL
-        return url.split("?")[0] # Removes parameters
-    except Exception:
-        return None
-
 def scrape_search_engine(search_query: str, engine_name: str) -> List[str]:
     """Scrapes search results from specified search engine."""
-    if engine_name == "google":
-        return scrape_google(search_query)
-    elif engine_name == "duckduckgo":
-        return scrape_duckduckgo(search_query)
-    elif engine_name == "bing":
-        return scrape_bing(search_query)
-    elif engine_name == "yahoo":
-        return scrape_yahoo(search_query)
-    elif engine_name == "brave":
-        return scrape_brave(search_query)
-    elif engine_name == "linkedin":
-        return scrape_linkedin(search_query)
-    else:
-        logging.warning(f"Unknown search engine: {engine_name}")
+    if config.CACHE_ENABLED:
+        cached = search_cache.get(engine_name, search_query)
+        if cached is not None:
+            logging.info(f"Using cached {engine_name} results for: {search_query}")
+            return cached
+    if not engine_health.allow(engine_name):
+        logging.info(f"Skipping {engine_name}: circuit open after recent failures")
         return []
+    # Identical searches already in flight are joined rather than repeated
+    return list(search_flights.do((engine_name, normalize_query(search_query)), _search_and_cache,
+                                  search_query, engine_name))
 
-def scrape_google(search_query: str) -> List[str]:
-    """Scrapes Google search results."""
-    search_results = []
-    google_url = f"https://www.google.com/search?q={quote_plus(search_query)}&num=20"
-    try:
-        headers = {'User-Agent': get_random_user_agent()}
-        response = requests.get(google_url, headers=headers, timeout=config.REQUEST_TIMEOUT)
-        response.raise_for_status()
-        logging.info(f"Google Status Code: {response.status_code} for query: {search_query}")
-        if response.status_code == 200:
-            only_results = SoupStrainer('div', class_='tF2Cxc')
-            google_soup = BeautifulSoup(response.text, 'html.parser', parse_only=only_results)
-            for result in google_soup.find_all('div', class_='tF2Cxc'):
-                link = result.find('a', href=True)
-                if link:
-                    href = link['href']
-                    fixed_url = fix_url(href)
-                    if fixed_url:
-                        search_results.append(fixed_url)
-        elif response.status_code == 429:
-            logging.warning("Google rate limit hit (429).")
-        else:
-            logging.warning(f"Google search failed with status code: {response.status_code}")
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error scraping Google: {e}")
-    return list(set(search_results))  # Remove duplicates
-
-def scrape_duckduckgo(search_query: str) -> List[str]:
-    """Scrapes DuckDuckGo search results."""
-    search_results = []
-    duck_url = f"https://html.duckduckgo.com/html/?q={quote_plus(search_query)}"
-    try:
-        response = requests.get(duck_url, headers={'User-Agent': get_random_user_agent()}, timeout=config.REQUEST_TIMEOUT)
-        response.raise_for_status()
-        logging.info(f"DuckDuckGo Status Code: {response.status_code}")
-        if response.status_code == 200:
-            only_results = SoupStrainer('a', class_='result__a')
-            duck_soup = BeautifulSoup(response.text, 'html.parser', parse_only=only_results)
-            for a_tag in duck_soup.find_all('a', class_='result__a', href=True):
-                href = a_tag['href']
-                fixed_url = fix_url(urljoin("https://html.duckduckgo.com/", href)) # Make absolute
-                if fixed_url: search_results.append(fixed_url)
-    except Exception as e:
-        logging.error(f"Error scraping DuckDuckGo: {e}")
-    return list(set(search_results))
-
-def scrape_bing(search_query: str) -> List[str]:
-    """Scrapes Bing search results."""
-    search_results = []
-    bing_url = f"https://www.bing.com/search?q={quote_plus(search_query)}"
-    try:
-        response = requests.get(bing_url, headers={'User-Agent': get_random_user_agent()}, timeout=config.REQUEST_TIMEOUT)
-        response.raise_for_status()
-        logging.info(f"Bing Status Code: {response.status_code}")
-        if response.status_code == 200:
-            only_results = SoupStrainer('li', class_='b_algo')
-            bing_soup = BeautifulSoup(response.text, 'html.parser', parse_only=only_results)
-            for li in bing_soup.find_all('li', class_='b_algo'):
-                for a_tag in li.find_all('a', href=True):
-                    href = a_tag['href']
-                    fixed_url = fix_url(href) # Fix the URL
-                    if fixed_url: search_results.append(fixed_url)
-    except Exception as e:
-        logging.error(f"Error scraping Bing: {e}")
-    return list(set(search_results))
-
-def scrape_yahoo(search_query: str) -> List[str]:
-    """Scrapes Yahoo search results."""
-    search_results = []
-    yahoo_url = f"https://search.yahoo.com/search?p={quote_plus(search_query)}"
-    try:
-        response = requests.get(yahoo_url, headers={'User-Agent': get_random_user_agent()}, timeout=config.REQUEST_TIMEOUT)
-        response.raise_for_status()
-        logging.info(f"Yahoo Status Code: {response.status_code}")
-        if response.status_code == 200:
-            only_dd_divs = SoupStrainer('div', class_=lambda x: x and x.startswith('dd'))
-            yahoo_soup = BeautifulSoup(response.text, 'html.parser', parse_only=only_dd_divs)
-            for div in yahoo_soup.find_all('div', class_=lambda x: x and x.startswith('dd')):
-                for a_tag in div.find_all('a', href=True):
-                    href = a_tag['href']
-                    match = re.search(r'/RU=(.*?)/RK=', href) # Yahoo uses a redirect
-                    if match:
-                        try:
-                            decoded_url = unquote(match.group(1))
-                            fixed_url = fix_url(decoded_url)  # Fix the URL
-                            if fixed_url: search_results.append(fixed_url)
-                        except:
-                            logging.warning(f"Error decoding Yahoo URL: {href}")
-                    elif href: # Sometimes the direct URL is present
-                         fixed_url = fix_url(href)
-                         if fixed_url: search_results.append(fixed_url)
-    except Exception as e:
-        logging.error(f"Error scraping Yahoo: {e}")
-    return list(set(search_results))
+def _search_and_cache(search_query: str, engine_name: str) -> List[str]:
+    results = _scrape_search_engine(search_query, engine_name)
+    if config.CACHE_ENABLED:
+        search_cache.put(engine_name, search_query, results)
+    return results
 
-def scrape_brave(search_query: str) -> List[str]:
-    """Scrapes Brave search results."""
-    search_results = []
-    brave_url = f"https://search.brave.com/search?q={quote_plus(search_query)}"
+def _scrape_search_engine(search_query: str, engine_name: str) -> List[str]:
+    """Fetches one engine's result page and parses it with the engine's plugin (see search_engines.py)."""
+    engine = search_engines.get_engine(engine_name)
+    if engine is None:
+        logging.warning(f"Unknown search engine: {engine_name}")
+        return []
     try:
-        response = requests.get(brave_url, headers={'User-Agent': get_random_user_agent()}, timeout=config.REQUEST_TIMEOUT)
+        response = polite_get(engine.build_url(search_query), engine=engine.name,
+                              headers={'User-Agent': get_random_user_agent()}, timeout=config.REQUEST_TIMEOUT)
         response.raise_for_status()
-        logging.info(f"Brave Status Code: {response.status_code}")
-
-        if response.status_code == 200:
-            if response.headers.get('Content-Encoding') == 'br':
-                try:
-                    content = brotli.decompress(response.content) # Decompress Brotli
-                    only_links = SoupStrainer('a', class_='result-title')
-                    brave_soup = BeautifulSoup(content, 'html.parser', parse_only=only_links)
-
-                except brotli.error as e:
-                    logging.error(f"Error decoding Brotli content: {e}")
-                    return []
-            else:
-                only_links = SoupStrainer('a', class_='result-title')
-                brave_soup = BeautifulSoup(response.text, 'html.parser', parse_only=only_links)
-
-            for a_tag in brave_soup.find_all('a', class_='result-title', href=True):
-                href = a_tag['href']
-                fixed_url = fix_url(href)  # Fix URL
-                if fixed_url:
-                    search_results.append(fixed_url)
-
-        elif response.status_code == 429:
-            logging.warning("Brave rate limit hit (429).")
-        else:
-            logging.warning(f"Brave search failed with status code: {response.status_code}")
-
+        logging.info(f"{engine.name} Status Code: {response.status_code} for query: {search_query}")
+        return engine.parse(response.text, search_query)
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Error scraping {engine.name}: {e}")
     except Exception as e:
-        logging.error(f"Error scraping Brave: {e}")
-    return list(set(search_results))
+        logging.error(f"Error parsing {engine.name} results: {e}")
+    return []
 
-def scrape_linkedin(search_query: str) -> List[str]:
-    """Scrapes LinkedIn search results (people primarily)."""
-    search_results = []
-    linkedin_url = f"https://www.linkedin.com/search/results/all/?keywords={quote_plus(search_query)}"
-    try:
-        response = requests.get(linkedin_url, headers={'User-Agent': get_random_user_agent()}, timeout=config.REQUEST_TIMEOUT)
-        response.raise_for_status()
-        logging.info(f"LinkedIn Status Code: {response.status_code}")
-        if response.status_code == 200:
-            only_results = SoupStrainer('div', class_='entity-result__item')
-            linkedin_soup = BeautifulSoup(response.text, 'html.parser', parse_only=only_results)
-            for result in linkedin_soup.find_all('div', class_='entity-result__item'):
-                try:
-                    link_tag = result.find('a', class_='app-aware-link')
-                    if not link_tag or not link_tag.get('href'):
-                        continue
-                    profile_url = fix_url(link_tag.get('href'))  # Fix the URL
-                    if not profile_url or '/in/' not in profile_url: # Check for profile
-                        continue
-                    #  check for company context
-                    if " at " in search_query.lower():
-                        context = search_query.lower().split(" at ")[1]  #  company name
-                        name = result.find('span', class_='entity-result__title-text')
-                        title_company = result.find('div', class_='entity-result__primary-subtitle')
-                        combined_text = ""
-                        if name:
-                            combined_text += name.get_text(strip=True).lower() + " "
-                        if title_company:
-                            combined_text += title_company.get_text(strip=True).lower()
-                        if context not in combined_text: # Check if the company matches
-                            continue
-
-                        search_results.append(profile_url)
-                except Exception as e:
-                    logging.warning(f"Error processing LinkedIn result: {e}")
-                    continue
-    except Exception as e:
-        logging.error(f"Error scraping LinkedIn: {e}")
-    return search_results  # No need to remove duplicates for LinkedIn
 
+def _decode_content(content: bytes, content_type: Optional[str] = None) -> str:
+    """Decodes response content: header charset, then <meta>, then statistical detection on a prefix."""
+    return charset_detection.decode_body(content, content_type)
 
-def _decode_content(response: requests.Response) -> str:
-    """Decodes response content, handling different encodings."""
-    detected_encoding = chardet.detect(response.content)['encoding']
-    if detected_encoding is None:
-        logging.warning(f"Chardet failed. Using UTF-8.")
-        detected_encoding = 'utf-8'
-    logging.debug(f"Detected encoding: {detected_encoding}")
-    try:
-        return response.content.decode(detected_encoding, errors='replace')
-    except UnicodeDecodeError:
-        logging.warning(f"Decoding failed with {detected_encoding}. Trying UTF-8.")
-        try: return response.content.decode('utf-8', errors='replace')
-        except:
-            logging.warning("Decoding failed. Using latin-1 (may cause data loss).")
-            return response.content.decode('latin-1', errors='replace')
+def _build_page_result(url: str, entry: Dict, snippet_length: int, extract_links: bool,
+                       extract_emails: bool, include_canonical: bool = False) -> Tuple[List[str], List[str], Dict[str, Any]]:
+    """Formats a cached/extracted page entry the way callers of fetch_page_content expect."""
+    snippet = entry['text'][:snippet_length]
+    title = entry['title'] or url
+    content_snippets = [f"### {title}\n\n{snippet}\n"]  # Keep ### for titles
+    extracted_data = {}
+    if extract_links:
+        extracted_data['links'] = list(entry['links'])
+    if extract_emails:
+        extracted_data['emails'] = list(entry['emails'])
+    if include_canonical:
+        extracted_data['canonical'] = entry.get('canonical')
+    return content_snippets, [url], extracted_data
 
 def fetch_page_content(url: str, snippet_length: Optional[int] = None,
-                      extract_links: bool = False, extract_emails: bool = False) -> Tuple[List[str], List[str], Dict[str, Any]]:
-    """Fetches content, handles caching, extracts data."""
+                      extract_links: bool = False, extract_emails: bool = False,
+                      include_canonical: bool = False) -> Tuple[List[str], List[str], Dict[str, Any]]:
+    """Fetches content, handles caching, extracts data (plus the page's canonical URL if requested)."""
     if snippet_length is None:
                 snippet_length = config.SNIPPET_LENGTH
-    content_snippets = []
-    references = []
-    extracted_data = {}
 
-    if config.CACHE_ENABLED:
-        if url in config.CACHE:
-            if time.time() - config.CACHE[url]['timestamp'] < config.CACHE_TIMEOUT:
-                logging.info(f"Using cached content for: {url}")
-                return config.CACHE[url]['content_snippets'], config.CACHE[url]['references'], config.CACHE[url]['extracted_data']
-            else:
-                logging.info(f"Cache expired for: {url}")
-                del config.CACHE[url]  # Remove expired entry
+    cached = page_cache.get(url) if config.CACHE_ENABLED else None
+    if cached and page_cache.is_fresh(cached):
+        logging.info(f"Using cached content for: {url}")
+        return _build_page_result(url, cached, snippet_length, extract_links, extract_emails, include_canonical)
+
+    if page_download.looks_binary_url(url):
+        logging.info(f"Skipping non-HTML resource: {url}")
+        return [], [], {}
+
+    # Concurrent requests for the same page share one download
+    entry = page_fetches.do(canonical_url(url), _download_page, url, cached)
+    if entry:
+        return _build_page_result(url, entry, snippet_length, extract_links, extract_emails, include_canonical)
+    return [], [], {}
 
+def _download_page(url: str, cached: Optional[Dict]) -> Optional[Dict]:
+    """Downloads and extracts a page (revalidating ``cached``), returning its cache entry or None."""
     try:
-        response = requests.get(url, headers={'User-Agent': get_random_user_agent()}, timeout=config.REQUEST_TIMEOUT)
-        response.raise_for_status() # Raise HTTPError for bad responses
-        logging.debug(f"Fetching page content status: {response.status_code} for: {url}")
+        headers = {'User-Agent': get_random_user_agent()}
+        headers.update(page_cache.conditional_headers(cached))  # Revalidate stale entries
+        if config.RESPECT_ROBOTS_TXT and not host_scheduler.can_fetch(url):
+            logging.info(f"robots.txt disallows: {url}")
+            return None
+        with host_scheduler.slot(url):  # Held until the body has been read
+            response = http_pool.get_session().get(url, headers=headers, timeout=config.REQUEST_TIMEOUT, stream=True)
+            host_scheduler.record_response(url, response)
+            with response:
+                if response.status_code == 304 and cached:
+                    logging.info(f"Cache revalidated (304) for: {url}")
+                    page_cache.touch(url, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                    return cached
+                response.raise_for_status() # Raise HTTPError for bad responses
+                logging.debug(f"Fetching page content status: {response.status_code} for: {url}")
+                if response.status_code == 200:
+                    content_type = response.headers.get('Content-Type', '')
+                    if not page_download.is_text_content_type(content_type):
+                        logging.info(f"Skipping {content_type} response (not a text page): {url}")
+                        return None
+                    # Stream the body, stopping at the byte ceiling or once enough text has been seen
+                    body, truncated = page_download.read_capped(
+                        response.iter_content(chunk_size=page_download.CHUNK_SIZE),
+                        max_bytes=config.MAX_PAGE_BYTES, text_chars=page_cache.max_text_length)
+                    if truncated:
+                        logging.debug(f"Stopped reading {url} after {len(body)} bytes")
         if response.status_code == 200:
-            page_text = _decode_content(response)
+            page_text = _decode_content(body, response.headers.get('Content-Type'))
             if page_text:
-                page_soup = BeautifulSoup(page_text, 'html.parser')
-                for script in page_soup(["script", "style"]):
-                    script.decompose()  # Remove script and style tags
-
-                text = page_soup.get_text(separator=' ', strip=True)
-                text = re.sub(r'[\ud800-\udbff](?![\udc00-\udfff])|(?<![\ud800-\udbff])[\udc00-\udfff]', '', text) # Remove invalid unicode
-
-                snippet = text[:snippet_length]
-                title = page_soup.title.string if page_soup.title else url #get title
-                formatted_snippet = f"### {title}\n\n{snippet}\n"  # Keep ### for titles
-                content_snippets.append(formatted_snippet)
-                references.append(url)
-
-                if extract_links:
-                    extracted_data['links'] = [a['href'] for a in page_soup.find_all('a', href=True) if a['href'] and not a['href'].startswith("#")]  # Simple link extraction
-                if extract_emails:
-                    extracted_data['emails'] = re.findall(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}", page_text)  # Basic email regex
-
+                # Drops script/style, collects title and links; parsing is bounded by the CPU pool
+                page = executors.cpu_executor().submit(extraction.extract_page, page_text).result()
+                text = re.sub(r'[\ud800-\udbff](?![\udc00-\udfff])|(?<![\ud800-\udbff])[\udc00-\udfff]', '', page['text']) # Remove invalid unicode
+
+                entry = {
+                    'title': page['title'],
+                    'text': text,
+                    'links': page['links'],
+                    'emails': re.findall(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}", page_text),  # Basic email regex
+                    'canonical': page['canonical'],
+                }
                 if config.CACHE_ENABLED:
-                    config.CACHE[url] = {
-                        'content_snippets': content_snippets,
-                        'references': references,
-                        'extracted_data': extracted_data,
-                        'timestamp': time.time()
-                    }
+                    page_cache.put(url, entry['title'], text, entry['links'], entry['emails'],
+                                   etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified'),
+                                   canonical=entry['canonical'])
+                return entry
 
         elif response.status_code == 403:
             logging.warning(f"Access forbidden (403) for: {url}")
@@ -468,7 +460,7 @@ def fetch_page_content(url: str, snippet_length: Optional[int] = None,
         logging.error(f"Request error fetching {url}: {e}")
     except Exception as e:
         logging.error(f"Unexpected error: URL={url}, Error={e}")
-    return content_snippets, references, extracted_data
+    return None
 
 def generate_alternative_queries(original_query: str) -> List[str]:
     """Generates alternative search queries using Gemini."""
@@ -482,34 +474,30 @@ def generate_alternative_queries(original_query: str) -> List[str]:
     }
     model = genai.GenerativeModel(model_name="gemini-2.0-flash") #Using gemini-2.0-flash for generating alternative quires
     try:
-      response = model.generate_content(parts, safety_settings=safety_settings)
-      return [q.strip() for q in response.text.split('\n') if q.strip()] # returns refined prompts
+      text = cassette.llm_call("gemini", "gemini-2.0-flash", prompt,
+                               lambda: model.generate_content(parts, safety_settings=safety_settings).text)
+      return [q.strip() for q in text.split('\n') if q.strip()] # returns refined prompts
     except Exception as e:
        logging.error(f"Error generating alternative queries: {e}")
        return []
 
 @retry(wait=wait_exponential(multiplier=1, min=4, max=10), stop=stop_after_attempt(3), retry=retry_if_exception_type(Exception))
-def generate_gemini_response(prompt: str, model_name: str = "gemini-2.0-flash", response_format: str = "markdown") -> Union[str, Dict, List]:
-    """Generates a response from Gemini, handling retries/formats."""
-
-    if model_name not in deep_research_rate_limits: # No rate limit for job relevance model
-        logging.info(f"Using model: {model_name}")
-    else:
-        rate_limit_model(model_name) # Rate limit the deep research model
-
-    parts = [{"role": "user", "parts": [{"text": prompt}]}]
-    safety_settings = {
-        "HARM_CATEGORY_HARASSMENT": "BLOCK_NONE",
-        "HARM_CATEGORY_HATE_SPEECH": "BLOCK_NONE",
-        "HARM_CATEGORY_SEXUALLY_EXPLICIT": "BLOCK_NONE",
-        "HARM_CATEGORY_DANGEROUS_CONTENT": "BLOCK_NONE",
-    }
-
-    model = genai.GenerativeModel(model_name=model_name)
-
+def generate_gemini_response(prompt: str, model_name: str = "gemini-2.0-flash", response_format: str = "markdown",
+                             use_cache: bool = True, on_token: Optional[Callable[[str], None]] = None) -> Union[str, Dict, List]:
+    """
+    Generates a response from Gemini, handling retries/formats. Repeated prompts are served from llm_cache.
+    If ``on_token`` is given the response is streamed, and each raw text piece is passed to it as it arrives.
+    """
     try:
-        response = model.generate_content(parts, safety_settings=safety_settings)
-        text_response = response.text
+        text_response = llm_cache.get(model_name, prompt, response_format) if use_cache else None
+        if text_response is None:
+            if not use_cache:
+                llm_cache.bypass()
+            text_response = _call_gemini(prompt, model_name, on_token)
+            if use_cache:
+                llm_cache.put(model_name, prompt, text_response, response_format)
+        elif on_token is not None:
+            on_token(text_response)
 
         if response_format == "json":
             try:
@@ -535,6 +523,39 @@ def generate_gemini_response(prompt: str, model_name: str = "gemini-2.0-flash",
         logging.error(f"Gemini error: {e}")
         raise
 
+def _call_gemini(prompt: str, model_name: str, on_token: Optional[Callable[[str], None]] = None) -> str:
+    """Sends one prompt to Gemini under the model's rate limit; returns the raw response text."""
+    estimated_tokens = rate_limiter.estimate_call_tokens(prompt, model_name)
+    if model_name not in deep_research_rate_limits: # No rate limit for job relevance model
+        logging.info(f"Using model: {model_name}")
+    else:
+        llm_limiter.acquire(model_name, estimated_tokens) # Shared RPM/TPM quota for the deep research models
+
+    parts = [{"role": "user", "parts": [{"text": prompt}]}]
+    safety_settings = {
+        "HARM_CATEGORY_HARASSMENT": "BLOCK_NONE",
+        "HARM_CATEGORY_HATE_SPEECH": "BLOCK_NONE",
+        "HARM_CATEGORY_SEXUALLY_EXPLICIT": "BLOCK_NONE",
+        "HARM_CATEGORY_DANGEROUS_CONTENT": "BLOCK_NONE",
+    }
+
+    model = genai.GenerativeModel(model_name=model_name)
+
+    if on_token is not None and cassette.get_cassette() is None:
+        response = model.generate_content(parts, safety_settings=safety_settings, stream=True)
+        for chunk in response:
+            if chunk.parts:
+                on_token(chunk.text)
+        return _gemini_text(response, model_name, prompt, estimated_tokens)
+
+    text = cassette.llm_call(  # Cassettes hold whole responses, so a replayed "stream" is a single piece
+        "gemini", model_name, prompt,
+        lambda: _gemini_text(model.generate_content(parts, safety_settings=safety_settings),
+                             model_name, prompt, estimated_tokens))
+    if on_token is not None:
+        on_token(text)
+    return text
+
 # --- FastAPI Endpoints ---
 
 @app.get("/", response_class=HTMLResponse)
@@ -600,54 +621,231 @@ async def clear_history_endpoint():
     conversation_history = []
     return JSONResponse({"message": "Cleared history."})
 
+@app.get("/api/status/http_pool")
+async def http_pool_status_endpoint():
+    """Reports keep-alive connection reuse for outbound requests."""
+    return JSONResponse(http_pool.pool_stats())
+
+@app.get("/api/status/encoding_detection")
+async def encoding_detection_status_endpoint():
+    """Reports which detection layer decided each page's encoding."""
+    return JSONResponse(charset_detection.detection_stats())
+
+@app.get("/api/status/politeness")
+async def politeness_status_endpoint():
+    """Reports per-host waits, backoffs and robots.txt denials."""
+    return JSONResponse(host_scheduler.stats())
+
+@app.get("/api/status/executors")
+async def executors_status_endpoint():
+    """Reports queue depth and saturation of the shared worker pools."""
+    return JSONResponse(executors.executor_stats())
+
+@app.get("/api/status/single_flight")
+async def single_flight_status_endpoint():
+    """Reports how many page fetches and searches were coalesced with an in-flight call."""
+    return JSONResponse({"page_fetches": page_fetches.stats(), "searches": search_flights.stats()})
+
+@app.get("/api/status/search_cache")
+async def search_cache_status_endpoint():
+    """Reports search result cache hits, misses and per-engine TTLs."""
+    return JSONResponse(search_cache.stats())
+
+@app.get("/api/status/search_latency")
+async def search_latency_status_endpoint():
+    """Reports per-engine latency percentiles and how often each engine was waited for."""
+    return JSONResponse(search_coordinator.latency.stats())
+
+@app.get("/api/status/engine_health")
+async def engine_health_status_endpoint():
+    """Reports circuit state, error rate and cooldown for each search engine and job site."""
+    return JSONResponse({"search_engines": engine_health.stats(), "job_sites": job_site_health.stats()})
+
+@app.get("/api/status/page_cache")
+async def page_cache_status_endpoint():
+    """Reports page cache hit ratio, evictions and resident bytes."""
+    return JSONResponse(page_cache.stats())
+
+@app.get("/api/status/llm_cache")
+async def llm_cache_status_endpoint():
+    """Reports LLM response cache hit ratio, bypasses, evictions and size."""
+    return JSONResponse(llm_cache.stats())
+
+@app.get("/api/status/rate_limits")
+async def rate_limits_status_endpoint():
+    """Reports each model's RPM/TPM limits, remaining quota and time spent waiting for it."""
+    return JSONResponse(llm_limiter.stats())
+
+@app.get("/api/status/tokens")
+async def token_counter_status_endpoint():
+    """Reports the token counting backend and each model's calibrated count ratio."""
+    return JSONResponse(token_counter.get_counter().stats())
+
+def _summary_slots(model_name: str) -> threading.BoundedSemaphore:
+    slots = summary_slots.get(model_name)
+    if slots is None:
+        slots = summary_slots.setdefault(model_name, threading.BoundedSemaphore(DEFAULT_SUMMARY_CONCURRENCY))
+    return slots
+
+def _summarize_chunk(content: str, search_query: str, model_name: str) -> str:
+    """Summarizes one chunk, waiting for one of the model's summary slots first."""
+    with _summary_slots(model_name):
+        summary_prompt = config.DEEP_RESEARCH_SUMMARY_PROMPT.format(query=search_query) + f"\n\n{content}"
+        return generate_gemini_response(summary_prompt, model_name=model_name)
+
+def _merge_summaries(summaries: List[str], search_query: str, model_name: str) -> str:
+    """One reduce step: merges a group of summaries into one, sharing the model's summary slots."""
+    with _summary_slots(model_name):
+        merge_prompt = config.DEEP_RESEARCH_REDUCE_PROMPT.format(query=search_query) + "\n\n" + "\n\n".join(summaries)
+        return generate_gemini_response(merge_prompt, model_name=model_name)
+
+def _summary_reducer(search_query: str, model_name: str) -> map_reduce.TreeSummarizer:
+    """A reducer that keeps a deep research run's summaries within DEEP_RESEARCH_REPORT_TOKENS."""
+    limits = deep_research_rate_limits.get(model_name, {})
+    return map_reduce.TreeSummarizer(
+        merge=lambda group: _merge_summaries(group, search_query, model_name),
+        count_tokens=lambda text: token_counter.count_tokens(text, model_name),
+        target_tokens=config.DEEP_RESEARCH_REPORT_TOKENS,
+        group_tokens=context_packer.prompt_budget(model_name, config.DEEP_RESEARCH_REDUCE_PROMPT.format(
+            query=search_query), cap=config.MAX_TOKENS_PER_CHUNK),
+        fan_in=config.DEEP_RESEARCH_REDUCE_FAN_IN,
+        max_concurrent=limits.get("max_concurrent", DEFAULT_SUMMARY_CONCURRENCY),
+        executor=executors.io_executor(),
+    )
+
 def process_in_chunks(search_results: List[str], search_query: str, prompt_prefix: str = "",
-                     fetch_options: Optional[Dict] = None) -> Tuple[List[str], List[str], List[Dict]]:
-    """Processes search results in chunks, fetching/summarizing."""
-    chunk_summaries = []
+                     fetch_options: Optional[Dict] = None,
+                     dedup: Optional[PageDeduplicator] = None,
+                     model_name: str = DEFAULT_DEEP_RESEARCH_MODEL,
+                     emit: Optional[Callable] = None,
+                     cancelled: Optional[threading.Event] = None) -> Tuple[List[str], List[str], List[Dict]]:
+    """
+    Fetches search results and summarizes them in token-budgeted chunks, as a pipeline.
+
+    Pages are consumed as their fetches finish; each time the chunk buffer is
+    full (the model's prompt budget, capped at MAX_TOKENS_PER_CHUNK, in real
+    tokens) its off-topic snippets are dropped (BM25, see
+    SNIPPET_MIN_RELEVANCE) and it is queued for summarizing on the io pool
+    while the loop carries on with the next page, so fetching and summarizing
+    overlap. A run keeps at most the model's ``max_concurrent`` summaries on
+    the pool and holds further chunks back until one finishes, so summaries
+    waiting on the model's slots or rate limit don't park the io workers that
+    page fetches need; the slots also cap summaries process-wide. Summaries
+    are returned in chunk order. Near-duplicate pages are skipped via
+    ``dedup``.
+    ``emit(event, data)``, if given, gets fetch progress and summarizing events.
+    Once ``cancelled`` is set, queued fetches and summaries are dropped and sse.Cancelled is raised.
+    """
     references = []
     processed_tokens = 0
     current_chunk_content = []
+    current_chunk_tokens = []
     extracted_data_all = []
+    summary_futures = []
+    started = time.monotonic()
 
     if fetch_options is None:
         fetch_options = {}
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=config.MAX_WORKERS) as executor:
-        futures = {executor.submit(fetch_page_content, url, config.DEEP_RESEARCH_SNIPPET_LENGTH, **fetch_options): url for url in search_results}
-        for future in concurrent.futures.as_completed(futures):
-            url = futures[future]
-            try:
-                page_snippets, page_refs, extracted_data = future.result()
-                references.extend(page_refs)
-                extracted_data_all.append({'url': url, 'data': extracted_data})
-
-                for snippet in page_snippets:
-                    estimated_tokens = len(snippet) // 4  # Estimate tokens
-                    if processed_tokens + estimated_tokens > config.MAX_TOKENS_PER_CHUNK:
-                        # Combine, summarize, and reset
-                        combined_content = "\n\n".join(current_chunk_content)
-                        if combined_content.strip():
-                            summary_prompt = config.DEEP_RESEARCH_SUMMARY_PROMPT.format(query=search_query) + f"\n\n{combined_content}"
-                            summary = generate_gemini_response(summary_prompt, model_name=DEFAULT_DEEP_RESEARCH_MODEL)
-                            chunk_summaries.append(summary)
-                        current_chunk_content = []
-                        processed_tokens = 0
-
-                    current_chunk_content.append(snippet)
-                    processed_tokens += estimated_tokens
-
-            except Exception as e:
-                logging.error(f"Error processing {url}: {e}")
-                continue
+    executor = executors.io_executor()
+    emit = emit or (lambda event, data=None: None)
+    fetched = 0
+    chunk_budget = context_packer.prompt_budget(
+        model_name, config.DEEP_RESEARCH_SUMMARY_PROMPT.format(query=search_query) + "\n\n",
+        cap=config.MAX_TOKENS_PER_CHUNK)
+    separator_tokens = token_counter.count_tokens("\n\n", model_name)
+    chunk_tokens = []
+    off_topic = 0
+    max_in_flight = deep_research_rate_limits.get(model_name, {}).get("max_concurrent", DEFAULT_SUMMARY_CONCURRENCY)
+    waiting_chunks = []  # Chunks not yet handed to the pool, oldest first
+
+    def submit_ready():
+        """Hands queued chunks to the pool while fewer than max_in_flight of this run's summaries are running."""
+        while waiting_chunks and sum(not future.done() for future in summary_futures) < max_in_flight:
+            summary_futures.append(executor.submit(_summarize_chunk, waiting_chunks.pop(0), search_query, model_name))
+
+    def submit_chunk():
+        nonlocal off_topic
+        snippets, tokens = current_chunk_content, current_chunk_tokens
+        if len(snippets) > 1:
+            # Snippets scoring far below the chunk's best BM25 match for the query never reach the LLM
+            keep = sorted(bm25.rank(snippets, search_query, min_ratio=config.SNIPPET_MIN_RELEVANCE))
+            off_topic += len(snippets) - len(keep)
+            snippets, tokens = [snippets[i] for i in keep], [tokens[i] for i in keep]
+        combined_content = "\n\n".join(snippets)
+        if combined_content.strip():
+            waiting_chunks.append(combined_content)
+            submit_ready()
+            chunk_tokens.append(sum(tokens) + separator_tokens * (len(tokens) - 1))
+            emit("stage", {"stage": "summarizing", "chunks": len(chunk_tokens),
+                           "tokens": chunk_tokens[-1], "budget": chunk_budget})
+
+    def stop_if_cancelled():
+        if cancelled is not None and cancelled.is_set():
+            waiting_chunks.clear()
+            for pending in list(futures) + summary_futures:
+                pending.cancel()  # Only queued work can be dropped; running calls finish on their own
+            sse.check_cancelled(cancelled)
+
+    futures = {executor.submit(fetch_page_content, url, config.DEEP_RESEARCH_SNIPPET_LENGTH,
+                               include_canonical=dedup is not None, **fetch_options): url for url in search_results}
+    for future in concurrent.futures.as_completed(futures):
+        stop_if_cancelled()
+        submit_ready()  # Replace summaries that finished while this page was being fetched
+        url = futures[future]
+        fetched += 1
+        emit("progress", {"stage": "fetching", "done": fetched, "total": len(futures)})
+        try:
+            page_snippets, page_refs, extracted_data = future.result()
+            canonical = extracted_data.pop('canonical', None)
+            if dedup is not None and page_snippets:
+                original = dedup.check(url, "\n".join(page_snippets), canonical)
+                if original:
+                    logging.info(f"Skipping {url}: near-duplicate of {original}")
+                    continue
+            references.extend(page_refs)
+            extracted_data_all.append({'url': url, 'data': extracted_data})
+
+            for snippet in page_snippets:
+                snippet_tokens = token_counter.count_tokens(snippet, model_name)
+                if current_chunk_content and processed_tokens + separator_tokens + snippet_tokens > chunk_budget:
+                    submit_chunk()  # Summarized in the background while fetches keep draining
+                    current_chunk_content = []
+                    current_chunk_tokens = []
+                    processed_tokens = 0
+
+                processed_tokens += snippet_tokens + (separator_tokens if current_chunk_content else 0)
+                current_chunk_content.append(snippet)
+                current_chunk_tokens.append(snippet_tokens)
+
+        except Exception as e:
+            logging.error(f"Error processing {url}: {e}")
+            continue
 
-        # Process any remaining content
-        if current_chunk_content:
-            combined_content = "\n\n".join(current_chunk_content)
-            if combined_content.strip():
-                summary_prompt = config.DEEP_RESEARCH_SUMMARY_PROMPT.format(query=search_query) + f"\n\n{combined_content}"
-                summary = generate_gemini_response(summary_prompt, model_name=DEFAULT_DEEP_RESEARCH_MODEL)
-                chunk_summaries.append(summary)
+    # Process any remaining content
+    if current_chunk_content:
+        submit_chunk()
+    fetched_at = time.monotonic()
+    while waiting_chunks:
+        running = [future for future in summary_futures if not future.done()]
+        if running:
+            concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+        stop_if_cancelled()
+        submit_ready()
 
+    chunk_summaries = []
+    for future in summary_futures:
+        stop_if_cancelled()
+        try:
+            chunk_summaries.append(future.result())
+        except Exception as e:
+            logging.error(f"Error summarizing chunk for '{search_query}': {e}")
+
+    utilization = sum(chunk_tokens) / (chunk_budget * len(chunk_tokens)) if chunk_tokens and chunk_budget else 0.0
+    logging.info(f"Processed {len(search_results)} URLs into {len(chunk_summaries)} summaries in "
+                 f"{time.monotonic() - started:.1f}s (fetching done after {fetched_at - started:.1f}s), "
+                 f"{sum(chunk_tokens)} tokens in chunks of {chunk_budget} ({utilization:.0%} full), "
+                 f"{off_topic} off-topic snippets skipped")
     return chunk_summaries, references, extracted_data_all
 
 @app.post("/api/online")
@@ -660,60 +858,56 @@ async def online_search_endpoint(request: Request):
              raise HTTPException(status_code=400, detail="No query provided")
 
         references = []
-        search_results = []
         content_snippets = []
-        search_engines_requested = data.get('search_engines', config.SEARCH_ENGINES)
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=config.MAX_WORKERS) as executor:
-            search_futures = [executor.submit(scrape_search_engine, search_query, engine) for engine in search_engines_requested]
-            for future in concurrent.futures.as_completed(search_futures):
-                try:
-                    search_results.extend(future.result())
-                except Exception as e:
-                    logging.error(f"Search engine scrape error: {e}")
-
-            if not search_results:
-                logging.warning(f"Initial search failed: {search_query}. Trying alternatives.")
-                alternative_queries = generate_alternative_queries(search_query)
-                if alternative_queries:
-                    logging.info(f"Alternative queries: {alternative_queries}")
-                    for alt_query in alternative_queries:
-                        alt_search_futures = [executor.submit(scrape_search_engine, alt_query, engine) for engine in
-                                              search_engines_requested]
-                        for future in concurrent.futures.as_completed(alt_search_futures):
-                            try:
-                                result = future.result()
-                                if result:
-                                    search_results.extend(result)
-                                    logging.info(f"Results found with alternative: {alt_query}")
-                                    break  # Stop on first result
-                            except Exception as e:
-                                logging.error(f"Alternative query scrape error: {e}")
-                        if search_results:
-                            break # Stop after finding results
-                else:
-                    logging.warning("Gemini failed to generate alternatives.")
-
-            if not search_results:
-                raise HTTPException(status_code=404, detail="No results found")
-
-            unique_search_results = list(set(search_results))
-            logging.debug(f"Unique URLs to fetch: {unique_search_results}")
-            # Fetch content concurrently
-            fetch_futures = {executor.submit(fetch_page_content, url): url for url in unique_search_results}
-            for future in concurrent.futures.as_completed(fetch_futures):
-                url = fetch_futures[future]
-                try:
-                    page_snippets, page_refs, _ = future.result()
-                    content_snippets.extend(page_snippets)
-                    references.extend(page_refs)
-                except Exception as e:
-                    logging.error(f"Error fetching {url}: {e}")
-
-        combined_content = "\n\n".join(content_snippets)
-        prompt = (f"Analyze web content for: '{search_query}'. Extract key facts, figures, and details. Be concise. "
-                  f"Content:\n\n{combined_content}\n\nProvide a fact-based summary.")
-        explanation = generate_gemini_response(prompt) #Default model
+        search_engines_requested = engine_health.available(data.get('search_engines', config.SEARCH_ENGINES))
+
+        # Returns once enough URLs are in or the latency budget is spent, not when the slowest engine is done
+        search_results = search_coordinator.search_by_engine(search_query, search_engines_requested, scrape_search_engine)
+
+        if not search_results:
+            logging.warning(f"Initial search failed: {search_query}. Trying alternatives.")
+            alternative_queries = generate_alternative_queries(search_query)
+            if alternative_queries:
+                logging.info(f"Alternative queries: {alternative_queries}")
+                for alt_query in alternative_queries:
+                    search_results = search_coordinator.search_by_engine(alt_query, search_engines_requested, scrape_search_engine)
+                    if search_results:
+                        logging.info(f"Results found with alternative: {alt_query}")
+                        break # Stop after finding results
+            else:
+                logging.warning("Gemini failed to generate alternatives.")
+
+        if not search_results:
+            raise HTTPException(status_code=404, detail="No results found")
+
+        # Score candidates before downloading anything; only the best FETCH_TOP_K are fetched
+        unique_search_results = url_ranking.rank_urls(search_results, top_k=config.FETCH_TOP_K)
+        logging.debug(f"Top URLs to fetch: {unique_search_results}")
+        # Fetch content concurrently
+        executor = executors.io_executor()
+        dedup = PageDeduplicator()
+        fetch_futures = {executor.submit(fetch_page_content, url, include_canonical=True): url for url in unique_search_results}
+        for future in concurrent.futures.as_completed(fetch_futures):
+            url = fetch_futures[future]
+            try:
+                page_snippets, page_refs, extracted_data = future.result()
+                if page_snippets and dedup.check(url, "\n".join(page_snippets), extracted_data.get('canonical')):
+                    continue  # Near-duplicate of a page already in the prompt
+                content_snippets.extend(page_snippets)
+                references.extend(page_refs)
+            except Exception as e:
+                logging.error(f"Error fetching {url}: {e}")
+
+        logging.info(f"Dropped {len(dedup.duplicates)} near-duplicate pages, saving ~{dedup.tokens_saved} tokens")
+        prompt_prefix = (f"Analyze web content for: '{search_query}'. Extract key facts, figures, and details. "
+                         f"Be concise. Content:\n\n")
+        prompt_suffix = "\n\nProvide a fact-based summary."
+        # Most relevant snippets first, as many as fit in one summary chunk's budget
+        budget = context_packer.prompt_budget(ONLINE_MODEL, prompt_prefix + prompt_suffix,
+                                              cap=config.MAX_TOKENS_PER_CHUNK)
+        packed = context_packer.pack(content_snippets, budget, ONLINE_MODEL, search_query,
+                                     min_ratio=config.SNIPPET_MIN_RELEVANCE)
+        explanation = generate_gemini_response(prompt_prefix + packed["text"] + prompt_suffix, model_name=ONLINE_MODEL)
         global conversation_history  # Access global variable
 
         def serialize_content(content):
@@ -731,11 +925,11 @@ async def online_search_endpoint(request: Request):
         conversation_history.append({"role": "model", "parts": [explanation]})
         serialized_history = [serialize_content(item) for item in conversation_history]
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=config.MAX_WORKERS) as executor:
-            shortened_references = list(executor.map(get_shortened_url, references)) #Shorten URLs concurrently
+        shortened_references = list(executor.map(get_shortened_url, references)) #Shorten URLs concurrently
 
 
-        return JSONResponse({"explanation": explanation, "references": shortened_references, "history": serialized_history})
+        return JSONResponse({"explanation": explanation, "references": shortened_references, "history": serialized_history,
+                             "dedup": dedup.report(), "context": context_packer.summary(packed)})
 
     except HTTPException as e:
         raise e  # Re-raise HTTP exceptions
@@ -756,197 +950,297 @@ def serialize_content(content): #helper function
         return content
 
 
+def _deep_research_params(data: Dict) -> Dict:
+    search_query = data.get('query', '')
+    if not search_query:
+        raise HTTPException(status_code=400, detail="No query provided")
+    return {
+        "search_query": search_query,
+        "model_name": data.get('model_name', DEFAULT_DEEP_RESEARCH_MODEL),
+        "engines": engine_health.available(data.get('search_engines', config.SEARCH_ENGINES)),
+        "output_format": data.get('output_format', 'markdown'),  # Default to markdown
+        "extract_links": data.get('extract_links', False),
+        "extract_emails": data.get('extract_emails', False),
+        "max_iterations": int(data.get('max_iterations', 3)),  # Default to 3
+    }
+
+def _deep_research_iterations(params: Dict, dedup: PageDeduplicator, emit=None,
+                              cancelled: Optional[threading.Event] = None) -> Dict:
+    """
+    Runs the search/fetch/summarize/refine iterations; ``emit`` gets stage and progress events.
+    After each iteration the summaries so far are merged down to DEEP_RESEARCH_REPORT_TOKENS if they exceed it.
+    ``cancelled`` is checked between stages (sse.Cancelled is raised once it is set).
+    """
+    emit = emit or (lambda event, data=None: None)
+    search_query = params["search_query"]
+    reducer = _summary_reducer(search_query, params["model_name"])
+    all_summaries = []
+    all_references = []
+    all_extracted_data = []
+    fetched_urls = []
+    current_query = search_query # initial query
+    iteration = 0
+
+    for iteration in range(params["max_iterations"]):
+        sse.check_cancelled(cancelled)
+        logging.info(f"Iteration {iteration + 1}: {current_query}")
+        emit("stage", {"stage": "searching", "iteration": iteration + 1, "query": current_query})
+        #current_query = search_query if iteration == 0 else current_query # To keep track of current
+        search_results = search_coordinator.search_by_engine(current_query, params["engines"], scrape_search_engine)
+
+        # Best-ranked URLs not already fetched in an earlier iteration
+        unique_results = url_ranking.rank_urls(search_results, top_k=config.DEEP_RESEARCH_TOP_K,
+                                               exclude=fetched_urls)
+        fetched_urls.extend(unique_results)
+        logging.debug(f"Iteration {iteration + 1} - URLs: {unique_results}")
+        emit("stage", {"stage": "fetching", "iteration": iteration + 1, "total": len(unique_results)})
+
+        prompt_prefix = config.DEEP_RESEARCH_SUMMARY_PROMPT.format(query=current_query)
+        fetch_options = {'extract_links': params["extract_links"], 'extract_emails': params["extract_emails"]}
+
+        map_started = time.monotonic()
+        chunk_summaries, refs, extracted = process_in_chunks(unique_results, current_query, prompt_prefix,
+                                                            fetch_options, dedup=dedup, emit=emit,
+                                                            cancelled=cancelled)
+        reducer.record(f"map {iteration + 1}", len(unique_results), chunk_summaries, time.monotonic() - map_started)
+        all_summaries.extend(chunk_summaries)
+        all_references.extend(refs)
+        all_extracted_data.extend(extracted)
+        sse.check_cancelled(cancelled)
+        if sum(token_counter.count_tokens(s, params["model_name"]) for s in all_summaries) > reducer.target_tokens:
+            emit("stage", {"stage": "merging", "iteration": iteration + 1, "summaries": len(all_summaries)})
+            all_summaries = reducer.reduce(all_summaries)
+
+        if iteration < params["max_iterations"] - 1:
+            # Refine the search query
+            if all_summaries: # Check if we have any summaries to work with.
+                sse.check_cancelled(cancelled)
+                emit("stage", {"stage": "refining", "iteration": iteration + 1})
+                refinement_prompt = config.DEEP_RESEARCH_REFINEMENT_PROMPT.format(original_query=search_query) + "\n\nResearch Summaries:\n" + "\n".join(all_summaries)
+                refined_response = generate_gemini_response(refinement_prompt, model_name=params["model_name"])
+                new_queries = [q.strip() for q in refined_response.split('\n') if q.strip()]
+                current_query = " ".join(new_queries[:3])  # Use top queries
+            else:
+                logging.info("No summaries for refinement. Skipping to next iteration.")
+                break # If no summaries, stop refining.
+
+    return {"summaries": all_summaries, "references": all_references, "extracted_data": all_extracted_data,
+            "current_query": current_query, "iteration": iteration + 1, "summarization": reducer.stats()}
+
+def _deep_research_report(params: Dict, summaries: List[str], on_token=None):
+    """Writes the final report from the summaries (parsed per output_format); ``on_token`` gets raw text as it streams."""
+    search_query = params["search_query"]
+    output_format = params["output_format"]
+    if not summaries:
+        return "No relevant content found for the given query."
+
+    # ---  Enhanced Report Structure Logic ---
+    report_structure = (
+        "**Structure your report with clear headings and subheadings.**\n"
+        "Use bullet points and numbered lists where appropriate.\n"
+        "Include a concise introduction and conclusion.\n\n"
+    )
+
+    # Conditionally add table instructions
+    if "table" in output_format.lower():
+        report_structure += (
+            "**Include a comparison table summarizing key findings.**  "
+            "Use the detailed table formatting guidelines provided earlier.\n"
+        )
+    else:
+        report_structure += "**Do NOT include a table.** Focus on a narrative report.\n"
+
+    # ---  Final Report Generation (with structure) ---
+    def build_prompt(packed_summaries: str) -> str:
+        prompt = config.DEEP_RESEARCH_REPORT_PROMPT.format(
+            search_query=search_query,
+            report_structure=report_structure,
+            summaries=packed_summaries
+        )
+        #  If table is requested, prepend the table prompt.
+        if "table" in output_format.lower():
+            prompt = config.DEEP_RESEARCH_TABLE_PROMPT.format(query=search_query) + "\n\n" + prompt
+        return prompt
+
+    # Summaries are packed whole, most relevant first, into a fixed share of the prompt (the reducer aims for it too)
+    budget = min(config.DEEP_RESEARCH_REPORT_TOKENS, context_packer.prompt_budget(params["model_name"], build_prompt("")))
+    packed = context_packer.pack(summaries, budget, params["model_name"], search_query)
+    final_prompt = build_prompt(packed["text"])
+
+    final_explanation = generate_gemini_response(final_prompt, response_format=output_format,
+                                                model_name=params["model_name"], on_token=on_token)
+
+    # --- Table Parsing (if applicable) ---
+    if "table" in output_format.lower():
+        try:
+            parsed_table = parse_markdown_table(final_explanation)
+            if parsed_table:
+                final_explanation = parsed_table  # Use parsed table
+            else:
+                logging.warning("Table parsing failed. Returning raw response.")
+                final_explanation = {"error": "Failed to parse table", "raw_text": final_explanation}
+        except Exception as e:
+            logging.error(f"Error during table parsing: {e}")
+            final_explanation = {"error": "Failed to parse table", "raw_text": final_explanation}
+    return final_explanation
+
 @app.post("/api/deep_research")
 async def deep_research_endpoint(request: Request):
     try:
         data = await request.json()
-        search_query = data.get('query', '')
-        if not search_query:
-            raise HTTPException(status_code=400, detail="No query provided")
-
-        model_name = data.get('model_name', DEFAULT_DEEP_RESEARCH_MODEL)
-        start_time = time.time()
-        search_engines_requested = data.get('search_engines', config.SEARCH_ENGINES)
-        output_format = data.get('output_format', 'markdown')  # Default to markdown
-        extract_links = data.get('extract_links', False)
-        extract_emails = data.get('extract_emails', False)
+        params = _deep_research_params(data)
+        search_query = params["search_query"]
+        output_format = params["output_format"]
         download_pdf = data.get('download_pdf', True) # Default to True
-        max_iterations = int(data.get('max_iterations', 3))  # Default to 3
+        start_time = time.time()
 
-        all_summaries = []
-        all_references = []
-        all_extracted_data = []
-        current_query = search_query # initial query
+        dedup = PageDeduplicator()  # Shared across iterations so repeats of earlier pages are skipped too
+        research = _deep_research_iterations(params, dedup)
+        all_references = research["references"]
+        all_extracted_data = research["extracted_data"]
+        current_query = research["current_query"]
+        final_explanation = _deep_research_report(params, research["summaries"])
 
 
-        # ---  Enhanced Report Structure Logic ---
-        report_structure = (
-            "**Structure your report with clear headings and subheadings.**\n"
-            "Use bullet points and numbered lists where appropriate.\n"
-            "Include a concise introduction and conclusion.\n\n"
-        )
 
-        # Conditionally add table instructions
-        if "table" in output_format.lower():
-            report_structure += (
-                "**Include a comparison table summarizing key findings.**  "
-                "Use the detailed table formatting guidelines provided earlier.\n"
-            )
-            table_prompt = config.DEEP_RESEARCH_TABLE_PROMPT.format(query=search_query) #prepare the table prompt
-        else:
-            report_structure += "**Do NOT include a table.** Focus on a narrative report.\n"
-
-
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=config.MAX_WORKERS) as executor:
-            for iteration in range(max_iterations):
-                logging.info(f"Iteration {iteration + 1}: {current_query}")
-                search_results = []
-                #current_query = search_query if iteration == 0 else current_query # To keep track of current
-                search_futures = [executor.submit(scrape_search_engine, current_query, engine) for engine in
-                                  search_engines_requested]
-                for future in concurrent.futures.as_completed(search_futures):
-                    search_results.extend(future.result())
-
-                unique_results = list(set(search_results))  # Remove duplicates
-                logging.debug(f"Iteration {iteration + 1} - URLs: {unique_results}")
-
-                prompt_prefix = config.DEEP_RESEARCH_SUMMARY_PROMPT.format(query=current_query)
-                fetch_options = {'extract_links': extract_links, 'extract_emails': extract_emails}
-
-                chunk_summaries, refs, extracted = process_in_chunks(unique_results, current_query, prompt_prefix,
-                                                                    fetch_options)
-                all_summaries.extend(chunk_summaries)
-                all_references.extend(refs)
-                all_extracted_data.extend(extracted)
-
-                if iteration < max_iterations - 1:
-                    # Refine the search query
-                    if all_summaries: # Check if we have any summaries to work with.
-                        refinement_prompt = config.DEEP_RESEARCH_REFINEMENT_PROMPT.format(original_query=search_query) + "\n\nResearch Summaries:\n" + "\n".join(all_summaries)
-                        refined_response = generate_gemini_response(refinement_prompt, model_name=model_name)
-                        new_queries = [q.strip() for q in refined_response.split('\n') if q.strip()]
-                        current_query = " ".join(new_queries[:3])  # Use top queries
-                    else:
-                        logging.info("No summaries for refinement. Skipping to next iteration.")
-                        break # If no summaries, stop refining.
-
-
-            # ---  Final Report Generation (with structure) ---
-            if all_summaries:
-                final_prompt = config.DEEP_RESEARCH_REPORT_PROMPT.format(
-                    search_query=search_query,
-                    report_structure=report_structure,
-                    summaries="\n\n".join(all_summaries)
-                )
-
-                #  If table is requested, prepend the table prompt.
-                if "table" in output_format.lower():
-                    final_prompt = table_prompt + "\n\n" + final_prompt
-
-
-                final_explanation = generate_gemini_response(final_prompt, response_format=output_format,
-                                                            model_name=model_name)
-
-                # --- Table Parsing (if applicable) ---
-                if "table" in output_format.lower():
-                    try:
-                        parsed_table = parse_markdown_table(final_explanation)
-                        if parsed_table:
-                            final_explanation = parsed_table  # Use parsed table
-                        else:
-                            logging.warning("Table parsing failed. Returning raw response.")
-                            final_explanation = {"error": "Failed to parse table", "raw_text": final_explanation}
-                    except Exception as e:
-                        logging.error(f"Error during table parsing: {e}")
-                        final_explanation = {"error": "Failed to parse table", "raw_text": final_explanation}
-            else:
-                final_explanation = "No relevant content found for the given query."
+        global conversation_history  # Access global variable
+        conversation_history.append({"role": "user", "parts": [f"Deep research query: {search_query}"]})
+        conversation_history.append({"role": "model", "parts": [final_explanation]})
+        serialized_history = [serialize_content(item) for item in conversation_history]
 
+        end_time = time.time()
+        elapsed_time = end_time - start_time
+        logging.info(f"Dropped {len(dedup.duplicates)} near-duplicate pages, saving ~{dedup.tokens_saved} tokens")
+        dedup_report = dedup.report()
 
 
-            global conversation_history  # Access global variable
-            conversation_history.append({"role": "user", "parts": [f"Deep research query: {search_query}"]})
-            conversation_history.append({"role": "model", "parts": [final_explanation]})
-            serialized_history = [serialize_content(item) for item in conversation_history]
+        response_data = {
+            "explanation": final_explanation,
+            "references": all_references,
+            "history": serialized_history,
+            "elapsed_time": f"{elapsed_time:.2f} seconds",
+            "extracted_data": all_extracted_data,
+            "current_query": current_query,  # Include the final query used
+            "iteration": research["iteration"],  #  Include the final iteration number
+            "summarization": research["summarization"],  # Map/reduce levels with timings
+            "dedup": dedup_report  # Near-duplicate pages skipped and tokens saved
 
-            end_time = time.time()
-            elapsed_time = end_time - start_time
+        }
+        if download_pdf:
+            pdf_buffer = await asyncio.wrap_future(executors.cpu_executor().submit(
+                generate_pdf,
+                "",  # Pass an EMPTY STRING as the title.
+                final_explanation if isinstance(final_explanation, str)
+                else "\n".join(str(row) for row in final_explanation),
+                all_references
+            ))
+            headers = {
+                'Content-Disposition': f'attachment; filename="{quote_plus(search_query)}_report.pdf"'
+            }
+            return StreamingResponse(iter([pdf_buffer.getvalue()]), media_type="application/pdf", headers=headers)
 
 
-            response_data = {
-                "explanation": final_explanation,
+        if output_format == "json":
+            if isinstance(final_explanation, dict):
+                 # If it's already a dict (like error case), return it directly
+                response_data = final_explanation
+            elif isinstance(final_explanation, list):
+                #  table data
+                response_data = {"table_data": final_explanation}
+            else:
+                #  text explanation
+                response_data = {"explanation": final_explanation}
+            # Add other data to the JSON response
+            response_data.update({
                 "references": all_references,
                 "history": serialized_history,
                 "elapsed_time": f"{elapsed_time:.2f} seconds",
                 "extracted_data": all_extracted_data,
-                "current_query": current_query,  # Include the final query used
-                "iteration": iteration + 1  #  Include the final iteration number
-
-            }
-            if download_pdf:
-                pdf_buffer = generate_pdf(
-                    "",  # Pass an EMPTY STRING as the title.
-                    final_explanation if isinstance(final_explanation, str)
-                    else "\n".join(str(row) for row in final_explanation),
-                    all_references
-                )
-                headers = {
-                    'Content-Disposition': f'attachment; filename="{quote_plus(search_query)}_report.pdf"'
-                }
-                return StreamingResponse(iter([pdf_buffer.getvalue()]), media_type="application/pdf", headers=headers)
-
+                "dedup": dedup_report,
+                "summarization": research["summarization"]
+            })
+            return JSONResponse(response_data)
 
-            if output_format == "json":
-                if isinstance(final_explanation, dict):
-                     # If it's already a dict (like error case), return it directly
-                    response_data = final_explanation
-                elif isinstance(final_explanation, list):
-                    #  table data
-                    response_data = {"table_data": final_explanation}
-                else:
-                    #  text explanation
-                    response_data = {"explanation": final_explanation}
-                # Add other data to the JSON response
-                response_data.update({
-                    "references": all_references,
-                    "history": serialized_history,
-                    "elapsed_time": f"{elapsed_time:.2f} seconds",
-                    "extracted_data": all_extracted_data
-                })
-                return JSONResponse(response_data)
-
-
-            elif output_format == "csv":
-                if isinstance(final_explanation, list):
-                    output = io.StringIO()
-                    writer = csv.writer(output)
-                    writer.writerows(final_explanation)  # Write the list of lists
-                    response_data["explanation"] = output.getvalue()
-                elif isinstance(final_explanation, dict) and "raw_text" in final_explanation:
-                    # Handle potential error dict
-                    response_data = {"explanation": final_explanation["raw_text"]}
-                else:
-                    response_data = {"explanation": final_explanation} # for normal text
 
-                response_data.update({
-                    "references": all_references,
-                    "history": serialized_history,
-                    "elapsed_time": f"{elapsed_time:.2f} seconds",
-                    "extracted_data": all_extracted_data
-                })
+        elif output_format == "csv":
+            if isinstance(final_explanation, list):
+                output = io.StringIO()
+                writer = csv.writer(output)
+                writer.writerows(final_explanation)  # Write the list of lists
+                response_data["explanation"] = output.getvalue()
+            elif isinstance(final_explanation, dict) and "raw_text" in final_explanation:
+                # Handle potential error dict
+                response_data = {"explanation": final_explanation["raw_text"]}
+            else:
+                response_data = {"explanation": final_explanation} # for normal text
 
-                return JSONResponse(response_data)
+            response_data.update({
+                "references": all_references,
+                "history": serialized_history,
+                "elapsed_time": f"{elapsed_time:.2f} seconds",
+                "extracted_data": all_extracted_data,
+                "dedup": dedup_report,
+                "summarization": research["summarization"]
+            })
 
-            # If not JSON or CSV, return as is (Markdown)
             return JSONResponse(response_data)
 
+        # If not JSON or CSV, return as is (Markdown)
+        return JSONResponse(response_data)
+
     except HTTPException as e:
         raise e  # Re-raise HTTP exceptions
     except Exception as e:
         logging.exception(f"Error in deep research: {e}")  # Log full traceback
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/deep_research/stream")
+async def deep_research_stream_endpoint(request: Request):
+    """Deep research as Server-Sent Events (see sse.py): stage/progress events, report tokens, then the result."""
+    params = _deep_research_params(await request.json())
+    channel = sse.EventChannel()
+
+    def run():
+        # Blocking pipeline; runs in its own thread (not an executors pool, since it waits on the io pool)
+        start_time = time.time()
+        dedup = PageDeduplicator()
+        research = _deep_research_iterations(params, dedup, emit=channel.emit, cancelled=channel.cancelled)
+        sse.check_cancelled(channel.cancelled)  # Don't write a report nobody will read
+        if research["summaries"]:
+            channel.emit("stage", {"stage": "writing", "summaries": len(research["summaries"])})
+        final_explanation = _deep_research_report(params, research["summaries"],
+                                                  on_token=lambda text: channel.emit("token", {"text": text}))
+        conversation_history.append({"role": "user", "parts": [f"Deep research query: {params['search_query']}"]})
+        conversation_history.append({"role": "model", "parts": [final_explanation]})
+        return {
+            "explanation": final_explanation,
+            "references": research["references"],
+            "elapsed_time": f"{time.time() - start_time:.2f} seconds",
+            "extracted_data": research["extracted_data"],
+            "current_query": research["current_query"],
+            "iteration": research["iteration"],
+            "dedup": dedup.report(),
+            "summarization": research["summarization"],
+        }
+
+    def run_logged():
+        try:
+            return run()
+        except sse.Cancelled:
+            logging.info(f"Deep research stream for '{params['search_query']}' stopped: client disconnected")
+            raise
+
+    async def events():
+        try:
+            async for event in channel.run(asyncio.to_thread(run_logged)):
+                yield event
+            yield sse.format_event("done", channel.result)
+        except Exception as e:
+            logging.exception(f"Error in deep research stream: {e}")
+            yield sse.format_event("error", {"detail": str(e)})
+
+    return sse.streaming_response(events())
+
 def parse_markdown_table(markdown_table_string):
     """Parses a Markdown table string with improved robustness."""
     lines = [line.strip() for line in markdown_table_string.split('\n') if line.strip()]
@@ -1246,7 +1540,7 @@ def generate_pdf(report_title, content, references):
 def scrape_product_details(url):
     """Scrapes product details from a given URL."""
     try:
-        response = requests.get(url, headers={'User-Agent': get_random_user_agent()}, timeout=config.REQUEST_TIMEOUT)
+        response = polite_get(url, respect_robots=True, headers={'User-Agent': get_random_user_agent()}, timeout=config.REQUEST_TIMEOUT)
         response.raise_for_status()
 
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -1312,28 +1606,27 @@ async def scrape_product_endpoint(request: Request):
              raise HTTPException(status_code=400, detail="No product query provided")
 
         search_results = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=config.MAX_WORKERS) as executor:
-            futures = [executor.submit(scrape_search_engine, product_query, engine)
-                       for engine in config.SEARCH_ENGINES]
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    search_results.extend(future.result())
-                except Exception as e:
-                    logging.error(f"Error in search engine scrape: {e}")
+        executor = executors.io_executor()
+        futures = [executor.submit(scrape_search_engine, product_query, engine)
+                   for engine in engine_health.available(config.SEARCH_ENGINES)]
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                search_results.extend(future.result())
+            except Exception as e:
+                logging.error(f"Error in search engine scrape: {e}")
 
         unique_urls = list(set(search_results))  # Remove duplicate URLs
 
         all_product_data = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=config.MAX_WORKERS) as executor:
-            futures = {executor.submit(scrape_product_details, url): url for url in unique_urls}
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    product_data = future.result()
-                    if product_data:  # Only add if data was successfully scraped
-                        all_product_data.append(product_data)
-                except Exception as e:
-                    url = futures[future]
-                    logging.error(f"Error processing {url}: {e}")
+        futures = {executor.submit(scrape_product_details, url): url for url in unique_urls}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                product_data = future.result()
+                if product_data:  # Only add if data was successfully scraped
+                    all_product_data.append(product_data)
+            except Exception as e:
+                url = futures[future]
+                logging.error(f"Error processing {url}: {e}")
 
         if all_product_data:
             # Create a prompt to summarize the product information
@@ -1519,7 +1812,8 @@ def scrape_job_site(job_title: str, job_location: str, resume_text: Optional[str
     Args:
         job_title: The job title to search for.
         job_location: The location to search for jobs.
-        resume_text: Optional resume text for relevance assessment.
+        resume_text: Optional resume text; if given, each job's description is fetched into
+            '_description' for _score_job_relevance.
         base_url: The base URL of the job site.
         params_func: A function that generates the URL parameters for the site.
         parse_func: A function that parses a job card from the site's HTML.
@@ -1530,6 +1824,10 @@ def scrape_job_site(job_title: str, job_location: str, resume_text: Optional[str
         A list of dictionaries, where each dictionary represents a job listing.
     """
 
+    if not job_site_health.allow(site_name.lower()):
+        logging.info(f"Skipping {site_name}: circuit open after recent failures")
+        return []
+
     search_results = []
     start = 0  #  pagination
     MAX_PAGES = 10  # Limit pages to prevent infinite loops.  Adjust as needed.
@@ -1538,11 +1836,13 @@ def scrape_job_site(job_title: str, job_location: str, resume_text: Optional[str
         params = params_func(job_title, job_location, start, experience_level) # Pass experience
         try:
             headers = {'User-Agent': get_random_user_agent()}  # Rotate User-Agent
-            response = requests.get(base_url, params=params, headers=headers, timeout=config.REQUEST_TIMEOUT)
+            response = polite_get(base_url, engine=site_name.lower(), health=job_site_health,
+                                  params=params, headers=headers, timeout=config.REQUEST_TIMEOUT)
             response.raise_for_status() # Raises HTTPError for bad (4xx, 5xx) responses
 
             if "captcha" in response.text.lower():
                 logging.warning(f"{site_name} CAPTCHA detected. Stopping.")
+                job_site_health.record_failure(site_name.lower(), "captcha", hard=True)
                 break  # Exit pagination
 
             soup = BeautifulSoup(response.text, 'html.parser')
@@ -1570,8 +1870,8 @@ def scrape_job_site(job_title: str, job_location: str, resume_text: Optional[str
                     if resume_text:
                         try:
                             # Fetch the full job description
-                            job_response = requests.get(job_data['url'], headers={'User-Agent': get_random_user_agent()},
-                                                        timeout=config.REQUEST_TIMEOUT)
+                            job_response = polite_get(job_data['url'], headers={'User-Agent': get_random_user_agent()},
+                                                                       timeout=config.REQUEST_TIMEOUT)
                             job_response.raise_for_status()
                             job_soup = BeautifulSoup(job_response.text, 'html.parser')
                             description_element = job_soup.find('div', id='jobDescriptionText') # Indeed
@@ -1602,55 +1902,14 @@ def scrape_job_site(job_title: str, job_location: str, resume_text: Optional[str
                                     if job_data['experience'] != 'N/A':
                                         break # Stop checking other levels
 
-
-
-
-                            job_description = job_description[:2000]  # Truncate!
-                            resume_text_trunc = resume_text[:2000]  # Truncate!
-
-                            relevance_prompt = (
-                                f"Assess the relevance of the following job to the resume. "
-                                f"Provide a JSON object with ONLY the following keys:\n"
-                                f"'relevance': float (between 0.0 and 1.0, where 1.0 is perfectly relevant),\n"
-                                f"'missing_skills': list of strings (skills in the job description but not in the resume, or an empty list if none),\n"
-                                 f"'justification': string (REQUIRED. Explain the relevance score, including factors like experience level mismatch, skill gaps, or industry differences.).\n\n"
-                                f"Job Description:\n{job_description}\n\nResume:\n{resume_text_trunc}"
-                            )
-                            relevance_assessment = generate_gemini_response(relevance_prompt, response_format="json", model_name=config.JOB_RELEVANCE_MODEL)
-                            if isinstance(relevance_assessment, dict):
-                                job_data['relevance'] = relevance_assessment.get('relevance', 0.0)  # Provide default
-                                job_data['missing_skills'] = relevance_assessment.get('missing_skills', [])
-                                job_data['justification'] = relevance_assessment.get('justification', "Relevance assessed.")
-                                 # Basic validation (optional, but good practice):
-                                if not isinstance(job_data['relevance'], (int, float)):
-                                    logging.warning(f"Invalid relevance value: {job_data['relevance']}")
-                                    job_data['relevance'] = 0.0
-                                if not isinstance(job_data['missing_skills'], list):
-                                    logging.warning(f"Invalid missing_skills: {job_data['missing_skills']}")
-                                    job_data['missing_skills'] = []
-                                if not isinstance(job_data['justification'], str):
-                                    logging.warning(f"Invalid justification: {job_data['justification']}")
-                                    job_data['justification'] = "Error: Could not assess relevance properly."
-                            elif isinstance(relevance_assessment, dict) and "error" in relevance_assessment:
-                                # Handle the "Invalid JSON" case specifically
-                                logging.warning(f"Invalid JSON from Gemini: {relevance_assessment['raw_text']}")
-                                job_data['relevance'] = 0.0  # Set default values
-                                job_data['missing_skills'] = []
-                                job_data['justification'] = "Error: Could not assess relevance due to invalid JSON response."
-
-                            else: # Unexpected return from Gemini
-                                logging.warning(f"Unexpected response from relevance assessment: {relevance_assessment}")
-                                job_data['relevance'] = 0.0
-                                job_data['missing_skills'] = []
-                                job_data['justification'] = "Error: Could not assess relevance (unexpected response)."
+                            # Scored later in batches with the other jobs (see _score_job_relevance)
+                            job_data['_description'] = job_description
 
                         except requests.exceptions.RequestException as e:
                             logging.warning(f"Failed to fetch job description from {job_data['url']}: {e}")
                             job_data['justification'] = f"Error: Could not fetch job description ({type(e).__name__})."
                         except Exception as e:
-                            logging.exception(f"Error during relevance assessment for {job_data['url']}: {e}")
-                            job_data['relevance'] = 0.0
-                            job_data['missing_skills'] = []
+                            logging.exception(f"Error reading job description from {job_data['url']}: {e}")
                             job_data['justification'] = "Error: Could not assess relevance (unexpected error)."
 
                     search_results.append(job_data) # Append even with errors
@@ -1674,6 +1933,43 @@ def scrape_job_site(job_title: str, job_location: str, resume_text: Optional[str
     return search_results
 
 
+def _score_job_relevance(jobs: List[Dict], resume_text: str) -> Dict:
+    """
+    Fills in relevance, missing_skills and justification for every job with a fetched description,
+    several jobs per Gemini call (see job_relevance.py). Returns the scorer's stats.
+    Blocks on the io pool, so it must not run on it.
+    """
+    model_name = config.JOB_RELEVANCE_MODEL
+    scorer = job_relevance.BatchScorer(
+        generate=lambda prompt: generate_gemini_response(prompt, response_format="json", model_name=model_name),
+        count_tokens=lambda text: token_counter.count_tokens(text, model_name),
+        batch_tokens=config.JOB_RELEVANCE_BATCH_TOKENS,
+        max_batch=config.JOB_RELEVANCE_MAX_BATCH,
+        max_concurrent=deep_research_rate_limits.get(model_name, {}).get("max_concurrent", DEFAULT_SUMMARY_CONCURRENCY),
+        executor=executors.io_executor(),
+    )
+    descriptions = {str(i): f"{job.get('title', 'N/A')} at {job.get('company', 'N/A')}\n{job['_description']}"
+                    for i, job in enumerate(jobs) if job.get('_description') is not None}
+
+    # Only the best lexical matches to the resume (BM25) are worth an LLM assessment
+    job_ids = list(descriptions)
+    keep = bm25.rank(list(descriptions.values()), resume_text, top_n=config.JOB_RELEVANCE_TOP_N,
+                     min_ratio=config.JOB_RELEVANCE_MIN_RATIO)
+    shortlisted = {job_ids[i]: descriptions[job_ids[i]] for i in keep}
+    for job_id in descriptions.keys() - shortlisted.keys():
+        jobs[int(job_id)].update({'relevance': 0.0, 'missing_skills': [],
+                                  'justification': "Not assessed: little overlap between the job description and the resume."})
+
+    for job_id, assessment in scorer.score(shortlisted, resume_text).items():
+        jobs[int(job_id)].update(assessment)
+    return dict(scorer.stats(), prefiltered=len(descriptions) - len(shortlisted))
+
+# Job sites scrape_jobs_endpoint knows how to scrape: base URL, params builder, card parser, display name
+JOB_SITES = {
+    "linkedin": ("https://www.linkedin.com/jobs/search", linkedin_params, parse_linkedin_job_card, "LinkedIn"),
+    "indeed": ("https://www.indeed.com/jobs", indeed_params, parse_indeed_job_card, "Indeed"),
+}
+
 @app.post("/api/scrape_jobs")
 async def scrape_jobs_endpoint(job_title: Optional[str] = Form(""), job_location: str = Form(...), resume: UploadFile = File(None),
                                job_experience: Optional[str] = Form(None)): # New parameter
@@ -1683,28 +1979,25 @@ async def scrape_jobs_endpoint(job_title: Optional[str] = Form(""), job_location
         resume_text = None
         if resume:
             resume_content = await resume.read()
-            resume_text = extract_text_from_resume(resume_content)
+            resume_text = await asyncio.wrap_future(executors.cpu_executor().submit(extract_text_from_resume, resume_content))
             if not resume_text:
                 raise HTTPException(status_code=400, detail="Could not extract text from resume.")
 
         all_job_results = []
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=config.MAX_WORKERS) as executor:
-            # Submit both scraping tasks *concurrently*
-            linkedin_future = executor.submit(scrape_job_site, job_title, job_location, resume_text,
-                                               "https://www.linkedin.com/jobs/search", linkedin_params, parse_linkedin_job_card, "LinkedIn", job_experience) # Pass experience
-            indeed_future = executor.submit(scrape_job_site, job_title, job_location, resume_text,
-                                             "https://www.indeed.com/jobs", indeed_params, parse_indeed_job_card, "Indeed", job_experience) # Pass experience
+        executor = executors.io_executor()
+        # Submit the job sites *concurrently*, skipping any whose circuit is open (recently blocked)
+        site_futures = {
+            executor.submit(scrape_job_site, job_title, job_location, resume_text, *JOB_SITES[site], job_experience): JOB_SITES[site][3]
+            for site in job_site_health.available(config.JOB_SEARCH_ENGINES) if site in JOB_SITES
+        }
 
-            # Get results, handling exceptions gracefully.  Don't stop if one fails.
-            try:
-                all_job_results.extend(linkedin_future.result())
-            except Exception as e:
-                logging.error(f"Error scraping LinkedIn: {e}")  # Log, but don't stop
+        # Get results, handling exceptions gracefully.  Don't stop if one fails.
+        for future, site_name in site_futures.items():
             try:
-                all_job_results.extend(indeed_future.result())
+                all_job_results.extend(future.result())
             except Exception as e:
-                logging.error(f"Error scraping Indeed: {e}") # Log, but don't stop
+                logging.error(f"Error scraping {site_name}: {e}")  # Log, but don't stop
 
         # ---  Filtering and Sorting ---
         # Filter by experience first
@@ -1713,6 +2006,12 @@ async def scrape_jobs_endpoint(job_title: Optional[str] = Form(""), job_location
         else:
             filtered_jobs = all_job_results
 
+        # Relevance only for the jobs that survived the filter, batched
+        relevance_stats = None
+        if resume_text:
+            relevance_stats = await asyncio.to_thread(_score_job_relevance, filtered_jobs, resume_text)
+        for job in all_job_results:
+            job.pop('_description', None)
 
         # Then, sort by experience level, then by relevance WITHIN each experience level
         experience_order = ['fresher', 'entry-level', 'mid-level', 'senior', 'executive', 'N/A']
@@ -1729,7 +2028,8 @@ async def scrape_jobs_endpoint(job_title: Optional[str] = Form(""), job_location
 
 
         if filtered_jobs:
-            return JSONResponse({'jobs': filtered_jobs, 'jobs_found': len(all_job_results)})
+            return JSONResponse({'jobs': filtered_jobs, 'jobs_found': len(all_job_results),
+                                 'relevance': relevance_stats})
         else:
             # More specific message if no jobs *after* filtering
             return JSONResponse({'jobs': [], 'jobs_found': len(all_job_results)}, status_code=200) # Return 200 OK even if no jobs are found after filtering
@@ -0,0 +1,133 @@
+"""Shared asyncio HTTP client for the routers.
+
+Every outbound page/search fetch made from an ``async def`` endpoint goes
+through this module so the event loop is never blocked on network I/O.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+import cassette
+import page_download
+
+# Pool limits for the process-wide client
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 30.0
+
+# Default per-request settings
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_CONCURRENCY = 10  # Max in-flight fetches per API request
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Returns the shared AsyncClient, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        limits = httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        )
+        _client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=DEFAULT_TIMEOUT,
+            limits=limits,
+            transport=cassette.async_transport(limits=limits),  # None (the default) unless CASSETTE_MODE is set
+        )
+    return _client
+
+
+async def close_client() -> None:
+    """Closes the shared client (called on app shutdown)."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+async def fetch(url: str, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None,
+                timeout: float = DEFAULT_TIMEOUT) -> Optional[httpx.Response]:
+    """GETs a URL with the shared client. Returns None on network errors."""
+    try:
+        return await get_client().get(url, params=params, headers=headers, timeout=timeout)
+    except httpx.HTTPError as e:
+        logging.error(f"Async fetch error for {url}: {e}")
+        return None
+
+
+async def fetch_text_page(url: str, headers: Optional[Dict[str, str]] = None, timeout: float = DEFAULT_TIMEOUT,
+                          max_bytes: int = page_download.DEFAULT_MAX_BYTES,
+                          text_chars: Optional[int] = None) -> Tuple[Optional[httpx.Response], bytes]:
+    """
+    Streams an HTML/text page. Non-text URLs and content types are skipped
+    before the body is read, and reading stops at ``max_bytes`` or once about
+    ``text_chars`` characters of visible text have arrived. Returns the
+    (closed) response, for its status and headers, and the body read so far.
+    """
+    if page_download.looks_binary_url(url):
+        logging.info(f"Skipping non-HTML resource: {url}")
+        return None, b""
+    try:
+        async with get_client().stream("GET", url, headers=headers, timeout=timeout) as response:
+            if response.status_code != 200:
+                return response, b""
+            content_type = response.headers.get("Content-Type")
+            if not page_download.is_text_content_type(content_type):
+                logging.info(f"Skipping {content_type} response (not a text page): {url}")
+                return response, b""
+            reader = page_download.CappedReader(max_bytes, text_chars)
+            async for chunk in response.aiter_bytes(page_download.CHUNK_SIZE):
+                if not reader.feed(chunk):
+                    break
+            return response, reader.body()
+    except httpx.HTTPError as e:
+        logging.error(f"Async fetch error for {url}: {e}")
+        return None, b""
+
+
+async def map_limited(func: Callable[[Any], Awaitable[Any]], items: Iterable[Any],
+                      limit: int = DEFAULT_CONCURRENCY, timeout: Optional[float] = None) -> List[Any]:
+    """
+    Runs ``func(item)`` for every item with at most ``limit`` running at once.
+
+    Results are returned in input order. A failed call yields None instead of
+    raising. If ``timeout`` elapses, unfinished calls are cancelled and yield
+    None. If the caller itself is cancelled (e.g. the client disconnected),
+    all outstanding calls are cancelled with it.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(item):
+        async with semaphore:
+            return await func(item)
+
+    tasks = [asyncio.ensure_future(run(item)) for item in items]
+    if not tasks:
+        return []
+    try:
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+    except asyncio.CancelledError:
+        for task in tasks:
+            task.cancel()
+        raise
+    for task in pending:
+        task.cancel()
+    if pending:
+        logging.warning(f"Cancelled {len(pending)} fetches after {timeout}s timeout")
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    results = []
+    for task in tasks:
+        if task in pending:
+            results.append(None)
+        elif task.exception() is not None:
+            logging.error(f"Async task failed: {task.exception()}")
+            results.append(None)
+        else:
+            results.append(task.result())
+    return results
@@ -0,0 +1,102 @@
+"""
+Benchmark: concurrent research-style requests, blocking vs. async fetching.
+
+Starts a local HTTP server that answers every request after a fixed delay,
+then runs N concurrent "API requests" on one event loop. Each request fetches
+a handful of pages, the way /api/online does. A probe coroutine measures how
+long the loop is stalled, i.e. how long a request like /login would wait.
+
+Usage:
+    python benchmarks/bench_async_fetch.py [--requests 20] [--pages 8] [--delay 0.2]
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import async_fetch  # noqa: E402
+
+PAGE = b"<html><head><title>t</title></head><body>" + b"<p>lorem ipsum</p>" * 200 + b"</body></html>"
+
+
+def start_server(delay):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(PAGE)))
+            self.end_headers()
+            self.wfile.write(PAGE)
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer.request_queue_size = 256
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def blocking_handler(urls):
+    """Mirrors the old handlers: requests + ThreadPoolExecutor inside async def."""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
+        futures = [executor.submit(requests.get, url, timeout=10) for url in urls]
+        return [f.result().status_code for f in concurrent.futures.as_completed(futures)]
+
+
+async def async_handler(urls):
+    responses = await async_fetch.map_limited(async_fetch.fetch, urls, limit=10)
+    return [r.status_code for r in responses if r is not None]
+
+
+async def probe(stop, lags):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - start - 0.01)
+
+
+async def run(handler, n_requests, urls):
+    stop = asyncio.Event()
+    lags = []
+    probe_task = asyncio.create_task(probe(stop, lags))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await asyncio.gather(*(handler(urls) for _ in range(n_requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+    await async_fetch.close_client()
+    return elapsed, max(lags) if lags else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20, help="concurrent API requests")
+    parser.add_argument("--pages", type=int, default=8, help="pages fetched per request")
+    parser.add_argument("--delay", type=float, default=0.2, help="server latency per page (s)")
+    args = parser.parse_args()
+
+    server = start_server(args.delay)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base}/page/{i}" for i in range(args.pages)]
+
+    print(f"{args.requests} concurrent requests x {args.pages} pages, {args.delay}s per page")
+    print(f"{'mode':<10}{'wall (s)':>10}{'req/s':>10}{'max loop stall (s)':>22}")
+    for name, handler in (("blocking", blocking_handler), ("async", async_handler)):
+        elapsed, stall = asyncio.run(run(handler, args.requests, urls))
+        print(f"{name:<10}{elapsed:>10.2f}{args.requests / elapsed:>10.2f}{stall:>22.3f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
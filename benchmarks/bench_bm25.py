@@ -0,0 +1,110 @@
+"""
+Benchmark: BM25 pre-filter (bm25.py) on thousands of documents.
+
+Builds an index over a synthetic corpus (Zipf-distributed vocabulary,
+job-description-sized documents) and times:
+
+    index    tokenizing the documents and building the postings arrays
+    short    scoring a search-style query (a few terms)
+    resume   scoring a resume-length query (hundreds of terms)
+    select   picking the top N from the scores
+
+For comparison it builds a straightforward pure-Python BM25 (one term
+counter per document, scored in a loop), times the same resume query on it
+and checks that both give the same scores. Index building is dominated by
+tokenizing, which both share, so the speedup column compares query time.
+
+Usage:
+    python benchmarks/bench_bm25.py [--docs 1000 5000 20000] [--words 300] [--repeat 5]
+"""
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bm25  # noqa: E402
+
+VOCABULARY_SIZE = 20000
+
+
+def make_corpus(docs, words, seed=0):
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(VOCABULARY_SIZE)]
+    weights = [1.0 / (rank + 1) for rank in range(VOCABULARY_SIZE)]  # Zipf: a few very common terms, a long tail
+    documents = [" ".join(rng.choices(vocabulary, weights, k=rng.randint(words // 2, words * 3 // 2)))
+                 for _ in range(docs)]
+    short_query = " ".join(rng.choices(vocabulary[50:2000], k=4))
+    resume_query = " ".join(rng.choices(vocabulary, weights, k=600))
+    return documents, short_query, resume_query
+
+
+class PythonBM25:
+    """Reference BM25, one Counter per document."""
+
+    def __init__(self, documents, k1=bm25.K1, b=bm25.B):
+        self.k1, self.b = k1, b
+        self.documents = [Counter(bm25.tokenize(document)) for document in documents]
+        self.lengths = [sum(counts.values()) for counts in self.documents]
+        self.average_length = sum(self.lengths) / len(self.lengths)
+        self.df = Counter(term for counts in self.documents for term in counts)
+
+    def scores(self, query):
+        query_counts = Counter(term for term in bm25.tokenize(query) if term in self.df)
+        idf = {term: math.log1p((len(self.documents) - self.df[term] + 0.5) / (self.df[term] + 0.5))
+               for term in query_counts}
+        scores = []
+        for counts, length in zip(self.documents, self.lengths):
+            score = 0.0
+            for term, query_tf in query_counts.items():
+                tf = counts.get(term)
+                if tf:
+                    score += (idf[term] * tf * (self.k1 + 1)
+                              / (tf + self.k1 * (1 - self.b + self.b * length / self.average_length))
+                              * query_tf * (bm25.K3 + 1) / (query_tf + bm25.K3))
+            scores.append(score)
+        return scores
+
+
+def timed(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, nargs="+", default=[1000, 5000, 20000], help="corpus sizes")
+    parser.add_argument("--words", type=int, default=300, help="average words per document")
+    parser.add_argument("--top-n", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (median is reported)")
+    args = parser.parse_args()
+
+    print(f"{'docs':>7}{'index ms':>10}{'short ms':>10}{'resume ms':>11}{'select ms':>11}"
+          f"{'py index ms':>13}{'py resume ms':>14}{'speedup':>9}{'max diff':>10}")
+    for docs in args.docs:
+        documents, short_query, resume_query = make_corpus(docs, args.words)
+        index_time, index = timed(lambda: bm25.BM25Index(documents), args.repeat)
+        short_time, _ = timed(lambda: index.scores(short_query), args.repeat)
+        resume_time, scores = timed(lambda: index.scores(resume_query), args.repeat)
+        select_time, _ = timed(lambda: bm25.select(scores, top_n=args.top_n, min_ratio=0.2), args.repeat)
+        python_index_time, python_index = timed(lambda: PythonBM25(documents), 1)
+        python_time, reference = timed(lambda: python_index.scores(resume_query), 1)
+        max_diff = float(np.max(np.abs(scores - np.array(reference))))
+        print(f"{docs:>7}{index_time * 1000:>10.1f}{short_time * 1000:>10.2f}{resume_time * 1000:>11.2f}"
+              f"{select_time * 1000:>11.2f}{python_index_time * 1000:>13.1f}{python_time * 1000:>14.1f}"
+              f"{python_time / resume_time:>8.0f}x{max_diff:>10.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: HTML-to-text extraction backends over a corpus of saved pages.
+
+For every available backend (see extraction.py) this reports throughput in
+pages/s and MB/s, and output parity against the BeautifulSoup baseline
+(word-sequence similarity of the extracted text, 1.0 = identical).
+
+Usage:
+    python benchmarks/bench_extraction.py [--corpus benchmarks/corpus] [--repeat 20]
+
+Any directory of saved *.html files can be used as the corpus.
+"""
+import argparse
+import difflib
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import extraction  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+
+def load_corpus(path):
+    pages = {}
+    for file_path in sorted(glob.glob(os.path.join(path, "*.html"))):
+        with open(file_path, "rb") as f:
+            pages[os.path.basename(file_path)] = f.read().decode("utf-8", errors="replace")
+    return pages
+
+
+def parity(a, b):
+    return difflib.SequenceMatcher(None, a.split(), b.split(), autojunk=False).ratio()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="directory of saved .html pages")
+    parser.add_argument("--repeat", type=int, default=20, help="passes over the corpus per backend")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus)
+    if not pages:
+        sys.exit(f"No .html files found in {args.corpus}")
+    total_mb = sum(len(html.encode("utf-8")) for html in pages.values()) / 1e6
+    baseline = {name: extraction.extract_text(html, backend="bs4") for name, html in pages.items()}
+
+    print(f"{len(pages)} pages, {total_mb:.2f} MB, {args.repeat} passes")
+    print(f"{'backend':<12}{'pages/s':>10}{'MB/s':>10}{'speedup':>10}{'min parity':>12}{'mean parity':>13}")
+    bs4_rate = None
+    for backend in ["bs4"] + [b for b in extraction.available_backends() if b != "bs4"]:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            outputs = {name: extraction.extract_text(html, backend=backend) for name, html in pages.items()}
+        elapsed = time.perf_counter() - start
+        rate = len(pages) * args.repeat / elapsed
+        bs4_rate = bs4_rate or rate
+        scores = {name: parity(baseline[name], outputs[name]) for name in pages}
+        print(f"{backend:<12}{rate:>10.1f}{total_mb * args.repeat / elapsed:>10.2f}{rate / bs4_rate:>9.1f}x"
+              f"{min(scores.values()):>12.3f}{sum(scores.values()) / len(scores):>13.3f}")
+        worst = [name for name, score in scores.items() if score < 0.99]
+        if worst:
+            print(f"{'':<12}below 0.99: {', '.join(f'{n} ({scores[n]:.3f})' for n in worst)}")
+
+
+if __name__ == "__main__":
+    main()
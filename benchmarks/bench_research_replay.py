@@ -0,0 +1,129 @@
+"""
+Benchmark: the full /api/online and /api/deep_research flow, offline.
+
+Runs the served app (main.py) in-process with every outbound HTTP and LLM
+call answered from a cassette (see cassette.py): the search result page, the
+page downloads and the Groq completions. Responses are replayed with their
+recorded latency, so the timings cover the pipeline's own work (parsing,
+extraction, ranking, dedup, concurrency) on top of realistic network waits.
+Page, search and LLM caches are emptied before every round unless --warm is given.
+LLM rate limits are off unless --rate-limits is given, since back-to-back
+rounds would otherwise mostly measure waiting for the Groq quota.
+
+Usage:
+    python benchmarks/bench_research_replay.py [--rounds 5] [--latency-scale 1.0] [--latency 0]
+    python benchmarks/bench_research_replay.py --record --cassette my.json --query "..."
+
+The bundled cassette (benchmarks/fixtures/cassettes/research.json) is
+synthetic: a saved DuckDuckGo result page, generated article pages and canned
+completions. --record runs each endpoint once against the live services
+(needs network and GROQ_API_KEY) and writes a new cassette to replay later.
+Exits non-zero if any request fails or a call is missing from the cassette.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "cassettes", "research.json")
+DEFAULT_QUERY = "solid state battery breakthroughs"  # The query the bundled cassette was made for
+
+
+def configure(args, cache_dir):
+    # cassette.py and the caches read their settings at import time
+    os.environ["CASSETTE_MODE"] = "record" if args.record else "replay"
+    os.environ["CASSETTE_PATH"] = args.cassette
+    os.environ["CASSETTE_LATENCY_SCALE"] = str(args.latency_scale)
+    if args.latency is not None:
+        os.environ["CASSETTE_LATENCY"] = str(args.latency)
+    os.environ["PAGE_CACHE_PATH"] = os.path.join(cache_dir, "page_cache.db")
+    os.environ["SEARCH_CACHE_PATH"] = os.path.join(cache_dir, "search_cache.db")
+    os.environ["RATE_LIMIT_PATH"] = os.path.join(cache_dir, "rate_limits.db")
+    os.environ["LLM_CACHE_PATH"] = os.path.join(cache_dir, "llm_cache.db")
+    os.environ.setdefault("GROQ_API_KEY", "replay")
+
+
+def reset_caches(research, cache_dir, round_no):
+    from llm_cache import LLMCache
+    from memory_cache import MemoryCache
+    from page_cache import PageCache
+    from search_cache import SearchCache
+    research.page_cache = PageCache(os.path.join(cache_dir, f"page_cache_{round_no}.db"),
+                                    memory=MemoryCache(max_bytes=research.MEMORY_CACHE_MAX_BYTES))
+    research.search_cache = SearchCache(os.path.join(cache_dir, f"search_cache_{round_no}.db"))
+    research.llm_cache = LLMCache(os.path.join(cache_dir, f"llm_cache_{round_no}.db"))
+
+
+async def run(args, cache_dir):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import httpx
+    import cassette
+    import main
+    from routers import research
+
+    if not args.rate_limits:
+        research.llm_limiter.limits = {}
+    requests_by_endpoint = {
+        "online": {"query": args.query, "search_engines": ["duckduckgo"]},
+        "deep_research": {"query": args.query, "engines": ["duckduckgo"], "max_iterations": 3,
+                          "options": ["extract_links", "extract_emails"]},
+    }
+    timings = {endpoint: [] for endpoint in args.endpoint}
+    failures = 0
+    rounds = 1 if args.record else args.rounds
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for round_no in range(rounds):
+            if not args.warm:
+                reset_caches(research, cache_dir, round_no)
+            cassette.get_cassette().rewind()
+            for endpoint in args.endpoint:
+                start = time.perf_counter()
+                response = await client.post(f"/api/{endpoint}", json=requests_by_endpoint[endpoint])
+                timings[endpoint].append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    failures += 1
+                    print(f"{endpoint}: HTTP {response.status_code} {response.text[:200]}")
+                elif round_no == 0:
+                    body = response.json()
+                    refs = body.get("references", body.get("links", []))
+                    print(f"{endpoint}: {len(refs)} sources, dedup skipped "
+                          f"{body['dedup']['duplicates_skipped']}, {len(body['explanation'])} chars of report")
+
+    print(f"\n{'endpoint':<15}{'rounds':>7}{'mean s':>9}{'p50 s':>9}{'min s':>9}{'max s':>9}")
+    for endpoint, samples in timings.items():
+        print(f"{endpoint:<15}{len(samples):>7}{statistics.mean(samples):>9.3f}{statistics.median(samples):>9.3f}"
+              f"{min(samples):>9.3f}{max(samples):>9.3f}")
+    stats = cassette.get_cassette().stats()
+    print(f"\ncassette: {stats}")
+    if args.record:
+        cassette.get_cassette().save()
+    return failures + stats["misses"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cassette", default=FIXTURE, help="cassette file to replay (or write with --record)")
+    parser.add_argument("--query", default=DEFAULT_QUERY)
+    parser.add_argument("--endpoint", action="append", choices=["online", "deep_research"],
+                        help="only benchmark these endpoints (default: both)")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier on recorded latencies")
+    parser.add_argument("--latency", type=float, help="fixed replay latency per call in seconds (0 = CPU only)")
+    parser.add_argument("--warm", action="store_true", help="keep page/search/LLM caches between rounds")
+    parser.add_argument("--rate-limits", action="store_true", help="apply the LLM RPM/TPM limits")
+    parser.add_argument("--record", action="store_true", help="record a new cassette from the live services")
+    args = parser.parse_args()
+    args.endpoint = args.endpoint or ["online", "deep_research"]
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        configure(args, cache_dir)
+        problems = asyncio.run(run(args, cache_dir))
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: search engine result parsers over saved result pages.
+
+For every engine registered in search_engines.py this parses the saved
+fixture page (benchmarks/fixtures/search_engines/<engine>.html) and compares
+the URLs with the expected list in <engine>.json. It reports parses/s for
+the plugin's SoupStrainer parser and for a full-tree BeautifulSoup parse, to
+show how much the strainer saves.
+
+Usage:
+    python benchmarks/bench_search_parsers.py [--repeat 50] [--engine google]
+
+Exits non-zero if any parser's output differs from its fixture, so it can
+double as an offline correctness check after a selector change. To refresh
+a fixture, save the engine's live result page as <engine>.html and update
+the expected URLs in <engine>.json.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import search_engines  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "search_engines")
+
+
+def load_fixture(name):
+    html_path = os.path.join(FIXTURES, f"{name}.html")
+    if not os.path.exists(html_path):
+        return None, None
+    with open(html_path, "rb") as f:
+        html = f.read().decode("utf-8", errors="replace")
+    with open(os.path.join(FIXTURES, f"{name}.json")) as f:
+        return html, json.load(f)
+
+
+def full_tree_parse(html):
+    return BeautifulSoup(html, "html.parser")
+
+
+def rate(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return repeat / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50, help="parses per engine")
+    parser.add_argument("--engine", action="append", help="only benchmark these engines")
+    args = parser.parse_args()
+
+    names = args.engine or list(search_engines.ENGINES)
+    failures = 0
+    print(f"{'engine':<12}{'KB':>7}{'urls':>6}{'strained/s':>12}{'full/s':>9}{'speedup':>9}  result")
+    for name in names:
+        engine = search_engines.get_engine(name)
+        html, fixture = load_fixture(name)
+        if engine is None or html is None:
+            print(f"{name:<12}  no plugin or fixture")
+            failures += 1
+            continue
+        urls = engine.parse(html, fixture["query"])
+        expected = fixture["expected"]
+        strained = rate(lambda: engine.parse(html, fixture["query"]), args.repeat)
+        full = rate(lambda: full_tree_parse(html), args.repeat)
+        if urls == expected:
+            result = "ok"
+        else:
+            failures += 1
+            missing = [u for u in expected if u not in urls]
+            extra = [u for u in urls if u not in expected]
+            result = f"MISMATCH missing={missing} extra={extra}" if missing or extra else "MISMATCH (order)"
+        print(f"{name:<12}{len(html) / 1024:>7.1f}{len(urls):>6}{strained:>12.1f}{full:>9.1f}{strained / full:>8.1f}x  {result}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
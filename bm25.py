@@ -0,0 +1,108 @@
+"""In-process BM25 ranking, vectorized with NumPy.
+
+Used as a cheap pre-filter before anything reaches an LLM: job descriptions
+are ranked against the resume, and page snippets against the query. Only the
+best (``top_n``, or within ``min_ratio`` of the best score) go on.
+
+``BM25Index`` tokenizes each document once (lowercased words, stopwords
+dropped) and stores the postings as flat arrays sorted by term, with every
+entry's BM25 weight precomputed:
+
+    idf(t) * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len / avg_len))
+
+Scoring a query gathers the postings of its terms and sums them per
+document with one ``np.bincount``. The cost is proportional to the
+postings touched, not the collection size, so even a resume-length query
+against thousands of documents takes milliseconds. Repeated query terms
+count with the usual k3 saturation. See benchmarks/bench_bm25.py.
+"""
+import re
+from collections import Counter
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+K1 = 1.5
+B = 0.75
+K3 = 8.0                        # Query term frequency saturation (matters for long queries like a resume)
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or our that the this to was we what when "
+    "where which who why will with you your vs versus about into over".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [word for word in _WORD.findall(text.lower()) if len(word) > 1 and word not in STOPWORDS]
+
+
+class BM25Index:
+    """BM25 scores of a fixed list of documents against any number of queries."""
+
+    def __init__(self, documents: Sequence[str], k1: float = K1, b: float = B):
+        self.size = len(documents)
+        self.vocabulary = {}
+        term_ids: List[int] = []
+        term_freqs: List[int] = []
+        terms_per_doc = np.zeros(self.size, dtype=np.int64)
+        lengths = np.zeros(self.size, dtype=np.float64)
+        for i, document in enumerate(documents):
+            tokens = tokenize(document or "")
+            counts = Counter(tokens)
+            lengths[i] = len(tokens)
+            terms_per_doc[i] = len(counts)
+            term_ids.extend(self.vocabulary.setdefault(term, len(self.vocabulary)) for term in counts)
+            term_freqs.extend(counts.values())
+
+        terms = np.array(term_ids, dtype=np.int64)
+        tf = np.array(term_freqs, dtype=np.float64)
+        docs = np.repeat(np.arange(self.size), terms_per_doc)
+        df = np.bincount(terms, minlength=len(self.vocabulary))
+        idf = np.log1p((self.size - df + 0.5) / (df + 0.5))
+        average_length = lengths.mean() if self.size and lengths.any() else 1.0
+        norm = k1 * (1 - b + b * lengths / average_length)
+        weights = idf[terms] * tf * (k1 + 1) / (tf + norm[docs])
+
+        order = np.argsort(terms, kind="stable")  # Postings grouped by term
+        self._docs = docs[order]
+        self._weights = weights[order]
+        self._offsets = np.concatenate(([0], np.cumsum(df)))
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for ``query`` (0 where no query term occurs)."""
+        counts = Counter(term for term in tokenize(query) if term in self.vocabulary)
+        if not counts or not self.size:
+            return np.zeros(self.size)
+        ids = np.fromiter((self.vocabulary[term] for term in counts), dtype=np.int64, count=len(counts))
+        query_tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        query_weights = query_tf * (K3 + 1) / (query_tf + K3)
+
+        starts = self._offsets[ids]
+        spans = self._offsets[ids + 1] - starts
+        # Positions of every posting of every query term, without a Python loop
+        span_starts = np.repeat(starts - (np.cumsum(spans) - spans), spans)
+        postings = span_starts + np.arange(spans.sum())
+        return np.bincount(self._docs[postings], weights=self._weights[postings] * np.repeat(query_weights, spans),
+                           minlength=self.size)
+
+
+def select(scores: Sequence[float], top_n: Optional[int] = None, min_ratio: Optional[float] = None) -> List[int]:
+    """
+    Indices of the documents to keep, best first: at most ``top_n``, and only
+    those scoring at least ``min_ratio`` times the best score. If nothing
+    scored above 0 there is no signal to filter on and only ``top_n`` applies.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(-scores, kind="stable")
+    best = scores.max() if scores.size else 0.0
+    if min_ratio is not None and best > 0:
+        order = order[scores[order] >= best * min_ratio]
+    if top_n is not None:
+        order = order[:top_n]
+    return order.tolist()
+
+
+def rank(documents: Sequence[str], query: str, top_n: Optional[int] = None,
+         min_ratio: Optional[float] = None) -> List[int]:
+    """Builds an index over ``documents`` and returns the indices ``select`` keeps for ``query``."""
+    return select(BM25Index(documents).scores(query), top_n, min_ratio)
@@ -0,0 +1,352 @@
+"""Record/replay of outbound HTTP and LLM calls.
+
+With ``CASSETTE_MODE=record`` every outbound call is performed for real and
+its response is saved to the cassette file at ``CASSETTE_PATH``. With
+``CASSETTE_MODE=replay`` the calls are answered from that file and nothing
+touches the network, so a research request runs offline and repeatably.
+
+Calls are hooked at the transport layer:
+
+    requests   ``wrap_adapter`` wraps the http_pool session's adapter (app.py)
+    httpx      ``async_transport`` / ``sync_transport`` back the async_fetch
+               client and the Groq clients (routers)
+    Gemini     ``llm_call`` wraps the SDK call in generate_gemini_response,
+               which has no pluggable HTTP layer
+
+A replayed call matches a recording by method, URL and request body. If the
+body differs (e.g. an LLM prompt built from pages that finished in a
+different order) it falls back to the next unused recording for the same
+method and URL. Replay latency is the recorded duration times
+``CASSETTE_LATENCY_SCALE``, or a fixed ``CASSETTE_LATENCY`` in seconds.
+"""
+import asyncio
+import atexit
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import httpx
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+OFF, RECORD, REPLAY = "off", "record", "replay"
+
+DEFAULT_MODE = os.getenv("CASSETTE_MODE", OFF).lower()
+DEFAULT_PATH = os.getenv("CASSETTE_PATH", "cassettes/research.json")
+DEFAULT_LATENCY = os.getenv("CASSETTE_LATENCY")            # Fixed seconds per call; unset = recorded duration
+DEFAULT_LATENCY_SCALE = float(os.getenv("CASSETTE_LATENCY_SCALE", 1.0))
+
+# Transport-level headers that no longer describe the stored (decoded) body, plus cookies
+DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding", "connection", "set-cookie")
+
+
+def _request_key(method: str, url: str, body: Optional[bytes]) -> str:
+    digest = hashlib.sha256(f"{method.upper()} {url}\n".encode("utf-8"))
+    digest.update(body or b"")
+    return digest.hexdigest()
+
+
+def _encode_body(body: bytes) -> Dict[str, str]:
+    try:
+        return {"body": body.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"body_b64": base64.b64encode(body).decode("ascii")}
+
+
+def _decode_body(interaction: Dict) -> bytes:
+    if "body_b64" in interaction:
+        return base64.b64decode(interaction["body_b64"])
+    return interaction.get("body", "").encode("utf-8")
+
+
+def _kept_headers(headers) -> Dict[str, str]:
+    return {name: value for name, value in headers.items() if name.lower() not in DROPPED_HEADERS}
+
+
+class Cassette:
+    """A JSON file of recorded interactions, shared by every hook in the process."""
+
+    def __init__(self, path: str = DEFAULT_PATH, mode: str = DEFAULT_MODE, latency: Optional[float] = None,
+                 latency_scale: float = DEFAULT_LATENCY_SCALE):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.interactions: List[Dict] = []
+        self._used = set()       # Indexes already replayed
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._stats = {"recorded": 0, "replayed": 0, "fallbacks": 0, "misses": 0}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.interactions = json.load(f).get("interactions", [])
+        elif mode == REPLAY:
+            raise FileNotFoundError(f"Cassette not found: {path}")
+        logging.info(f"Cassette {mode}: {path} ({len(self.interactions)} interactions)")
+
+    def find(self, method: str, url: str, body: Optional[bytes]) -> Optional[Dict]:
+        """Returns the recording to replay for a request, or None if there is none."""
+        key = _request_key(method, url, body)
+        with self._lock:
+            exact = [i for i, rec in enumerate(self.interactions) if rec["key"] == key]
+            if exact:
+                index = next((i for i in exact if i not in self._used), exact[-1])
+                self._stats["replayed"] += 1
+            else:
+                same_url = [i for i, rec in enumerate(self.interactions)
+                            if rec["method"] == method.upper() and rec["url"] == url]
+                index = next((i for i in same_url if i not in self._used), same_url[-1] if same_url else None)
+                if index is None:
+                    self._stats["misses"] += 1
+                    logging.warning(f"No cassette entry for {method} {url}")
+                    return None
+                self._stats["fallbacks"] += 1
+            self._used.add(index)
+            return self.interactions[index]
+
+    def record(self, method: str, url: str, body: Optional[bytes], status: int, headers,
+               response_body: bytes, elapsed: float) -> None:
+        interaction = {"key": _request_key(method, url, body), "method": method.upper(), "url": url,
+                       "status": status, "headers": _kept_headers(headers), "elapsed": round(elapsed, 4)}
+        interaction.update(_encode_body(response_body))
+        with self._lock:
+            self.interactions.append(interaction)
+            self._stats["recorded"] += 1
+            self._dirty = True
+
+    def delay(self, interaction: Dict) -> float:
+        """Seconds to wait before handing back a replayed response."""
+        if self.latency is not None:
+            return self.latency
+        return interaction.get("elapsed", 0.0) * self.latency_scale
+
+    def save(self) -> None:
+        """Writes the cassette if anything was recorded (atomically, so a crash can't truncate it)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"interactions": list(self.interactions)}
+            self._dirty = False
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        logging.info(f"Cassette saved: {self.path} ({len(data['interactions'])} interactions)")
+
+    def rewind(self) -> None:
+        """Lets every recording be replayed again, as at startup."""
+        with self._lock:
+            self._used.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"mode": self.mode, "path": self.path, "interactions": len(self.interactions), **self._stats}
+
+
+_cassette: Optional[Cassette] = None
+
+
+def _from_env() -> Optional[Cassette]:
+    if DEFAULT_MODE == OFF:
+        return None
+    latency = float(DEFAULT_LATENCY) if DEFAULT_LATENCY else None
+    return Cassette(DEFAULT_PATH, DEFAULT_MODE, latency=latency)
+
+
+def get_cassette() -> Optional[Cassette]:
+    """Returns the active cassette, or None when record/replay is off."""
+    return _cassette
+
+
+_cassette = _from_env()
+if _cassette is not None:
+    atexit.register(_cassette.save)
+
+
+# --- requests (app.py's pooled session) ---
+
+def _requests_body(body) -> Optional[bytes]:
+    if body is None:
+        return None
+    return body.encode("utf-8") if isinstance(body, str) else bytes(body)
+
+
+def _build_requests_response(request: requests.PreparedRequest, interaction: Dict) -> requests.Response:
+    response = requests.Response()
+    response.status_code = interaction["status"]
+    response.headers = CaseInsensitiveDict(interaction["headers"])
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.raw = _BodyReader(_decode_body(interaction))
+    response.url = request.url
+    response.request = request
+    response.reason = "Replayed"
+    return response
+
+
+class _BodyReader:
+    """Minimal stand-in for urllib3's response as used by requests.Response."""
+
+    def __init__(self, body: bytes):
+        self._body = body
+        self._pos = 0
+
+    def read(self, amt=None, **kwargs) -> bytes:
+        end = len(self._body) if amt is None else self._pos + amt
+        chunk = self._body[self._pos:end]
+        self._pos += len(chunk)
+        return chunk
+
+    def close(self) -> None:
+        pass
+
+    def release_conn(self) -> None:
+        pass
+
+
+class CassetteAdapter(BaseAdapter):
+    """Records responses from the wrapped adapter, or replays them without it."""
+
+    def __init__(self, adapter: BaseAdapter, cassette: Cassette):
+        super().__init__()
+        self.adapter = adapter
+        self.cassette = cassette
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        body = _requests_body(request.body)
+        if self.cassette.mode == REPLAY:
+            interaction = self.cassette.find(request.method, request.url, body)
+            if interaction is None:
+                raise requests.exceptions.ConnectionError(f"Not in cassette: {request.method} {request.url}",
+                                                          request=request)
+            time.sleep(self.cassette.delay(interaction))
+            return _build_requests_response(request, interaction)
+        start = time.perf_counter()
+        response = self.adapter.send(request, stream=stream, timeout=timeout, verify=verify, cert=cert,
+                                     proxies=proxies)
+        content = response.content  # Reads the whole (decoded) body
+        self.cassette.record(request.method, request.url, body, response.status_code, response.headers,
+                             content, time.perf_counter() - start)
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+def wrap_adapter(adapter: BaseAdapter) -> BaseAdapter:
+    """Wraps a requests adapter when a cassette is active; returns it unchanged otherwise."""
+    return CassetteAdapter(adapter, _cassette) if _cassette is not None else adapter
+
+
+# --- httpx (async_fetch and the Groq clients) ---
+
+def _build_httpx_response(interaction: Dict) -> httpx.Response:
+    return httpx.Response(interaction["status"], headers=interaction["headers"], content=_decode_body(interaction))
+
+
+def _replay_httpx(cassette: Cassette, request: httpx.Request) -> Dict:
+    interaction = cassette.find(request.method, str(request.url), request.content)
+    if interaction is None:
+        raise httpx.ConnectError(f"Not in cassette: {request.method} {request.url}", request=request)
+    return interaction
+
+
+class CassetteAsyncTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport, cassette: Cassette):
+        self.transport = transport
+        self.cassette = cassette
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        if self.cassette.mode == REPLAY:
+            interaction = _replay_httpx(self.cassette, request)
+            await asyncio.sleep(self.cassette.delay(interaction))
+            return _build_httpx_response(interaction)
+        start = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        content = await response.aread()
+        await response.aclose()
+        self.cassette.record(request.method, str(request.url), request.content, response.status_code,
+                             response.headers, content, time.perf_counter() - start)
+        return httpx.Response(response.status_code, headers=_kept_headers(response.headers), content=content)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class CassetteTransport(httpx.BaseTransport):
+    def __init__(self, transport: httpx.BaseTransport, cassette: Cassette):
+        self.transport = transport
+        self.cassette = cassette
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        if self.cassette.mode == REPLAY:
+            interaction = _replay_httpx(self.cassette, request)
+            time.sleep(self.cassette.delay(interaction))
+            return _build_httpx_response(interaction)
+        start = time.perf_counter()
+        response = self.transport.handle_request(request)
+        content = response.read()
+        response.close()
+        self.cassette.record(request.method, str(request.url), request.content, response.status_code,
+                             response.headers, content, time.perf_counter() - start)
+        return httpx.Response(response.status_code, headers=_kept_headers(response.headers), content=content)
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+def async_transport(**kwargs) -> Optional[httpx.AsyncBaseTransport]:
+    """An AsyncHTTPTransport(**kwargs) wrapped for the active cassette, or None when off."""
+    if _cassette is None:
+        return None
+    return CassetteAsyncTransport(httpx.AsyncHTTPTransport(**kwargs), _cassette)
+
+
+def sync_transport(**kwargs) -> Optional[httpx.BaseTransport]:
+    """An HTTPTransport(**kwargs) wrapped for the active cassette, or None when off."""
+    if _cassette is None:
+        return None
+    return CassetteTransport(httpx.HTTPTransport(**kwargs), _cassette)
+
+
+def async_http_client() -> Optional[httpx.AsyncClient]:
+    """httpx client for SDKs that accept one (AsyncGroq); None leaves the SDK's default."""
+    transport = async_transport()
+    return httpx.AsyncClient(transport=transport) if transport is not None else None
+
+
+def http_client() -> Optional[httpx.Client]:
+    """Sync counterpart of ``async_http_client`` (Groq)."""
+    transport = sync_transport()
+    return httpx.Client(transport=transport) if transport is not None else None
+
+
+# --- SDK calls without a pluggable HTTP layer (Gemini) ---
+
+def llm_call(provider: str, model: str, prompt: str, call: Callable[[], str]) -> str:
+    """Runs ``call()`` (returning the response text) through the cassette, keyed like a POST."""
+    if _cassette is None:
+        return call()
+    url = f"llm://{provider}/{model}"
+    body = prompt.encode("utf-8")
+    if _cassette.mode == REPLAY:
+        interaction = _cassette.find("POST", url, body)
+        if interaction is None:
+            raise ConnectionError(f"Not in cassette: {provider} {model}")
+        time.sleep(_cassette.delay(interaction))
+        return _decode_body(interaction).decode("utf-8")
+    start = time.perf_counter()
+    text = call()
+    _cassette.record("POST", url, body, 200, {}, text.encode("utf-8"), time.perf_counter() - start)
+    return text
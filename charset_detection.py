@@ -0,0 +1,119 @@
+"""Layered, cheap-first character encoding detection for fetched pages.
+
+Detection stops at the first layer that gives a usable answer:
+
+    bom          byte order mark at the start of the body
+    header       charset parameter of the HTTP Content-Type header
+    meta         <meta charset> / http-equiv Content-Type in the first META_SCAN_BYTES
+    utf8         the prefix is valid UTF-8 (covers plain ASCII too)
+    statistical  chardet on the first STATISTICAL_SCAN_BYTES only
+    default      UTF-8
+
+Per-layer counters show how often the expensive statistical fallback runs.
+"""
+import codecs
+import logging
+import re
+import threading
+from typing import Dict, Optional, Tuple
+
+import chardet
+
+META_SCAN_BYTES = 4096
+UTF8_SCAN_BYTES = 64 * 1024
+STATISTICAL_SCAN_BYTES = 32 * 1024
+DEFAULT_ENCODING = "utf-8"
+LAYERS = ("bom", "header", "meta", "utf8", "statistical", "default")
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+_HEADER_CHARSET = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.IGNORECASE)
+_META_CHARSET = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?\s*([\w.:-]+)", re.IGNORECASE)
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, int] = {layer: 0 for layer in LAYERS}
+
+
+def _valid_codec(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name.strip()).name
+    except LookupError:
+        logging.debug(f"Ignoring unknown charset: {name}")
+        return None
+
+
+def _is_utf8(prefix: bytes, truncated: bool) -> bool:
+    try:
+        prefix.decode("utf-8")
+        return True
+    except UnicodeDecodeError as e:
+        # A multi-byte sequence cut off by the prefix boundary is still valid UTF-8
+        return truncated and e.start >= len(prefix) - 3 and e.reason == "unexpected end of data"
+
+
+def _record(layer: str) -> None:
+    with _stats_lock:
+        _stats[layer] += 1
+
+
+def detect_encoding(content: bytes, content_type: Optional[str] = None) -> Tuple[str, str]:
+    """Returns (encoding, layer) for a response body."""
+    for bom, encoding in _BOMS:
+        if content.startswith(bom):
+            _record("bom")
+            return encoding, "bom"
+
+    if content_type:
+        match = _HEADER_CHARSET.search(content_type)
+        encoding = _valid_codec(match.group(1)) if match else None
+        if encoding:
+            _record("header")
+            return encoding, "header"
+
+    match = _META_CHARSET.search(content[:META_SCAN_BYTES])
+    encoding = _valid_codec(match.group(1).decode("ascii", errors="ignore")) if match else None
+    if encoding:
+        _record("meta")
+        return encoding, "meta"
+
+    if _is_utf8(content[:UTF8_SCAN_BYTES], len(content) > UTF8_SCAN_BYTES):
+        _record("utf8")
+        return "utf-8", "utf8"
+
+    encoding = _valid_codec(chardet.detect(content[:STATISTICAL_SCAN_BYTES])["encoding"])
+    if encoding:
+        _record("statistical")
+        return encoding, "statistical"
+
+    _record("default")
+    return DEFAULT_ENCODING, "default"
+
+
+def detection_stats() -> Dict:
+    """Returns how many bodies each layer decided, plus the statistical share."""
+    with _stats_lock:
+        counts = dict(_stats)
+    total = sum(counts.values())
+    return {
+        "total": total,
+        "layers": counts,
+        "statistical_ratio": round(counts["statistical"] / total, 3) if total else 0.0,
+    }
+
+
+def decode_body(content: bytes, content_type: Optional[str] = None) -> str:
+    """Decodes a response body using the layered detector, never raising."""
+    encoding, layer = detect_encoding(content, content_type)
+    logging.debug(f"Detected encoding: {encoding} (via {layer})")
+    try:
+        return content.decode(encoding, errors="replace")
+    except (UnicodeDecodeError, LookupError):
+        logging.warning(f"Decoding failed with {encoding}. Trying UTF-8.")
+        return content.decode("utf-8", errors="replace")
@@ -0,0 +1,129 @@
+"""Packs source snippets into a prompt's token budget, most relevant first.
+
+Prompts used to be built by joining the first N pages and cutting the
+result at a fixed character count. That wasted most of a large context
+window, and on a small one it could still overflow and cut a source
+mid-sentence. ``pack`` instead:
+
+    1. scores every snippet against the query with BM25 (or takes the
+       caller's scores) and, given ``min_ratio``, drops snippets scoring
+       below that share of the best one
+    2. walks them best first, adding each whole snippet whose tokens still
+       fit in the budget (a snippet that doesn't fit is skipped and smaller,
+       lower-ranked ones may still fill the gap)
+    3. trims a snippet at a sentence boundary only if it is larger than the
+       whole budget on its own
+
+Token counts come from token_counter, so the budget is in the model's
+tokens. ``prompt_budget`` derives the budget from the model's context window,
+the prompt template around the sources and the reserved completion size.
+Every pack reports how much of its budget it used.
+"""
+import logging
+import re
+from typing import Dict, List, Optional, Sequence
+
+import bm25
+import token_counter
+from rate_limiter import DEFAULT_COMPLETION_TOKENS
+
+MODEL_CONTEXT_WINDOWS = {
+    "llama-3.3-70b-versatile": 131_072,
+    "gemini-2.0-flash": 1_048_576,
+    "gemini-2.0-flash-thinking-exp-01-21": 1_048_576,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+SEPARATOR = "\n\n"
+MIN_TRIM_TOKENS = 100           # Don't bother trimming an oversized snippet into less space than this
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def prompt_budget(model: str, template: str = "", completion_tokens: int = DEFAULT_COMPLETION_TOKENS,
+                  cap: Optional[int] = None) -> int:
+    """
+    Tokens left for source material in one prompt: the model's context window
+    (or ``cap`` total prompt tokens, if smaller) minus ``template`` and the
+    completion reservation.
+    """
+    total = MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW) - completion_tokens
+    if cap is not None:
+        total = min(total, cap)
+    return max(0, total - token_counter.count_tokens(template, model))
+
+
+def _trim(text: str, max_tokens: int, model: Optional[str]) -> str:
+    """The longest prefix of whole sentences within ``max_tokens`` (a hard cut if the first sentence is too long)."""
+    tokens = max(1, token_counter.count_tokens(text, model))
+    limit = int(len(text) * max_tokens / tokens)
+    while limit > 0:
+        cut = text[:limit]
+        boundary = max((match.start() for match in _SENTENCE_END.finditer(cut)), default=0)
+        candidate = cut[:boundary] if boundary else cut
+        if token_counter.count_tokens(candidate, model) <= max_tokens:
+            return candidate
+        limit = int(limit * 0.9)
+    return ""
+
+
+def pack(snippets: Sequence[str], budget: int, model: Optional[str] = None, query: Optional[str] = None,
+         scores: Optional[Sequence[float]] = None, separator: str = SEPARATOR,
+         min_ratio: Optional[float] = None) -> Dict:
+    """
+    Fits as many of the most relevant ``snippets`` as possible into ``budget`` tokens.
+
+    Snippets are ranked by ``scores`` if given, else by BM25 relevance to
+    ``query``; ties (and the no-query case) keep the caller's order. With
+    ``min_ratio``, snippets scoring below that share of the best score are left
+    out even if they would fit. Returns a dict with the packed ``text``, the
+    ``included`` snippet indices in prompt order and the budget accounting:
+    ``tokens``, ``budget``, ``utilization``, ``snippets``, ``filtered``
+    (off-topic), ``dropped`` (didn't fit) and ``trimmed``.
+    """
+    if scores is None:
+        scores = bm25.BM25Index(snippets).scores(query) if query else [0.0] * len(snippets)
+    order = bm25.select(scores, min_ratio=min_ratio)
+    filtered = len(snippets) - len(order)
+    separator_tokens = token_counter.count_tokens(separator, model)
+
+    parts: List[str] = []
+    included: List[int] = []
+    used = 0
+    trimmed = 0
+    for i in order:
+        snippet = snippets[i]
+        if not snippet or not snippet.strip():
+            continue
+        cost = token_counter.count_tokens(snippet, model) + (separator_tokens if parts else 0)
+        if used + cost > budget:
+            remaining = budget - used - (separator_tokens if parts else 0)
+            if cost <= budget or remaining < MIN_TRIM_TOKENS:
+                continue  # Whole snippets only; something smaller further down may still fit
+            snippet = _trim(snippet, remaining, model)
+            if not snippet:
+                continue
+            trimmed += 1
+            cost = token_counter.count_tokens(snippet, model) + (separator_tokens if parts else 0)
+        parts.append(snippet)
+        included.append(i)
+        used += cost
+
+    report = {
+        "text": separator.join(parts),
+        "included": included,
+        "tokens": used,
+        "budget": budget,
+        "utilization": round(used / budget, 3) if budget else 0.0,
+        "snippets": len(snippets),
+        "filtered": filtered,
+        "dropped": len([i for i in order if snippets[i] and snippets[i].strip()]) - len(included),
+        "trimmed": trimmed,
+    }
+    logging.info(f"Packed {len(included)}/{len(snippets)} snippets into {used}/{budget} tokens "
+                 f"({report['utilization']:.0%}), {filtered} off-topic, {trimmed} trimmed")
+    return report
+
+
+def summary(report: Dict) -> Dict:
+    """A pack report without the packed text, for API responses."""
+    return {key: value for key, value in report.items() if key != "text"}
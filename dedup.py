@@ -0,0 +1,92 @@
+"""Content-level near-duplicate detection for fetched pages.
+
+Exact URL de-duplication misses syndicated copies, mirrors and AMP variants
+of the same article. ``PageDeduplicator`` collapses them before their text
+reaches the LLM, using two checks:
+
+    canonical  the page's declared <link rel="canonical"> (or its own URL)
+               matches one already kept
+    simhash    the 64-bit SimHash of the page text is within
+               ``max_distance`` bits of one already kept
+
+One deduplicator is created per API request. It records how many pages were
+dropped and roughly how many LLM tokens that saved.
+"""
+import hashlib
+import re
+import threading
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+import token_counter
+from page_cache import canonical_url
+
+SHINGLE_SIZE = 3                # Words per shingle
+MAX_HAMMING_DISTANCE = 3        # Out of 64 bits
+MIN_WORDS = 40                  # Shorter texts are too small to fingerprint reliably
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text: str, shingle_size: int = SHINGLE_SIZE) -> Optional[int]:
+    """Returns the 64-bit SimHash of a text's word shingles, or None if the text is too short."""
+    words = _WORD.findall(text.lower())
+    if len(words) < MIN_WORDS:
+        return None
+    weights = [0] * 64
+    for i in range(len(words) - shingle_size + 1):
+        h = _hash64(" ".join(words[i:i + shingle_size]))
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class PageDeduplicator:
+    """Tracks the pages kept so far in one request and flags near-duplicates of them."""
+
+    def __init__(self, max_distance: int = MAX_HAMMING_DISTANCE):
+        self.max_distance = max_distance
+        self._canonicals: Dict[str, str] = {}
+        self._fingerprints: List[tuple] = []   # (simhash, url)
+        self._lock = threading.Lock()
+        self.duplicates: List[Dict[str, str]] = []
+        self.tokens_saved = 0
+
+    def check(self, url: str, text: str, canonical: Optional[str] = None) -> Optional[str]:
+        """
+        Returns the URL of an already-kept page that ``url`` duplicates, or None.
+        A page that is not a duplicate is remembered, so later copies of it are caught.
+        """
+        keys = {canonical_url(url)}
+        if canonical:
+            keys.add(canonical_url(urljoin(url, canonical)))
+        fingerprint = simhash(text)
+        with self._lock:
+            original, reason = next(((self._canonicals[key], "canonical") for key in keys if key in self._canonicals),
+                                    (None, None))
+            if original is None and fingerprint is not None:
+                original = next((kept_url for kept, kept_url in self._fingerprints
+                                 if hamming_distance(kept, fingerprint) <= self.max_distance), None)
+                reason = "simhash"
+            if original is not None:
+                self.duplicates.append({"url": url, "duplicate_of": original, "reason": reason})
+                self.tokens_saved += token_counter.count_tokens(text)
+                return original
+            for key in keys:
+                self._canonicals[key] = url
+            if fingerprint is not None:
+                self._fingerprints.append((fingerprint, url))
+        return None
+
+    def report(self) -> Dict:
+        with self._lock:
+            return {"duplicates_skipped": len(self.duplicates), "tokens_saved": self.tokens_saved,
+                    "duplicates": list(self.duplicates)}
@@ -0,0 +1,150 @@
+"""Per-engine health tracking with circuit breaking.
+
+Each search engine (or job site) gets a small circuit breaker:
+
+    closed     requests flow normally; outcomes go into a rolling window
+    open       too many recent failures, or a hard block (429, 403,
+               CAPTCHA): the engine is skipped until its cooldown ends
+    half_open  cooldown over: a single probe request is let through. Success
+               closes the circuit. Failure re-opens it with a doubled
+               cooldown.
+
+``available()`` filters an engine list without side effects. ``allow()`` is
+called right before contacting an engine and hands out the half-open probe;
+``release_probe()`` returns it if the request was never sent.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List
+
+import requests
+
+WINDOW_SIZE = 20                # Outcomes kept per engine
+WINDOW_SECONDS = 600            # Outcomes older than this are ignored
+MIN_REQUESTS = 4                # Don't judge an error rate on fewer outcomes
+ERROR_RATE_THRESHOLD = 0.5
+BASE_COOLDOWN = 60.0
+MAX_COOLDOWN = 30 * 60.0
+PROBE_TIMEOUT = 90.0            # A probe that never reported back is re-granted after this
+HARD_FAILURE_STATUSES = (403, 429)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class _Circuit:
+    def __init__(self):
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=WINDOW_SIZE)   # (timestamp, ok)
+        self.cooldown = BASE_COOLDOWN
+        self.open_until = 0.0
+        self.probe_started = 0.0
+        self.last_failure = None
+        self.trips = 0
+
+    def error_rate(self, now: float) -> float:
+        recent = [ok for ts, ok in self.outcomes if now - ts <= WINDOW_SECONDS]
+        if len(recent) < MIN_REQUESTS:
+            return 0.0
+        return recent.count(False) / len(recent)
+
+
+class EngineHealth:
+    """Thread-safe registry of circuits, one per engine name."""
+
+    def __init__(self, name: str = "engines"):
+        self.name = name
+        self._circuits: Dict[str, _Circuit] = {}
+        self._lock = threading.Lock()
+
+    def _circuit(self, engine: str) -> _Circuit:
+        circuit = self._circuits.get(engine)
+        if circuit is None:
+            circuit = self._circuits[engine] = _Circuit()
+        return circuit
+
+    def _usable(self, circuit: _Circuit, now: float) -> bool:
+        if circuit.state == CLOSED:
+            return True
+        if circuit.state == OPEN:
+            return now >= circuit.open_until
+        return now - circuit.probe_started > PROBE_TIMEOUT  # Half-open: only if the probe went missing
+
+    def available(self, engines: Iterable[str]) -> List[str]:
+        """Returns the engines whose circuit would currently let a request through."""
+        now = time.time()
+        with self._lock:
+            usable = [engine for engine in engines if self._usable(self._circuit(engine), now)]
+        return usable
+
+    def allow(self, engine: str) -> bool:
+        """Checks the circuit right before a request, granting the half-open probe if due."""
+        now = time.time()
+        with self._lock:
+            circuit = self._circuit(engine)
+            if not self._usable(circuit, now):
+                return False
+            if circuit.state != CLOSED:
+                circuit.state = HALF_OPEN
+                circuit.probe_started = now
+                logging.info(f"Probing {engine} after cooldown")
+            return True
+
+    def release_probe(self, engine: str) -> None:
+        """Hands back a granted probe that never reached the engine; the circuit reopens without a failure."""
+        with self._lock:
+            circuit = self._circuit(engine)
+            if circuit.state == HALF_OPEN:
+                circuit.state = OPEN  # open_until has passed, so the next allow() can probe again
+
+    def record_success(self, engine: str) -> None:
+        with self._lock:
+            circuit = self._circuit(engine)
+            circuit.outcomes.append((time.time(), True))
+            if circuit.state != CLOSED:
+                logging.info(f"{engine} recovered; closing circuit")
+                circuit.state = CLOSED
+                circuit.cooldown = BASE_COOLDOWN
+                circuit.outcomes.clear()
+
+    def record_failure(self, engine: str, reason: str, hard: bool = False) -> None:
+        """Records a failed request. Hard failures (blocks, CAPTCHAs) open the circuit at once."""
+        now = time.time()
+        with self._lock:
+            circuit = self._circuit(engine)
+            circuit.outcomes.append((now, False))
+            circuit.last_failure = reason
+            if circuit.state == HALF_OPEN:
+                circuit.cooldown = min(circuit.cooldown * 2, MAX_COOLDOWN)
+                self._trip(engine, circuit, now, reason)
+            elif circuit.state == CLOSED and (hard or circuit.error_rate(now) >= ERROR_RATE_THRESHOLD):
+                self._trip(engine, circuit, now, reason)
+
+    def _trip(self, engine: str, circuit: _Circuit, now: float, reason: str) -> None:
+        circuit.state = OPEN
+        circuit.open_until = now + circuit.cooldown
+        circuit.trips += 1
+        logging.warning(f"Opening circuit for {engine} for {circuit.cooldown:.0f}s ({reason})")
+
+    def record_response(self, engine: str, response: requests.Response) -> None:
+        """Classifies an HTTP response as a success, a soft failure or a hard block."""
+        if response.status_code < 400:
+            self.record_success(engine)
+        else:
+            self.record_failure(engine, f"HTTP {response.status_code}",
+                                hard=response.status_code in HARD_FAILURE_STATUSES)
+
+    def stats(self) -> Dict:
+        now = time.time()
+        with self._lock:
+            return {
+                engine: {
+                    "state": circuit.state,
+                    "error_rate": round(circuit.error_rate(now), 3),
+                    "cooldown_remaining": round(max(0.0, circuit.open_until - now), 1) if circuit.state == OPEN else 0.0,
+                    "trips": circuit.trips,
+                    "last_failure": circuit.last_failure,
+                }
+                for engine, circuit in self._circuits.items()
+            }
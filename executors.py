@@ -0,0 +1,138 @@
+"""Process-wide worker pools for app.py.
+
+Endpoints submit blocking work to two app-lifetime pools instead of creating
+their own ThreadPoolExecutors per request:
+
+    io   network-bound work (search scraping, page fetches, URL shortening)
+    cpu  parsing and document work (HTML extraction, resume parsing, PDF reports)
+
+Total thread count is therefore fixed by config no matter how many requests
+are in flight; excess work waits in the pool queue, which ``executor_stats``
+reports together with worker saturation.
+
+Work running on the io pool may wait on the cpu pool, never the other way
+round, and no pool may wait on itself (a full pool would deadlock).
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+DEFAULT_IO_WORKERS = 32
+DEFAULT_CPU_WORKERS = os.cpu_count() or 4
+
+
+class ManagedExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor that tracks queue depth, busy workers and queue wait."""
+
+    def __init__(self, name: str, max_workers: int):
+        super().__init__(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+        self.name = name
+        self.max_workers = max_workers
+        self._stats_lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._peak_queued = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        enqueued_at = time.monotonic()
+
+        def run():
+            waited = time.monotonic() - enqueued_at
+            with self._stats_lock:
+                self._queued -= 1
+                self._active += 1
+                self._queue_wait_total += waited
+                self._queue_wait_max = max(self._queue_wait_max, waited)
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                with self._stats_lock:
+                    self._failed += 1
+                raise
+            finally:
+                with self._stats_lock:
+                    self._active -= 1
+                    self._completed += 1
+            return result
+
+        with self._stats_lock:
+            self._queued += 1
+            self._submitted += 1
+            self._peak_queued = max(self._peak_queued, self._queued)
+        try:
+            return super().submit(run)
+        except RuntimeError:  # Pool already shut down
+            with self._stats_lock:
+                self._queued -= 1
+                self._submitted -= 1
+            raise
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            started = self._completed + self._active
+            return {
+                "max_workers": self.max_workers,
+                "active": self._active,
+                "queued": self._queued,
+                "peak_queued": self._peak_queued,
+                "saturation": round(self._active / self.max_workers, 3),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_queue_wait_ms": round(self._queue_wait_total / started * 1000, 2) if started else 0.0,
+                "max_queue_wait_ms": round(self._queue_wait_max * 1000, 2),
+            }
+
+
+_pools: Dict[str, ManagedExecutor] = {}
+_sizes = {"io": DEFAULT_IO_WORKERS, "cpu": DEFAULT_CPU_WORKERS}
+_lock = threading.Lock()
+
+
+def configure(io_workers: Optional[int] = None, cpu_workers: Optional[int] = None) -> None:
+    """Sets pool sizes. Pools that are already running keep their size."""
+    with _lock:
+        if io_workers:
+            _sizes["io"] = io_workers
+        if cpu_workers:
+            _sizes["cpu"] = cpu_workers
+
+
+def _get(name: str) -> ManagedExecutor:
+    with _lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = _pools[name] = ManagedExecutor(name, _sizes[name])
+            logging.info(f"Started {name} pool with {_sizes[name]} workers")
+        return pool
+
+
+def io_executor() -> ManagedExecutor:
+    return _get("io")
+
+
+def cpu_executor() -> ManagedExecutor:
+    return _get("cpu")
+
+
+def shutdown(wait: bool = True) -> None:
+    """Shuts down both pools (called on app shutdown); queued work is cancelled."""
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+def executor_stats() -> Dict:
+    with _lock:
+        pools = dict(_pools)
+    return {name: pool.stats() for name, pool in pools.items()}
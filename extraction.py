@@ -0,0 +1,136 @@
+"""HTML-to-text extraction with pluggable parser backends.
+
+All page fetchers call ``extract_page`` / ``extract_text`` instead of using
+BeautifulSoup directly. The backend is picked by the ``EXTRACTION_BACKEND``
+environment variable:
+
+    auto        selectolax if installed, then lxml, then bs4 (default)
+    selectolax  lexbor-based C parser (pip install selectolax)
+    lxml        libxml2-based C parser (pip install lxml)
+    bs4         BeautifulSoup with the pure-Python html.parser
+
+Every backend produces the same shape of output (script/style/comments
+removed, text nodes stripped and joined with single spaces, plus the
+page's declared ``<link rel="canonical">`` if any). If a C backend
+is missing or fails on a page, BeautifulSoup is used instead.
+"""
+import logging
+import os
+import re
+from typing import Callable, Dict, List, Optional, Union
+
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as _SelectolaxParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as _SelectolaxParser
+    except ImportError:
+        _SelectolaxParser = None
+
+try:
+    import lxml.etree as _lxml_etree
+    import lxml.html as _lxml_html
+except ImportError:
+    _lxml_html = None
+    _lxml_etree = None
+
+EXTRACTION_BACKEND = os.getenv("EXTRACTION_BACKEND", "auto").lower()
+REMOVED_TAGS = ["script", "style"]
+
+_WHITESPACE = re.compile(r"\s+")
+
+Html = Union[str, bytes]
+
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _clean_links(hrefs) -> List[str]:
+    return [href for href in hrefs if href and not href.startswith("#")]
+
+
+def _is_canonical(rel) -> bool:
+    if isinstance(rel, str):
+        rel = rel.split()
+    return any(value.lower() == "canonical" for value in rel or ())
+
+
+def _extract_bs4(html: Html) -> Dict:
+    soup = BeautifulSoup(html, "html.parser")
+    title = str(soup.title.string) if soup.title and soup.title.string is not None else None  # Detached from soup
+    links = _clean_links(a["href"] for a in soup.find_all("a", href=True))
+    canonical = next((link.get("href") for link in soup.find_all("link", href=True) if _is_canonical(link.get("rel"))), None)
+    for tag in soup(REMOVED_TAGS):
+        tag.decompose()  # get_text() already skips comments
+    return {"title": title, "text": _normalize(soup.get_text(separator=" ", strip=True)), "links": links,
+            "canonical": canonical}
+
+
+def _extract_selectolax(html: Html) -> Dict:
+    tree = _SelectolaxParser(html)
+    title_node = tree.css_first("title")
+    title = title_node.text() if title_node is not None else None
+    links = _clean_links(node.attributes.get("href") for node in tree.css("a[href]"))
+    canonical = next((node.attributes.get("href") for node in tree.css("link[href]")
+                      if _is_canonical(node.attributes.get("rel"))), None)
+    tree.strip_tags(REMOVED_TAGS)
+    root = tree.root
+    text = root.text(separator=" ", strip=True) if root is not None else ""
+    return {"title": title, "text": _normalize(text), "links": links, "canonical": canonical}
+
+
+def _extract_lxml(html: Html) -> Dict:
+    tree = _lxml_html.fromstring(html)
+    title = tree.findtext(".//title") or None
+    links = _clean_links(a.get("href") for a in tree.iter("a"))
+    canonical = next((link.get("href") for link in tree.iter("link") if link.get("href") and _is_canonical(link.get("rel"))), None)
+    _lxml_etree.strip_elements(tree, _lxml_etree.Comment, *REMOVED_TAGS, with_tail=False)
+    text = " ".join(chunk.strip() for chunk in tree.itertext() if chunk.strip())
+    return {"title": title, "text": _normalize(text), "links": links, "canonical": canonical}
+
+
+BACKENDS: Dict[str, Optional[Callable[[Html], Dict]]] = {
+    "selectolax": _extract_selectolax if _SelectolaxParser is not None else None,
+    "lxml": _extract_lxml if _lxml_html is not None else None,
+    "bs4": _extract_bs4,
+}
+
+
+def available_backends() -> List[str]:
+    return [name for name, func in BACKENDS.items() if func is not None]
+
+
+def _resolve_backend(name: str) -> str:
+    if name == "auto":
+        return available_backends()[0]
+    if BACKENDS.get(name) is None:
+        logging.warning(f"Extraction backend '{name}' unavailable, falling back to bs4")
+        return "bs4"
+    return name
+
+
+_backend_name = _resolve_backend(EXTRACTION_BACKEND)
+logging.debug(f"Using extraction backend: {_backend_name}")
+
+
+def backend_name() -> str:
+    return _backend_name
+
+
+def extract_page(html: Html, backend: Optional[str] = None) -> Dict:
+    """Returns {'title', 'text', 'links', 'canonical'} for an HTML document."""
+    name = _resolve_backend(backend) if backend else _backend_name
+    if name != "bs4":
+        try:
+            return BACKENDS[name](html)
+        except Exception as e:
+            logging.warning(f"{name} extraction failed ({e}), falling back to bs4")
+    return _extract_bs4(html)
+
+
+def extract_text(html: Html, backend: Optional[str] = None) -> str:
+    """Returns the visible text of an HTML document."""
+    return extract_page(html, backend)["text"]
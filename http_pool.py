@@ -0,0 +1,111 @@
+"""Process-wide pooled requests.Session used by every outbound call in app.py."""
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+import cassette
+
+POOL_CONNECTIONS = 50  # Number of distinct hosts kept alive
+POOL_MAXSIZE = 10      # Max open connections per host
+POOL_BLOCK = True      # Wait for a free connection instead of exceeding POOL_MAXSIZE
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_STATUS_FORCELIST = (500, 502, 503, 504)  # 429s are left to the caller
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+
+def _record(host: str, reused: bool) -> None:
+    with _stats_lock:
+        _stats[host]["hits" if reused else "misses"] += 1
+
+
+class _CountingPoolMixin:
+    """Counts whether each checked-out connection was already open (hit) or new (miss)."""
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        _record(self.host, getattr(conn, "sock", None) is not None)
+        return conn
+
+
+class _CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools report hit/miss stats."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+def _build_session() -> requests.Session:
+    retries = Retry(
+        total=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_FORCELIST,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=False,
+        raise_on_status=False,  # Hand the final response back instead of raising
+    )
+    adapter = PooledAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                            max_retries=retries, pool_block=POOL_BLOCK)
+    adapter = cassette.wrap_adapter(adapter)  # Record/replay when CASSETTE_MODE is set
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Returns the shared session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+                logging.info(f"HTTP pool ready: {POOL_CONNECTIONS} hosts x {POOL_MAXSIZE} connections")
+    return _session
+
+
+def close_session() -> None:
+    """Closes all pooled connections."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def pool_stats() -> Dict:
+    """Returns connection reuse stats, overall and per host."""
+    with _stats_lock:
+        per_host = {host: dict(counts) for host, counts in _stats.items()}
+    hits = sum(c["hits"] for c in per_host.values())
+    misses = sum(c["misses"] for c in per_host.values())
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 3) if total else 0.0,
+        "hosts": per_host,
+    }
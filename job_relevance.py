@@ -0,0 +1,205 @@
+"""Batched resume-to-job relevance scoring.
+
+Job search used to make one Gemini call per job card, sending the resume
+every time, one call after another. ``BatchScorer.score`` instead puts
+several truncated job descriptions into one structured-JSON prompt with a
+single copy of the resume:
+
+    batching  jobs are added to a batch until the prompt would exceed
+              ``batch_tokens`` (the resume and instructions included) or the
+              batch holds ``max_batch`` jobs, so short descriptions share a
+              call and long ones get fewer neighbours
+    mapping   the model answers with one object per job carrying the job's
+              id. Assessments are matched back by id, not by position.
+              Jobs missing from the answer are retried once in smaller
+              batches, then given an error justification
+    limits    batches run on ``executor``, at most ``max_concurrent`` at a
+              time; each call still goes through the caller's rate limiter
+
+The caller supplies ``generate(prompt)`` (returning parsed JSON) and
+``count_tokens(text)``.
+"""
+import concurrent.futures
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+DEFAULT_BATCH_TOKENS = 12000
+DEFAULT_MAX_BATCH = 10          # Also bounds the answer: ~150 output tokens per job
+DEFAULT_MAX_CONCURRENT = 4
+DESCRIPTION_CHARS = 2000
+RESUME_CHARS = 4000             # Sent once per batch instead of once per job, so it can be longer
+
+BATCH_PROMPT = (
+    "Assess how relevant each job below is to the resume. "
+    "Respond with ONLY a JSON array containing one object per job, with the following keys:\n"
+    "'id': string (the job's id exactly as given),\n"
+    "'relevance': float (between 0.0 and 1.0, where 1.0 is perfectly relevant),\n"
+    "'missing_skills': list of strings (skills in the job description but not in the resume, or an empty list if none),\n"
+    "'justification': string (REQUIRED. Explain the relevance score, including factors like experience level "
+    "mismatch, skill gaps, or industry differences.).\n\n"
+    "Resume:\n{resume}\n\nJobs:"
+)
+
+
+def job_entry(job_id: str, description: str) -> str:
+    return f"\n\n[Job id: {job_id}]\n{description}"
+
+
+def normalize(assessment: Any) -> Optional[Dict]:
+    """Validated relevance/missing_skills/justification fields from one job's answer, or None if unusable."""
+    if not isinstance(assessment, dict):
+        return None
+    relevance = assessment.get('relevance', 0.0)
+    if isinstance(relevance, str):
+        try:
+            relevance = float(relevance)
+        except ValueError:
+            relevance = None
+    if not isinstance(relevance, (int, float)) or isinstance(relevance, bool):
+        logging.warning(f"Invalid relevance value: {relevance}")
+        relevance = 0.0
+    missing_skills = assessment.get('missing_skills', [])
+    if not isinstance(missing_skills, list):
+        logging.warning(f"Invalid missing_skills: {missing_skills}")
+        missing_skills = []
+    justification = assessment.get('justification', "Relevance assessed.")
+    if not isinstance(justification, str):
+        logging.warning(f"Invalid justification: {justification}")
+        justification = "Error: Could not assess relevance properly."
+    return {'relevance': min(1.0, max(0.0, float(relevance))), 'missing_skills': missing_skills,
+            'justification': justification}
+
+
+def parse_response(response: Any) -> Dict[str, Dict]:
+    """Maps job id -> assessment from a batch answer (a list, a {"jobs": [...]} wrapper or an id-keyed object)."""
+    if isinstance(response, dict) and "error" in response:
+        logging.warning(f"Invalid JSON from relevance batch: {str(response.get('raw_text'))[:200]}")
+        return {}
+    items: Any = response
+    if isinstance(response, dict):
+        lists = [value for value in response.values() if isinstance(value, list)]
+        if lists:
+            items = lists[0]
+        else:  # {"3": {...}, "7": {...}}
+            items = [dict(value, id=key) for key, value in response.items() if isinstance(value, dict)]
+    if not isinstance(items, list):
+        return {}
+    results = {}
+    for item in items:
+        if isinstance(item, dict) and item.get('id') is not None:
+            assessment = normalize(item)
+            if assessment is not None:
+                results[str(item['id']).strip()] = assessment
+    return results
+
+
+class BatchScorer:
+    """Scores many job descriptions against one resume in as few calls as the token budget allows."""
+
+    def __init__(self, generate: Callable[[str], Any], count_tokens: Callable[[str], int],
+                 batch_tokens: int = DEFAULT_BATCH_TOKENS, max_batch: int = DEFAULT_MAX_BATCH,
+                 max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+                 executor: Optional[concurrent.futures.Executor] = None):
+        self.generate = generate
+        self.count_tokens = count_tokens
+        self.batch_tokens = batch_tokens
+        self.max_batch = max(1, max_batch)
+        self.max_concurrent = max(1, max_concurrent)
+        self.executor = executor
+        self._lock = threading.Lock()
+        self._stats = {"jobs": 0, "calls": 0, "retried": 0, "unscored": 0}
+
+    def plan(self, descriptions: Dict[str, str], header: str, max_batch: Optional[int] = None) -> List[List[str]]:
+        """Splits job ids into batches whose prompts fit in batch_tokens."""
+        max_batch = max_batch or self.max_batch
+        budget = self.batch_tokens - self.count_tokens(header)
+        batches: List[List[str]] = []
+        current: List[str] = []
+        used = 0
+        for job_id, description in descriptions.items():
+            cost = self.count_tokens(job_entry(job_id, description))
+            if current and (len(current) >= max_batch or used + cost > budget):
+                batches.append(current)
+                current, used = [], 0
+            current.append(job_id)  # A job larger than the budget still goes, alone
+            used += cost
+        if current:
+            batches.append(current)
+        return batches
+
+    def _score_batch(self, job_ids: Sequence[str], descriptions: Dict[str, str], header: str) -> Dict[str, Dict]:
+        prompt = header + "".join(job_entry(job_id, descriptions[job_id]) for job_id in job_ids)
+        with self._lock:
+            self._stats["calls"] += 1
+        results = parse_response(self.generate(prompt))
+        return {job_id: results[job_id] for job_id in job_ids if job_id in results}
+
+    def _run(self, batches: List[List[str]], descriptions: Dict[str, str], header: str,
+             executor: concurrent.futures.Executor) -> Dict[str, Dict]:
+        """Runs batches with at most max_concurrent in flight."""
+        scored: Dict[str, Dict] = {}
+        waiting = iter(batches)
+        pending: Dict[concurrent.futures.Future, List[str]] = {}
+
+        def submit_next():
+            batch = next(waiting, None)
+            if batch is not None:
+                pending[executor.submit(self._score_batch, batch, descriptions, header)] = batch
+
+        for _ in range(self.max_concurrent):
+            submit_next()
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                batch = pending.pop(future)
+                try:
+                    scored.update(future.result())
+                except Exception as e:
+                    logging.error(f"Relevance batch of {len(batch)} jobs failed: {e}")
+                submit_next()
+        return scored
+
+    def score(self, descriptions: Dict[str, str], resume_text: str) -> Dict[str, Dict]:
+        """
+        Returns job id -> {'relevance', 'missing_skills', 'justification'} for
+        every id in ``descriptions`` (an error justification if it couldn't be scored).
+        """
+        if not descriptions:
+            return {}
+        descriptions = {str(job_id): (text or "")[:DESCRIPTION_CHARS] for job_id, text in descriptions.items()}
+        header = BATCH_PROMPT.format(resume=resume_text[:RESUME_CHARS])
+        batches = self.plan(descriptions, header)
+
+        own_executor = None
+        executor = self.executor
+        if executor is None:
+            executor = own_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_concurrent, thread_name_prefix="job-relevance")
+        try:
+            scored = self._run(batches, descriptions, header, executor)
+            missing = {job_id: text for job_id, text in descriptions.items() if job_id not in scored}
+            if missing:
+                # Long batches are the likeliest to come back incomplete, so retry in halves
+                logging.info(f"Retrying relevance for {len(missing)} jobs missing from batch answers")
+                retry_batches = self.plan(missing, header, max_batch=max(1, self.max_batch // 2))
+                scored.update(self._run(retry_batches, missing, header, executor))
+        finally:
+            if own_executor is not None:
+                own_executor.shutdown(wait=False)
+
+        unscored = [job_id for job_id in descriptions if job_id not in scored]
+        for job_id in unscored:
+            scored[job_id] = {'relevance': 0.0, 'missing_skills': [],
+                              'justification': "Error: Could not assess relevance (no answer for this job)."}
+        with self._lock:
+            self._stats["jobs"] += len(descriptions)
+            self._stats["retried"] += len(missing)
+            self._stats["unscored"] += len(unscored)
+        logging.info(f"Scored {len(descriptions)} jobs in {len(batches)} batches "
+                     f"({len(missing)} retried, {len(unscored)} unscored)")
+        return scored
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._stats)
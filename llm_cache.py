@@ -0,0 +1,152 @@
+"""Persistent SQLite cache of LLM responses.
+
+Entries are content-addressed: the key is a SHA-256 of (model, response
+format, prompt), so a prompt that was already answered (a repeated website
+summary, a sentiment check of the same text, product extraction from the
+same page) is served without spending quota or waiting on the model. Only
+raw response text is stored; format parsing happens on the way out as for a
+fresh response. Entries expire after ``ttl`` seconds. When the cache grows
+past ``max_bytes``, the least recently used entries are evicted.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+DEFAULT_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+DEFAULT_TTL = int(os.getenv("LLM_CACHE_TTL", 24 * 3600))
+DEFAULT_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+def cache_key(model: str, prompt: str, response_format: str = "text") -> str:
+    digest = hashlib.sha256()
+    for part in (model, response_format, prompt):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class LLMCache:
+    """Stores one response per (model, prompt, response format)."""
+
+    def __init__(self, path: str = DEFAULT_PATH, ttl: int = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._bypassed = 0
+        self._evictions = 0
+        self._init_db()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self) -> None:
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                " key TEXT PRIMARY KEY,"
+                " model TEXT,"
+                " response TEXT,"
+                " size INTEGER,"
+                " created_at REAL,"
+                " last_used REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used ON llm_responses (last_used)")
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def bypass(self) -> None:
+        """Counts a call that skipped the cache on purpose (use_cache=False)."""
+        self._count("_bypassed")
+
+    def get(self, model: str, prompt: str, response_format: str = "text") -> Optional[str]:
+        """Returns the cached response if it is within the TTL, else None."""
+        key = cache_key(model, prompt, response_format)
+        try:
+            row = self._conn().execute("SELECT response, created_at FROM llm_responses WHERE key = ?",
+                                       (key,)).fetchone()
+            if row is not None and time.time() - row[1] < self.ttl:
+                with self._conn() as conn:
+                    conn.execute("UPDATE llm_responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            else:
+                row = None
+        except sqlite3.Error as e:
+            logging.error(f"LLM cache read failed for {model}: {e}")
+            row = None
+        self._count("_misses" if row is None else "_hits")
+        return row[0] if row is not None else None
+
+    def put(self, model: str, prompt: str, response: str, response_format: str = "text") -> None:
+        if not response:
+            return
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        try:
+            with self._conn() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_responses (key, model, response, size, created_at, last_used)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (cache_key(model, prompt, response_format), model, response, size, now, now))
+                self._evict(conn)
+        except sqlite3.Error as e:
+            logging.error(f"LLM cache write failed for {model}: {e}")
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Drops least recently used entries until the cache fits in max_bytes."""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        removed = 0
+        for key, size in conn.execute("SELECT key, size FROM llm_responses ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+            total -= size
+            removed += 1
+        with self._lock:
+            self._evictions += removed
+
+    def purge_expired(self) -> int:
+        """Deletes entries past the TTL. Returns the number removed."""
+        try:
+            with self._conn() as conn:
+                cursor = conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (time.time() - self.ttl,))
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            logging.error(f"LLM cache purge failed: {e}")
+            return 0
+
+    def stats(self) -> Dict:
+        try:
+            entries, size = self._conn().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_responses").fetchone()
+        except sqlite3.Error:
+            entries, size = None, None
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "disk_entries": entries,
+                "disk_bytes": size,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "bypassed": self._bypassed,
+                "evictions": self._evictions,
+                "hit_ratio": round(self._hits / lookups, 3) if lookups else 0.0,
+            }
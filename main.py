@@ -5,6 +5,7 @@ from fastapi.templating import Jinja2Templates
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 from database import init_db
+import async_fetch
 from routers import auth, chat, research, tools, settings
 
 load_dotenv()
@@ -29,6 +30,10 @@ app.include_router(settings.router)
 def on_startup():
     init_db()
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    await async_fetch.close_client()
+
 @app.get("/")
 async def root(request: Request):
     return templates.TemplateResponse("landing.html", {"request": request})
@@ -0,0 +1,140 @@
+"""Hierarchical (map-reduce) summarization for deep research.
+
+Deep research maps every chunk of fetched pages to a summary (see
+process_in_chunks), and each iteration adds more. Joined as-is, the summaries
+overflow the report prompt once enough was crawled. ``TreeSummarizer.reduce``
+merges them in levels instead:
+
+    level n   consecutive summaries are grouped, at most ``fan_in`` per group
+              and ``group_tokens`` of input per group, and each group is merged
+              into one summary by a ``merge`` call. Groups run in parallel on
+              ``executor``, with at most ``max_concurrent`` merges in flight.
+
+Levels repeat until all summaries together fit in ``target_tokens``, so the
+final prompt has a fixed size however many pages went in. Order is kept, so
+later levels still roughly follow source order. A group of one is passed
+through without a call. If a level doesn't shrink the total, or a merge
+fails, the unmerged summaries are kept and the caller's packer has to drop
+the excess (see context_packer.py). Every level's sizes and wall time are
+kept in ``levels``, along with any map steps the caller records.
+"""
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+DEFAULT_FAN_IN = 4
+DEFAULT_MAX_CONCURRENT = 4
+MAX_LEVELS = 5
+
+
+class TreeSummarizer:
+    """Reduces a list of summaries to ``target_tokens`` with bounded fan-in merges."""
+
+    def __init__(self, merge: Callable[[List[str]], str], count_tokens: Callable[[str], int], target_tokens: int,
+                 group_tokens: int, fan_in: int = DEFAULT_FAN_IN, max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+                 executor: Optional[concurrent.futures.Executor] = None, max_levels: int = MAX_LEVELS):
+        self.merge = merge
+        self.count_tokens = count_tokens
+        self.target_tokens = target_tokens
+        self.group_tokens = group_tokens
+        self.fan_in = max(2, fan_in)
+        self.max_concurrent = max(1, max_concurrent)
+        self.executor = executor
+        self.max_levels = max_levels
+        self.levels: List[Dict] = []
+        self._lock = threading.Lock()
+        self._reduce_levels = 0
+
+    def record(self, stage: str, inputs: int, outputs: Sequence[str], seconds: float,
+               tokens_in: Optional[int] = None) -> None:
+        """Adds a step's sizes and wall time to ``levels`` (reduce levels record themselves)."""
+        entry = {"stage": stage, "inputs": inputs, "outputs": len(outputs), "tokens_in": tokens_in,
+                 "tokens_out": sum(self.count_tokens(text) for text in outputs), "seconds": round(seconds, 2)}
+        with self._lock:
+            self.levels.append(entry)
+        logging.info(f"Summarization {stage}: {inputs} -> {entry['outputs']} in {entry['seconds']}s "
+                     f"({entry['tokens_out']} tokens out)")
+
+    def _groups(self, texts: List[str], counts: List[int]) -> List[List[str]]:
+        groups: List[List[str]] = []
+        current: List[str] = []
+        current_tokens = 0
+        for text, tokens in zip(texts, counts):
+            if current and (len(current) >= self.fan_in or current_tokens + tokens > self.group_tokens):
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += tokens
+        if current:
+            groups.append(current)
+        return groups
+
+    def _merge_level(self, groups: List[List[str]], executor: concurrent.futures.Executor) -> List[str]:
+        """Merges every multi-summary group, keeping at most max_concurrent merges in flight."""
+        results: List[Optional[str]] = [group[0] if len(group) == 1 else None for group in groups]
+        waiting = iter([i for i, group in enumerate(groups) if len(group) > 1])
+        pending: Dict[concurrent.futures.Future, int] = {}
+
+        def submit_next():
+            i = next(waiting, None)
+            if i is not None:
+                pending[executor.submit(self.merge, groups[i])] = i
+
+        for _ in range(self.max_concurrent):
+            submit_next()
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                i = pending.pop(future)
+                try:
+                    results[i] = future.result() or None
+                except Exception as e:
+                    logging.error(f"Merging {len(groups[i])} summaries failed, keeping them unmerged: {e}")
+                submit_next()
+
+        merged: List[str] = []
+        for group, result in zip(groups, results):
+            merged.extend(group if result is None else [result])
+        return merged
+
+    def reduce(self, texts: Sequence[str]) -> List[str]:
+        """Merges ``texts`` level by level until they fit in target_tokens (or stop shrinking)."""
+        texts = [text for text in texts if text and text.strip()]
+        counts = [self.count_tokens(text) for text in texts]
+        if sum(counts) <= self.target_tokens:
+            return texts
+
+        own_executor = None
+        executor = self.executor
+        if executor is None:
+            executor = own_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_concurrent, thread_name_prefix="map-reduce")
+        try:
+            for _ in range(self.max_levels):
+                if sum(counts) <= self.target_tokens or len(texts) < 2:
+                    break
+                groups = self._groups(texts, counts)
+                if len(groups) == len(texts):
+                    logging.warning(f"Summaries too large to merge within {self.group_tokens} tokens per group")
+                    break
+                with self._lock:
+                    self._reduce_levels += 1
+                    level = self._reduce_levels
+                started = time.monotonic()
+                merged = self._merge_level(groups, executor)
+                merged_counts = [self.count_tokens(text) for text in merged]
+                self.record(f"reduce {level}", len(texts), merged, time.monotonic() - started, sum(counts))
+                if sum(merged_counts) >= sum(counts):
+                    logging.warning(f"Reduce level {level} did not shrink the summaries, stopping")
+                    break
+                texts, counts = merged, merged_counts
+        finally:
+            if own_executor is not None:
+                own_executor.shutdown(wait=False)
+        return texts
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"levels": [dict(level) for level in self.levels], "reduce_levels": self._reduce_levels}
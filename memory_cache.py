@@ -0,0 +1,144 @@
+"""Size-bounded in-process cache with LRU/LFU eviction and a background sweeper."""
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL = 300
+DEFAULT_SWEEP_INTERVAL = 60
+# Types approx_size can measure. Anything else (even a str subclass such as bs4's NavigableString, which
+# links back to its whole parse tree) may hold references the size never sees, so it isn't cached
+_PLAIN_TYPES = (str, bytes, int, float, bool, type(None), list, tuple, set, dict)
+
+
+def approx_size(obj: Any) -> int:
+    """Rough deep size of str/bytes/list/dict/tuple values, in bytes. Raises TypeError for other types."""
+    if type(obj) not in _PLAIN_TYPES:
+        raise TypeError(f"Can't size {type(obj).__module__}.{type(obj).__name__} values")
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(approx_size(k) + approx_size(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return sys.getsizeof(obj) + sum(approx_size(item) for item in obj)
+    return sys.getsizeof(obj)
+
+
+class MemoryCache:
+    """
+    Thread-safe key/value cache bounded by total resident bytes.
+
+    When an insert would exceed ``max_bytes``, entries are evicted in least
+    recently used order (``policy="lru"``) or least frequently used order
+    (``policy="lfu"``, ties broken by recency). Expired entries are dropped on
+    read and by a daemon sweeper thread every ``sweep_interval`` seconds.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = DEFAULT_TTL,
+                 policy: str = "lru", sweep_interval: Optional[float] = DEFAULT_SWEEP_INTERVAL):
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.policy = policy
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._resident_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._stop = threading.Event()
+        self._sweeper = None
+        if sweep_interval:
+            self._sweeper = threading.Thread(target=self._sweep_loop, args=(sweep_interval,),
+                                             name="memory-cache-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            if time.time() >= entry["expires_at"]:
+                self._remove(key)
+                self._expirations += 1
+                self._misses += 1
+                return None
+            entry["hits"] += 1
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry["value"]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        try:
+            size = approx_size(key) + approx_size(value)
+        except TypeError as e:
+            logging.warning(f"Not caching {key!r} in memory: {e}")
+            return
+        if size > self.max_bytes:
+            return  # Never cache a single value larger than the whole budget
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and self._resident_bytes + size > self.max_bytes:
+                self._remove(self._victim())
+                self._evictions += 1
+            self._entries[key] = {
+                "value": value,
+                "size": size,
+                "hits": 0,
+                "expires_at": time.time() + (self.ttl if ttl is None else ttl),
+            }
+            self._resident_bytes += size
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def sweep(self) -> int:
+        """Drops all expired entries. Returns the number removed."""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if now >= entry["expires_at"]]
+            for key in expired:
+                self._remove(key)
+            self._expirations += len(expired)
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "resident_bytes": self._resident_bytes,
+                "max_bytes": self.max_bytes,
+                "policy": self.policy,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 3) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
+
+    def stop(self) -> None:
+        """Stops the sweeper thread."""
+        self._stop.set()
+
+    def _victim(self) -> Hashable:
+        if self.policy == "lfu":
+            return min(self._entries, key=lambda k: self._entries[k]["hits"])
+        return next(iter(self._entries))
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._resident_bytes -= entry["size"]
+
+    def _sweep_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            removed = self.sweep()
+            if removed:
+                logging.debug(f"Memory cache sweeper removed {removed} expired entries")
@@ -0,0 +1,179 @@
+"""Persistent SQLite cache of extracted page content, keyed by canonical URL.
+
+Entries keep the page's ETag / Last-Modified validators so stale pages can be
+revalidated with a conditional GET (304 Not Modified) instead of refetched.
+The database runs in WAL mode, so several workers can share one file. An
+optional MemoryCache sits in front of it as a bounded in-process tier.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from memory_cache import MemoryCache
+
+DEFAULT_PATH = os.getenv("PAGE_CACHE_PATH", "page_cache.db")
+DEFAULT_TTL = 300                # Seconds an entry is served without revalidation
+MAX_AGE = 7 * 24 * 3600          # Entries older than this are purged
+MAX_TEXT_LENGTH = 12000          # Characters of extracted text kept per page (largest snippet is 10000)
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid", "ref_src")
+
+
+def canonical_url(url: str) -> str:
+    """Normalizes a URL so trivially different spellings share one cache entry."""
+    parsed = urlparse(url.strip())
+    scheme = (parsed.scheme or "https").lower()
+    host = (parsed.hostname or "").lower()
+    if parsed.port and not ((scheme == "http" and parsed.port == 80) or (scheme == "https" and parsed.port == 443)):
+        host = f"{host}:{parsed.port}"
+    path = parsed.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+    query = sorted((k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+                   if not k.lower().startswith(TRACKING_PARAMS))
+    return urlunparse((scheme, host, path, "", urlencode(query), ""))
+
+
+class PageCache:
+    """Stores title, text, links and emails extracted from a page."""
+
+    max_text_length = MAX_TEXT_LENGTH
+
+    def __init__(self, path: str = DEFAULT_PATH, ttl: int = DEFAULT_TTL, memory: Optional[MemoryCache] = None):
+        self.path = path
+        self.ttl = ttl
+        self.memory = memory
+        self._local = threading.local()
+        self._init_db()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self) -> None:
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                " url TEXT PRIMARY KEY,"
+                " title TEXT,"
+                " text TEXT,"
+                " links TEXT,"
+                " emails TEXT,"
+                " etag TEXT,"
+                " last_modified TEXT,"
+                " fetched_at REAL,"
+                " canonical TEXT)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(pages)")}
+            if "canonical" not in columns:  # Databases created before canonical links were stored
+                conn.execute("ALTER TABLE pages ADD COLUMN canonical TEXT")
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Returns the cached entry for a URL (fresh or stale), or None."""
+        key = canonical_url(url)
+        if self.memory is not None:
+            entry = self.memory.get(key)
+            if entry is not None:
+                return dict(entry)
+        try:
+            row = self._conn().execute(
+                "SELECT title, text, links, emails, etag, last_modified, fetched_at, canonical FROM pages WHERE url = ?",
+                (key,)).fetchone()
+        except sqlite3.Error as e:
+            logging.error(f"Page cache read failed for {url}: {e}")
+            return None
+        if row is None:
+            return None
+        entry = {
+            "title": row[0],
+            "text": row[1],
+            "links": json.loads(row[2] or "[]"),
+            "emails": json.loads(row[3] or "[]"),
+            "etag": row[4],
+            "last_modified": row[5],
+            "fetched_at": row[6],
+            "canonical": row[7],
+        }
+        if self.memory is not None:
+            self.memory.set(key, entry)
+        return dict(entry)
+
+    def is_fresh(self, entry: Dict) -> bool:
+        return time.time() - entry["fetched_at"] < self.ttl
+
+    def put(self, url: str, title: str, text: str, links=None, emails=None,
+            etag: Optional[str] = None, last_modified: Optional[str] = None, canonical: Optional[str] = None) -> None:
+        """Stores freshly extracted content together with its validators and declared canonical URL."""
+        key = canonical_url(url)
+        entry = {
+            "title": str(title) if title is not None else None,  # Not a parser string tied to its document
+            "text": text[:MAX_TEXT_LENGTH],
+            "links": list(links or []),
+            "emails": list(emails or []),
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+            "canonical": canonical,
+        }
+        if self.memory is not None:
+            self.memory.set(key, entry)
+        try:
+            with self._conn() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO pages (url, title, text, links, emails, etag, last_modified, fetched_at, canonical)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, entry["title"], entry["text"], json.dumps(entry["links"]), json.dumps(entry["emails"]),
+                     etag, last_modified, entry["fetched_at"], canonical))
+        except sqlite3.Error as e:
+            logging.error(f"Page cache write failed for {url}: {e}")
+
+    def touch(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Marks an entry fresh again after a 304 Not Modified."""
+        if self.memory is not None:
+            self.memory.pop(canonical_url(url))  # Reloaded from disk on next read
+        try:
+            with self._conn() as conn:
+                conn.execute(
+                    "UPDATE pages SET fetched_at = ?, etag = COALESCE(?, etag),"
+                    " last_modified = COALESCE(?, last_modified) WHERE url = ?",
+                    (time.time(), etag, last_modified, canonical_url(url)))
+        except sqlite3.Error as e:
+            logging.error(f"Page cache update failed for {url}: {e}")
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict]) -> Dict[str, str]:
+        """Builds If-None-Match / If-Modified-Since headers for a stale entry."""
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def purge_expired(self, max_age: int = MAX_AGE) -> int:
+        """Deletes entries older than max_age seconds. Returns the number removed."""
+        try:
+            with self._conn() as conn:
+                cursor = conn.execute("DELETE FROM pages WHERE fetched_at < ?", (time.time() - max_age,))
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            logging.error(f"Page cache purge failed: {e}")
+            return 0
+
+    def stats(self) -> Dict:
+        """Returns the entry count on disk and the memory tier's stats."""
+        try:
+            on_disk = self._conn().execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        except sqlite3.Error:
+            on_disk = None
+        return {"disk_entries": on_disk, "memory": self.memory.stats() if self.memory is not None else None}
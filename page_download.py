@@ -0,0 +1,155 @@
+"""Helpers for streaming page downloads with a byte ceiling and content-type gating.
+
+Page fetchers only keep the first few thousand characters of visible text,
+so there is no point downloading multi-megabyte bodies or binary files.
+These helpers let a fetcher skip non-text resources from the URL or the
+response headers alone, and stop reading the body once either the byte cap
+is reached or enough visible text has been seen.
+"""
+import re
+from typing import Iterable, Optional, Tuple
+from urllib.parse import urlparse
+
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024  # Hard ceiling per page body
+CHUNK_SIZE = 16 * 1024
+TEXT_SAFETY_FACTOR = 1.5             # Read a bit past the text target; the estimate is rough
+MAX_PENDING_TAG = 4096               # A "<" not closed within this many bytes is treated as text
+
+BINARY_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".ico", ".tif", ".tiff", ".svg",
+    ".mp3", ".mp4", ".m4a", ".avi", ".mov", ".mkv", ".webm", ".wav", ".ogg", ".flac",
+    ".zip", ".gz", ".tgz", ".tar", ".rar", ".7z", ".bz2", ".xz",
+    ".exe", ".msi", ".dmg", ".iso", ".bin", ".apk",
+    ".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx",
+    ".woff", ".woff2", ".ttf", ".otf", ".eot", ".css", ".js",
+}
+TEXT_CONTENT_TYPES = {"text/html", "application/xhtml+xml", "text/plain", "application/xml", "text/xml"}
+NON_PAGE_TEXT_TYPES = {"text/css", "text/javascript", "text/csv", "text/calendar"}
+
+_SKIPPED_ELEMENTS = (b"script", b"style", b"noscript", b"template")
+_TAG_NAME = re.compile(rb"[a-z0-9]+")
+_WHITESPACE = re.compile(rb"\s+")
+_UTF8_CONTINUATION = bytes(range(0x80, 0xC0))
+
+
+def looks_binary_url(url: str) -> bool:
+    """True if the URL path ends in an extension that is never an HTML page."""
+    path = urlparse(url).path.lower()
+    dot = path.rfind(".")
+    return dot != -1 and "/" not in path[dot:] and path[dot:] in BINARY_EXTENSIONS
+
+
+def is_text_content_type(content_type: Optional[str]) -> bool:
+    """True for HTML/text responses. A missing header is given the benefit of the doubt."""
+    if not content_type:
+        return True
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if media_type in TEXT_CONTENT_TYPES:
+        return True
+    return media_type.startswith("text/") and media_type not in NON_PAGE_TEXT_TYPES
+
+
+class VisibleTextCounter:
+    """
+    Incrementally estimates how many characters of visible text an HTML
+    stream contains, skipping tags, comments and script/style bodies.
+    Whitespace runs count as one character, matching get_text(strip=True).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._pending = b""
+        self._skip_until: Optional[bytes] = None
+
+    def feed(self, chunk: bytes) -> int:
+        data = self._pending + chunk
+        self._pending = b""
+        lower = data.lower()
+        pos, end = 0, len(data)
+        while pos < end:
+            if self._skip_until:
+                idx = lower.find(self._skip_until, pos)
+                if idx == -1:
+                    # Keep a tail in case the closing tag straddles chunks
+                    self._pending = data[max(pos, end - len(self._skip_until)):]
+                    return self.count
+                self._skip_until = None
+                pos = idx
+                continue
+            lt = data.find(b"<", pos)
+            self._count_text(data[pos:end if lt == -1 else lt])
+            if lt == -1:
+                break
+            if lower.startswith(b"<!--", lt):
+                close = data.find(b"-->", lt + 4)
+                if close == -1:
+                    self._hold(data[lt:])
+                    return self.count
+                pos = close + 3
+                continue
+            gt = data.find(b">", lt)
+            if gt == -1:
+                self._hold(data[lt:])
+                return self.count
+            name = _TAG_NAME.match(lower, lt + 1)
+            if name and name.group() in _SKIPPED_ELEMENTS and not data[gt - 1:gt] == b"/":
+                self._skip_until = b"</" + name.group()
+            pos = gt + 1
+        return self.count
+
+    def _count_text(self, text: bytes) -> None:
+        if text:
+            collapsed = _WHITESPACE.sub(b" ", text)
+            self.count += len(collapsed.translate(None, _UTF8_CONTINUATION))
+
+    def _hold(self, tail: bytes) -> None:
+        if len(tail) > MAX_PENDING_TAG:
+            self._count_text(tail)
+        else:
+            self._pending = tail
+
+
+class CappedReader:
+    """Accumulates body chunks until the byte cap or the visible-text target is hit."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, text_chars: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.text_target = int(text_chars * TEXT_SAFETY_FACTOR) if text_chars else None
+        self.truncated = False
+        self._chunks = []
+        self._size = 0
+        self._counter = VisibleTextCounter()
+
+    def feed(self, chunk: bytes) -> bool:
+        """Adds a chunk. Returns False once reading should stop."""
+        if not chunk:
+            return True
+        remaining = self.max_bytes - self._size
+        if len(chunk) >= remaining:
+            chunk = chunk[:remaining]
+            self.truncated = True
+        self._chunks.append(chunk)
+        self._size += len(chunk)
+        if self.truncated:
+            return False
+        if self.text_target and self._counter.feed(chunk) >= self.text_target:
+            self.truncated = True
+            return False
+        return True
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def body(self) -> bytes:
+        return b"".join(self._chunks)
+
+
+def read_capped(chunks: Iterable[bytes], max_bytes: int = DEFAULT_MAX_BYTES,
+                text_chars: Optional[int] = None) -> Tuple[bytes, bool]:
+    """Reads from a chunk iterator (e.g. response.iter_content) up to the caps."""
+    reader = CappedReader(max_bytes, text_chars)
+    for chunk in chunks:
+        if not reader.feed(chunk):
+            break
+    return reader.body(), reader.truncated
@@ -0,0 +1,186 @@
+"""Per-host politeness scheduling for the threaded scrapers in app.py.
+
+Worker threads take a ``slot(url)`` before talking to a host. The scheduler
+caps concurrent requests per host, spaces request starts by a minimum
+interval, honours Retry-After (and backs off on bare 429s), and answers
+robots.txt questions from a per-host cache. A host that is cooling down for
+longer than ``max_wait`` is skipped immediately with HostBackoff instead of
+tying up a worker for the whole penalty.
+"""
+import email.utils
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+DEFAULT_MAX_PER_HOST = 2
+DEFAULT_MIN_INTERVAL = 1.0      # Seconds between request starts to one host
+DEFAULT_MAX_WAIT = 15.0         # Longest a caller will wait for a host before giving up
+DEFAULT_BACKOFF = 30.0          # Cooldown after a 429 without Retry-After
+MAX_RETRY_AFTER = 300.0         # Cap on server-provided Retry-After
+ROBOTS_TTL = 3600
+ROBOTS_TIMEOUT = 5
+
+
+class HostBackoff(requests.exceptions.RequestException):
+    """Raised when a host is cooling down, over capacity, or disallowed by robots.txt."""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses a Retry-After header (delta-seconds or HTTP-date) into seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class _HostState:
+    def __init__(self, max_per_host: int):
+        self.semaphore = threading.BoundedSemaphore(max_per_host)
+        self.lock = threading.Lock()
+        self.next_start = 0.0
+        self.blocked_until = 0.0
+        self.robots: Optional[RobotFileParser] = None
+        self.robots_fetched_at = 0.0
+        self.robots_loading: Optional[threading.Event] = None  # Set while one thread downloads robots.txt
+        self.stats = {"requests": 0, "waited_seconds": 0.0, "backoffs": 0, "skipped": 0, "robots_denied": 0}
+
+
+class PolitenessScheduler:
+    def __init__(self, max_per_host: int = DEFAULT_MAX_PER_HOST, min_interval: float = DEFAULT_MIN_INTERVAL,
+                 max_wait: float = DEFAULT_MAX_WAIT, user_agent: str = "*",
+                 robots_fetcher: Optional[Callable[[str], requests.Response]] = None):
+        self.max_per_host = max_per_host
+        self.min_interval = min_interval
+        self.max_wait = max_wait
+        self.user_agent = user_agent
+        self._robots_fetcher = robots_fetcher or (lambda url: requests.get(url, timeout=ROBOTS_TIMEOUT))
+        self._hosts: Dict[str, _HostState] = {}
+        self._host_intervals: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, host: str) -> _HostState:
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = _HostState(self.max_per_host)
+            return state
+
+    def set_min_interval(self, host: str, seconds: float) -> None:
+        """Overrides the spacing between request starts for one host (e.g. a search engine's rate limit)."""
+        self._host_intervals[host.lower()] = seconds
+
+    @contextmanager
+    def slot(self, url: str):
+        """Blocks until the host may be contacted, then holds one of its connection slots."""
+        host = urlparse(url).netloc.lower()
+        state = self._state(host)
+        deadline = time.time() + self.max_wait
+        if state.blocked_until > deadline:
+            self._skip(state, host, f"cooling down for {state.blocked_until - time.time():.0f}s")
+        if not state.semaphore.acquire(timeout=self.max_wait):
+            self._skip(state, host, "all slots busy")
+        try:
+            with state.lock:
+                now = time.time()
+                start = max(now, state.next_start, state.blocked_until)
+                if start <= deadline:
+                    state.next_start = start + self._host_intervals.get(host, self.min_interval)
+                    state.stats["requests"] += 1
+                    state.stats["waited_seconds"] += start - now
+            if start > deadline:
+                self._skip(state, host, "no start slot within max wait")
+            if start > now:
+                time.sleep(start - now)
+            yield
+        finally:
+            state.semaphore.release()
+
+    def _skip(self, state: _HostState, host: str, reason: str):
+        with state.lock:
+            state.stats["skipped"] += 1
+        raise HostBackoff(f"Skipping {host}: {reason}")
+
+    def record_response(self, url: str, response: requests.Response) -> None:
+        """Starts a cooldown when the host answers 429/503 (honouring Retry-After)."""
+        if response.status_code not in (429, 503):
+            return
+        delay = parse_retry_after(response.headers.get("Retry-After"))
+        if delay is None:
+            if response.status_code == 503:
+                return  # Plain 503s are retried by the HTTP pool
+            delay = DEFAULT_BACKOFF
+        delay = min(delay, MAX_RETRY_AFTER)
+        host = urlparse(url).netloc.lower()
+        state = self._state(host)
+        with state.lock:
+            state.blocked_until = max(state.blocked_until, time.time() + delay)
+            state.stats["backoffs"] += 1
+        logging.warning(f"{host} answered {response.status_code}; backing off for {delay:.0f}s")
+
+    def can_fetch(self, url: str) -> bool:
+        """Checks robots.txt for the URL, fetching and caching the host's rules as needed."""
+        parsed = urlparse(url)
+        host = parsed.netloc.lower()
+        state = self._state(host)
+        with state.lock:
+            stale = state.robots is None or time.time() - state.robots_fetched_at > ROBOTS_TTL
+            loading = state.robots_loading
+            owner = stale and loading is None
+            if owner:
+                loading = state.robots_loading = threading.Event()
+        # The download happens outside the host lock so slot()/record_response() aren't held up by it
+        if owner:
+            parser = None
+            try:
+                parser = self._load_robots(f"{parsed.scheme or 'https'}://{host}/robots.txt")
+            finally:
+                with state.lock:
+                    if parser is not None:
+                        state.robots = parser
+                        state.robots_fetched_at = time.time()
+                    state.robots_loading = None
+                loading.set()
+        elif stale and state.robots is None:
+            loading.wait(ROBOTS_TIMEOUT * 2)  # Another thread is fetching; an expired copy is used meanwhile
+        with state.lock:
+            allowed = state.robots is None or state.robots.can_fetch(self.user_agent, url)
+            if not allowed:
+                state.stats["robots_denied"] += 1
+        return allowed
+
+    def _load_robots(self, robots_url: str) -> RobotFileParser:
+        parser = RobotFileParser(robots_url)
+        try:
+            response = self._robots_fetcher(robots_url)
+            if response.status_code in (401, 403):
+                parser.disallow_all = True
+            elif response.status_code == 200:
+                parser.parse(response.text.splitlines())
+            else:
+                parser.allow_all = True
+        except requests.exceptions.RequestException as e:
+            logging.debug(f"robots.txt unavailable at {robots_url}: {e}")
+            parser.allow_all = True
+        return parser
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hosts = dict(self._hosts)
+        now = time.time()
+        return {
+            host: dict(state.stats, waited_seconds=round(state.stats["waited_seconds"], 2),
+                       cooldown_remaining=round(max(0.0, state.blocked_until - now), 1))
+            for host, state in hosts.items()
+        }
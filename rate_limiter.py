@@ -0,0 +1,153 @@
+"""Token-bucket rate limiting for LLM calls, shared across threads and workers.
+
+Each model has up to two buckets, refilled continuously:
+
+    requests  capacity ``requests_per_minute``, one token per call
+    tokens    capacity ``tokens_per_minute``, the call's estimated prompt +
+              completion tokens (corrected with ``record_usage`` once the real
+              usage is known)
+
+Bucket levels live in SQLite, updated inside a ``BEGIN IMMEDIATE``
+transaction, so every thread and every uvicorn worker on the host draws from
+the same quota. A call takes its tokens right away, even if that leaves a
+bucket negative, and then waits until the deficit has refilled. Concurrent
+callers therefore queue up in order instead of polling. If the database is
+unavailable the limiter fails open.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+import token_counter
+
+DEFAULT_PATH = os.getenv("RATE_LIMIT_PATH", "rate_limits.db")
+DEFAULT_COMPLETION_TOKENS = 1024  # Assumed completion size until record_usage corrects it
+
+_BUCKETS = (("requests", "requests_per_minute"), ("tokens", "tokens_per_minute"))
+
+
+def estimate_call_tokens(prompt: str, model: Optional[str] = None) -> int:
+    """Tokens to reserve for a call: the prompt plus an assumed completion size."""
+    return token_counter.count_tokens(prompt, model) + DEFAULT_COMPLETION_TOKENS
+
+
+class TokenBucketLimiter:
+    """Per-model requests-per-minute and tokens-per-minute limits. Unlisted models are not limited."""
+
+    def __init__(self, limits: Dict[str, Dict], path: str = DEFAULT_PATH):
+        self.limits = limits
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict] = {}
+        self._init_db()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode, so transactions are only the explicit BEGIN IMMEDIATE ones
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self) -> None:
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " model TEXT,"
+            " kind TEXT,"
+            " level REAL,"
+            " updated REAL,"
+            " PRIMARY KEY (model, kind))"
+        )
+
+    def _take(self, model: str, costs: Dict[str, float]) -> float:
+        """Refills the model's buckets, subtracts ``costs`` and returns the seconds until none is negative."""
+        limits = self.limits[model]
+        conn = self._conn()
+        wait = 0.0
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            for kind, limit_key in _BUCKETS:
+                capacity = limits.get(limit_key)
+                if not capacity or kind not in costs:
+                    continue
+                rate = capacity / 60.0
+                row = conn.execute("SELECT level, updated FROM buckets WHERE model = ? AND kind = ?",
+                                   (model, kind)).fetchone()
+                level = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+                level = min(capacity, level - min(costs[kind], capacity))  # A single call can't exceed a full bucket
+                if level < 0:
+                    wait = max(wait, -level / rate)
+                conn.execute("INSERT OR REPLACE INTO buckets (model, kind, level, updated) VALUES (?, ?, ?, ?)",
+                             (model, kind, level, now))
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            logging.error(f"Rate limiter unavailable for {model}, not limiting: {e}")
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            return 0.0
+        return wait
+
+    def reserve(self, model: str, tokens: int = 0) -> float:
+        """Takes one request and ``tokens`` tokens from the model's quota; returns how long to wait before sending."""
+        if model not in self.limits:
+            return 0.0
+        wait = self._take(model, {"requests": 1, "tokens": tokens})
+        with self._lock:
+            stats = self._stats.setdefault(model, {"calls": 0, "delayed": 0, "wait_total": 0.0, "wait_max": 0.0})
+            stats["calls"] += 1
+            if wait > 0:
+                stats["delayed"] += 1
+                stats["wait_total"] += wait
+                stats["wait_max"] = max(stats["wait_max"], wait)
+        if wait > 0:
+            logging.info(f"Rate limiting {model}, waiting for {wait:.2f} seconds")
+        return wait
+
+    def acquire(self, model: str, tokens: int = 0) -> None:
+        """Blocks until a call of ``tokens`` tokens to ``model`` is within its limits."""
+        wait = self.reserve(model, tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, model: str, tokens: int = 0) -> None:
+        """Awaitable ``acquire``; the event loop keeps running while the call waits."""
+        wait = await asyncio.to_thread(self.reserve, model, tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record_usage(self, model: str, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Corrects the tokens bucket once a call's real usage is known (refunds if it used fewer)."""
+        if model in self.limits and actual_tokens is not None and actual_tokens != estimated_tokens:
+            self._take(model, {"tokens": actual_tokens - estimated_tokens})
+
+    def stats(self) -> Dict:
+        with self._lock:
+            local = {model: dict(stats) for model, stats in self._stats.items()}
+        try:
+            rows = self._conn().execute("SELECT model, kind, level, updated FROM buckets").fetchall()
+        except sqlite3.Error:
+            rows = []
+        now = time.time()
+        result = {}
+        for model, limits in self.limits.items():
+            entry = {key: limits.get(key) for _, key in _BUCKETS}
+            for row_model, kind, level, updated in rows:
+                capacity = limits.get(dict(_BUCKETS).get(kind))
+                if row_model == model and capacity:
+                    entry[f"{kind}_available"] = round(min(capacity, level + (now - updated) * capacity / 60.0), 1)
+            stats = local.get(model)
+            if stats:
+                stats["wait_total"] = round(stats["wait_total"], 2)
+                stats["wait_max"] = round(stats["wait_max"], 2)
+                entry.update(stats)
+            result[model] = entry
+        return result
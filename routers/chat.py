@@ -1,30 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select
-from database import get_session
+from database import engine, get_session
 from models import User, Conversation, Message
 from auth import get_current_user
 from pydantic import BaseModel
 from typing import List, Optional
 import os
-from groq import Groq
+import asyncio
+import logging
+from groq import Groq, AsyncGroq
+import cassette
+import sse
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
 # Config
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-client = Groq(api_key=GROQ_API_KEY)
+client = Groq(api_key=GROQ_API_KEY, http_client=cassette.http_client())
+async_client = AsyncGroq(api_key=GROQ_API_KEY, http_client=cassette.async_http_client())
 DEFAULT_MODEL = "llama-3.3-70b-versatile"
 
 class ChatRequest(BaseModel):
     message: str
     conversation_id: Optional[int] = None
 
-@router.post("")
-async def chat_endpoint(
-    request: ChatRequest, 
-    user: User = Depends(get_current_user), 
-    session: Session = Depends(get_session)
-):
+def _prepare_chat(request: ChatRequest, user: User, session: Session):
+    """Gets or creates the conversation, adds the user's message and returns (conversation, groq_messages)."""
     # 1. Get or Create Conversation
     if request.conversation_id:
         conversation = session.get(Conversation, request.conversation_id)
@@ -55,7 +56,22 @@ async def chat_endpoint(
         # Map our roles to Groq roles
         role = "assistant" if m.role == "assistant" else "user"
         groq_messages.append({"role": role, "content": m.content})
-    
+    return conversation, groq_messages
+
+def _save_reply(conversation_id: int, response_text: str):
+    # The request's session may already be closed once a streamed response is running
+    with Session(engine) as session:
+        session.add(Message(conversation_id=conversation_id, role="assistant", content=response_text))
+        session.commit()
+
+@router.post("")
+async def chat_endpoint(
+    request: ChatRequest, 
+    user: User = Depends(get_current_user), 
+    session: Session = Depends(get_session)
+):
+    conversation, groq_messages = _prepare_chat(request, user, session)
+
     # 4. Call Groq
     try:
         completion = client.chat.completions.create(
@@ -78,6 +94,42 @@ async def chat_endpoint(
         "title": conversation.title
     }
 
+@router.post("/stream")
+async def chat_stream_endpoint(
+    request: ChatRequest,
+    user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """Same as POST /api/chat, as Server-Sent Events: conversation, token..., then done (see sse.py)."""
+    conversation, groq_messages = _prepare_chat(request, user, session)
+    session.commit()  # Keep the user's message even if the stream is cut off
+    conversation_id, title = conversation.id, conversation.title
+
+    async def events():
+        yield sse.format_event("conversation", {"conversation_id": conversation_id, "title": title})
+        parts = []
+        try:
+            stream = await async_client.chat.completions.create(
+                messages=groq_messages,
+                model=DEFAULT_MODEL,
+                stream=True
+            )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield sse.format_event("token", {"text": delta})
+        except Exception as e:
+            logging.error(f"Groq API Error: {e}")
+            yield sse.format_event("error", {"detail": "Failed to get AI response"})
+            return
+        # 5. Save AI Message once the whole reply has arrived
+        response_text = "".join(parts)
+        await asyncio.to_thread(_save_reply, conversation_id, response_text)
+        yield sse.format_event("done", {"response": response_text, "conversation_id": conversation_id, "title": title})
+
+    return sse.streaming_response(events())
+
 @router.get("/conversations")
 async def get_conversations(user: User = Depends(get_current_user), session: Session = Depends(get_session)):
     # Sort by descending to show newest on top in sidebar
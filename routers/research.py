@@ -1,16 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from fastapi.responses import JSONResponse, StreamingResponse
-from groq import Groq
+from groq import Groq, AsyncGroq
 from pydantic import BaseModel
 from typing import List, Optional
 import os
-import requests
-from bs4 import BeautifulSoup
+import asyncio
 import re
 import random
 import logging
-import concurrent.futures
-from urllib.parse import urlparse, urljoin, quote_plus
+from urllib.parse import urlparse, urljoin
 from io import BytesIO
 import json
 from reportlab.lib.pagesizes import A4
@@ -20,6 +18,22 @@ from reportlab.lib.enums import TA_JUSTIFY
 from reportlab.lib import colors
 
 from fastapi.templating import Jinja2Templates
+import async_fetch
+import cassette
+import context_packer
+import token_counter
+import rate_limiter
+import sse
+import search_engines
+import url_ranking
+import extraction
+import charset_detection
+from page_cache import PageCache, canonical_url
+from memory_cache import MemoryCache
+from single_flight import AsyncSingleFlight
+from search_cache import SearchCache, normalize_query
+from llm_cache import LLMCache
+from dedup import PageDeduplicator
 
 router = APIRouter(prefix="/api", tags=["research"])
 templates = Jinja2Templates(directory="templates")
@@ -31,14 +45,32 @@ async def research_page(request: Request):
 
 # Config
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-groq_client = Groq(api_key=GROQ_API_KEY)
+groq_client = Groq(api_key=GROQ_API_KEY, http_client=cassette.http_client())
+async_groq_client = AsyncGroq(api_key=GROQ_API_KEY, http_client=cassette.async_http_client())
 DEFAULT_MODEL = "llama-3.3-70b-versatile"
+LLM_RATE_LIMITS = {  # Groq free tier; quota state is shared with every worker via rate_limiter's SQLite file
+    DEFAULT_MODEL: {"requests_per_minute": int(os.getenv("GROQ_RPM", 30)),
+                    "tokens_per_minute": int(os.getenv("GROQ_TPM", 12000))},
+}
+llm_limiter = rate_limiter.TokenBucketLimiter(LLM_RATE_LIMITS)
+# Whole prompt, template included; on the free tier one call has to fit in a minute's TPM with its completion
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", min(
+    8000, LLM_RATE_LIMITS[DEFAULT_MODEL]["tokens_per_minute"] - rate_limiter.DEFAULT_COMPLETION_TOKENS)))
+SNIPPET_MIN_RELEVANCE = float(os.getenv("SNIPPET_MIN_RELEVANCE", 0.1))  # Share of the best BM25 score a source needs
 USER_AGENTS = [
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
     'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Safari/605.1.15',
 ]
-MAX_WORKERS = 10
+MAX_CONCURRENT_FETCHES = 10
+FETCH_TOP_K = int(os.getenv("FETCH_TOP_K", 10))  # Pages downloaded per online search (see url_ranking.py)
 SNIPPET_LENGTH = 3000
+MAX_PAGE_BYTES = int(os.getenv("MAX_PAGE_BYTES", 2 * 1024 * 1024))
+MEMORY_CACHE_MAX_BYTES = int(os.getenv("MEMORY_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+page_cache = PageCache(memory=MemoryCache(max_bytes=MEMORY_CACHE_MAX_BYTES))
+search_cache = SearchCache()
+llm_cache = LLMCache()
+page_fetches = AsyncSingleFlight()  # Keyed by canonical URL
+search_flights = AsyncSingleFlight()  # Keyed by (engine, query)
 
 class ResearchRequest(BaseModel):
     query: str
@@ -118,51 +150,149 @@ def generate_pdf_flowable(title, content, links):
     buffer.seek(0)
     return buffer
 
-def scrape_search_engine(query, engine="duckduckgo"):
-    results = []
-    if engine == "duckduckgo":
-        url = f"https://html.duckduckgo.com/html/?q={quote_plus(query)}"
-        try:
-            res = requests.get(url, headers={'User-Agent': get_random_user_agent()}, timeout=10)
-            if res.status_code == 200:
-                soup = BeautifulSoup(res.text, 'html.parser')
-                for a in soup.find_all('a', class_='result__a', href=True):
-                    href = a['href']
-                    if 'duckduckgo.com' not in href and href.startswith('http'):
-                        results.append(href)
-        except Exception as e:
-            logging.error(f"DDG Error: {e}")
-    return list(set(results))
+async def scrape_search_engine(query, engine="duckduckgo"):
+    cached = await asyncio.to_thread(search_cache.get, engine, query)
+    if cached is not None:
+        return cached
+    # Identical searches already in flight are joined rather than repeated
+    return list(await search_flights.do((engine, normalize_query(query)), _search_and_cache, query, engine))
+
+async def _search_and_cache(query, engine):
+    results = await _scrape_search_engine(query, engine)
+    await asyncio.to_thread(search_cache.put, engine, query, results)
+    return results
 
-def fetch_page_content(url):
+async def _scrape_search_engine(query, engine):
+    # Same engine plugins as app.py; parsing runs off the event loop
+    plugin = search_engines.get_engine(engine)
+    if plugin is None:
+        logging.warning(f"Unknown search engine: {engine}")
+        return []
     try:
-        res = requests.get(url, headers={'User-Agent': get_random_user_agent()}, timeout=10)
-        if res.status_code != 200: return "", [], []
-        
-        soup = BeautifulSoup(res.content, 'html.parser')
-        
-        # Extract emails
-        emails = re.findall(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}', soup.get_text())
-        
-        # Extract links
-        links = [a['href'] for a in soup.find_all('a', href=True) if a['href'].startswith('http')]
+        res = await async_fetch.fetch(plugin.build_url(query), headers={'User-Agent': get_random_user_agent()})
+        if res is not None and res.status_code == 200:
+            return await asyncio.to_thread(plugin.parse, res.text, query)
+    except Exception as e:
+        logging.error(f"{plugin.name} Error: {e}")
+    return []
+
+def _extract_page(body, content_type):
+    html = charset_detection.decode_body(body, content_type)
+    page = extraction.extract_page(html)
+    # Extract emails
+    page['emails'] = re.findall(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}', page['text'])
+    return page
+
+def _page_result(entry):
+    links = [link for link in entry['links'] if link.startswith('http')]
+    return entry['text'][:SNIPPET_LENGTH], list(set(entry['emails'])), list(set(links))
 
-        for s in soup(["script", "style"]): s.decompose()
-        text = soup.get_text(separator=' ', strip=True)[:SNIPPET_LENGTH]
-        return text, list(set(emails)), list(set(links))
-    except:
+async def fetch_page_content(url):
+    try:
+        cached = await asyncio.to_thread(page_cache.get, url)
+        if cached and page_cache.is_fresh(cached):
+            return _page_result(cached)
+        # Concurrent requests for the same page share one download
+        entry = await page_fetches.do(canonical_url(url), _download_page, url, cached)
+        return _page_result(entry) if entry else ("", [], [])
+    except Exception:
         return "", [], []
 
-def generate_llm_response(prompt):
+async def _download_page(url, cached):
+    headers = {'User-Agent': get_random_user_agent()}
+    headers.update(page_cache.conditional_headers(cached))  # Revalidate stale entries
+    res, body = await async_fetch.fetch_text_page(url, headers=headers, max_bytes=MAX_PAGE_BYTES,
+                                                  text_chars=page_cache.max_text_length)
+    if res is not None and res.status_code == 304 and cached:
+        await asyncio.to_thread(page_cache.touch, url, res.headers.get('ETag'), res.headers.get('Last-Modified'))
+        return cached
+    if res is None or res.status_code != 200 or not body: return None
+    # Decoding (chardet) and parsing are CPU-bound, keep them off the event loop
+    entry = await asyncio.to_thread(_extract_page, body, res.headers.get('Content-Type'))
+    await asyncio.to_thread(page_cache.put, url, entry['title'], entry['text'], entry['links'], entry['emails'],
+                            res.headers.get('ETag'), res.headers.get('Last-Modified'), entry['canonical'])
+    return entry
+
+async def generate_llm_response(prompt, use_cache=True):
+    # Identical prompts (repeat summaries, extraction from the same page) are answered from llm_cache
+    if use_cache:
+        cached = await asyncio.to_thread(llm_cache.get, DEFAULT_MODEL, prompt)
+        if cached is not None:
+            return cached
+    else:
+        llm_cache.bypass()
+    estimated_tokens = rate_limiter.estimate_call_tokens(prompt, DEFAULT_MODEL)
     try:
-        completion = groq_client.chat.completions.create(
+        await llm_limiter.acquire_async(DEFAULT_MODEL, estimated_tokens)
+        completion = await async_groq_client.chat.completions.create(
             messages=[{"role": "user", "content": prompt}],
             model=DEFAULT_MODEL,
         )
-        return completion.choices[0].message.content
+        usage = getattr(completion, "usage", None)
+        await asyncio.to_thread(llm_limiter.record_usage, DEFAULT_MODEL, estimated_tokens,
+                                getattr(usage, "total_tokens", None))
+        token_counter.observe(DEFAULT_MODEL, prompt, getattr(usage, "prompt_tokens", None))
+        content = completion.choices[0].message.content
+        if use_cache:
+            await asyncio.to_thread(llm_cache.put, DEFAULT_MODEL, prompt, content)
+        return content
     except Exception as e:
         return str(e)
 
+async def stream_llm_response(prompt, use_cache=True):
+    """Like generate_llm_response, but yields the completion piece by piece as Groq produces it."""
+    if use_cache:
+        cached = await asyncio.to_thread(llm_cache.get, DEFAULT_MODEL, prompt)
+        if cached is not None:
+            yield cached
+            return
+    else:
+        llm_cache.bypass()
+    estimated_tokens = rate_limiter.estimate_call_tokens(prompt, DEFAULT_MODEL)
+    parts = []
+    try:
+        await llm_limiter.acquire_async(DEFAULT_MODEL, estimated_tokens)
+        stream = await async_groq_client.chat.completions.create(
+            messages=[{"role": "user", "content": prompt}],
+            model=DEFAULT_MODEL,
+            stream=True,
+        )
+        usage = None
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield delta
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or usage  # Sent with the last chunk
+        await asyncio.to_thread(llm_limiter.record_usage, DEFAULT_MODEL, estimated_tokens,
+                                getattr(usage, "total_tokens", None))
+        token_counter.observe(DEFAULT_MODEL, prompt, getattr(usage, "prompt_tokens", None))
+    except Exception as e:
+        yield str(e)
+        return
+    if use_cache:
+        await asyncio.to_thread(llm_cache.put, DEFAULT_MODEL, prompt, "".join(parts))
+
+@router.get("/status/single_flight")
+async def single_flight_status():
+    return JSONResponse({"page_fetches": page_fetches.stats(), "searches": search_flights.stats()})
+
+@router.get("/status/search_cache")
+async def search_cache_status():
+    return JSONResponse(await asyncio.to_thread(search_cache.stats))
+
+@router.get("/status/llm_cache")
+async def llm_cache_status():
+    return JSONResponse(await asyncio.to_thread(llm_cache.stats))
+
+@router.get("/status/rate_limits")
+async def rate_limits_status():
+    return JSONResponse(await asyncio.to_thread(llm_limiter.stats))
+
+@router.get("/status/tokens")
+async def token_counter_status():
+    return JSONResponse(token_counter.get_counter().stats())
+
 @router.post("/online")
 async def online_search(request: Request):
     try:
@@ -172,29 +302,99 @@ async def online_search(request: Request):
         
         engines = data.get('search_engines', ["duckduckgo"])
         
-        results = []
-        for engine in engines:
-            results.extend(scrape_search_engine(query, engine))
-        
-        results = list(set(results))[:10]
+        engine_results = await asyncio.gather(*(scrape_search_engine(query, engine) for engine in engines))
+        # Rank candidates before downloading anything; only the best FETCH_TOP_K are fetched
+        results = url_ranking.rank_urls(dict(zip(engines, engine_results)), top_k=FETCH_TOP_K)
         
-        content_list = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            futures = {executor.submit(fetch_page_content, u): u for u in results}
-            for future in concurrent.futures.as_completed(futures):
-                text, _, _ = future.result()
-                if text: content_list.append(text)
-
-        combined = "\n\n".join(content_list[:5])
-        prompt = f"Analyze and summarize based on: '{query}':\n\n{combined}"
-        explanation = generate_llm_response(prompt)
+        pages = await async_fetch.map_limited(fetch_page_content, results, limit=MAX_CONCURRENT_FETCHES)
+        dedup = PageDeduplicator()  # Mirrors/syndicated copies would crowd distinct sources out of the prompt
+        content_list = [page[0] for url, page in zip(results, pages) if page and page[0] and not dedup.check(url, page[0])]
+
+        template = f"Analyze and summarize based on: '{query}':\n\n"
+        packed = await asyncio.to_thread(
+            context_packer.pack, content_list,
+            context_packer.prompt_budget(DEFAULT_MODEL, template, cap=PROMPT_TOKEN_BUDGET), DEFAULT_MODEL, query,
+            min_ratio=SNIPPET_MIN_RELEVANCE)
+        explanation = await generate_llm_response(template + packed["text"])
         
-        return JSONResponse({"explanation": explanation, "references": results})
+        return JSONResponse({"explanation": explanation, "references": results, "dedup": dedup.report(),
+                             "context": context_packer.summary(packed)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/deep_research")
-async def deep_research(req: ResearchRequest):
+FORMATTING_INSTRUCTIONS = {
+    'textual': """
+    Format as **Textual Output** for research papers:
+    - Write in formal academic tone
+    - Include: Introduction, Observations, Analysis, Findings, Conclusion
+    - Use full sentences and paragraphs
+    - Cite sources inline
+    - No tables or equations, pure narrative
+    """,
+    'tabular': """
+    Format as **Tabular Output** for research papers:
+    - Present data in Markdown tables
+    - Include: Comparison tables, Metrics tables, Statistics tables
+    - Use headers: | Metric | Value | Source |
+    - Add summary statistics
+    - Include data interpretation below each table
+    """,
+    'graphical': """
+    Format as **Graphical Output Description** for research papers:
+    - Describe charts and visualizations needed
+    - Suggest: Bar charts, Line graphs, Pie charts, Confusion matrices
+    - Format: "Figure 1: [Description]", "Chart Type: [Type]", "Data Points: [List]"
+    - Include axis labels and legends
+    - Provide data for plotting
+    """,
+    'mathematical': """
+    Format as **Mathematical Output** for research papers:
+    - Use LaTeX-style equations: $$equation$$
+    - Include: Formulas, Models, Algorithms
+    - Define all variables
+    - Show derivations and proofs
+    - Format: "Equation 1:", "Where: x = variable"
+    """,
+    'statistical': """
+    Format as **Statistical Output** for research papers:
+    - Include: Mean, Median, Standard Deviation, Variance
+    - Show: Confidence Intervals, p-values, Hypothesis tests
+    - Present statistical significance
+    - Use format: "Mean ± SD", "CI: [lower, upper]"
+    - Include interpretation of statistics
+    """,
+    'json': """
+    Format as **Structured JSON**:
+    - Return clean JSON structure
+    - Include: {findings: [], metrics: {}, sources: []}
+    - Use proper JSON syntax
+    - Make it parseable
+    """,
+    'action_plan': """
+    Format as a **Strategic Action Plan**:
+    - **Objective**: Clear statement of the goal
+    - **Phases**: Break down the implementation into 3-4 logical phases
+    - **Specific Steps**: Actionable tasks for each phase
+    - **Resources Needed**: Tools, skills, or data required
+    - **Timeline**: Estimated duration per phase
+    - **Risk Assessment**: Potential blockers and mitigation strategies
+    - **KPIs**: How to measure success
+    """,
+    'markdown': """
+    Format as **Comprehensive Markdown Report**:
+    - **Tone**: Academic, executive, high-level
+    - **Structure**:
+      1. **Executive Summary**: Concise overview
+      2. **Key Findings**: Bullet points
+      3. **Detailed Analysis**: Sections with headers (##)
+      4. **Conclusion**: Strategic implications
+    - **Formatting**: Use **bold**, clear headings, cite sources
+    """
+}
+
+async def _gather_sources(req: ResearchRequest, emit=None):
+    """Searches, ranks and fetches sources for a deep research request; ``emit`` gets stage/progress events."""
+    emit = emit or (lambda event, data=None: None)
     query = req.query
     iterations = min(req.max_iterations, 5) 
     
@@ -203,97 +403,41 @@ async def deep_research(req: ResearchRequest):
     all_links = []
     
     # Initial Search
-    urls = []
-    for engine in req.engines:
-        urls.extend(scrape_search_engine(query, engine))
-    
-    urls = list(set(urls))[:iterations*2]
+    emit("stage", {"stage": "searching", "query": query})
+    engine_results = await asyncio.gather(*(scrape_search_engine(query, engine) for engine in req.engines))
+    urls = url_ranking.rank_urls(dict(zip(req.engines, engine_results)), top_k=iterations*2)
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(fetch_page_content, u): u for u in urls}
-        for future in concurrent.futures.as_completed(futures):
-            text, emails, links_found = future.result()
-            if text:
-                all_content.append(text)
-                if "extract_emails" in req.options: all_emails.extend(emails)
-                if "extract_links" in req.options: all_links.extend(links_found)
-                # Always track source URLs for the report logic, even if not extracted for the user list
-                all_links.extend([futures[future]]) 
+    emit("stage", {"stage": "fetching", "total": len(urls)})
+    fetched = 0
+
+    async def fetch_with_progress(url):
+        nonlocal fetched
+        try:
+            return await fetch_page_content(url)
+        finally:
+            fetched += 1
+            emit("progress", {"stage": "fetching", "done": fetched, "total": len(urls)})
+
+    pages = await async_fetch.map_limited(fetch_with_progress, urls, limit=MAX_CONCURRENT_FETCHES)
+    dedup = PageDeduplicator()
+    for url, page in zip(urls, pages):
+        if not page:
+            continue
+        text, emails, links_found = page
+        if text and not dedup.check(url, text):
+            all_content.append(text)
+            if "extract_emails" in req.options: all_emails.extend(emails)
+            if "extract_links" in req.options: all_links.extend(links_found)
+            # Always track source URLs for the report logic, even if not extracted for the user list
+            all_links.extend([url])
+    return all_content, all_emails, all_links, dedup
 
+def _report_prompt(req: ResearchRequest, all_content):
+    """Builds the report prompt, packing the most relevant sources into the prompt budget; returns (prompt, pack report)."""
+    query = req.query
     # Format-specific instructions
     format_type = req.format if hasattr(req, 'format') else 'markdown'
-    
-    formatting_instructions = {
-        'textual': """
-        Format as **Textual Output** for research papers:
-        - Write in formal academic tone
-        - Include: Introduction, Observations, Analysis, Findings, Conclusion
-        - Use full sentences and paragraphs
-        - Cite sources inline
-        - No tables or equations, pure narrative
-        """,
-        'tabular': """
-        Format as **Tabular Output** for research papers:
-        - Present data in Markdown tables
-        - Include: Comparison tables, Metrics tables, Statistics tables
-        - Use headers: | Metric | Value | Source |
-        - Add summary statistics
-        - Include data interpretation below each table
-        """,
-        'graphical': """
-        Format as **Graphical Output Description** for research papers:
-        - Describe charts and visualizations needed
-        - Suggest: Bar charts, Line graphs, Pie charts, Confusion matrices
-        - Format: "Figure 1: [Description]", "Chart Type: [Type]", "Data Points: [List]"
-        - Include axis labels and legends
-        - Provide data for plotting
-        """,
-        'mathematical': """
-        Format as **Mathematical Output** for research papers:
-        - Use LaTeX-style equations: $$equation$$
-        - Include: Formulas, Models, Algorithms
-        - Define all variables
-        - Show derivations and proofs
-        - Format: "Equation 1:", "Where: x = variable"
-        """,
-        'statistical': """
-        Format as **Statistical Output** for research papers:
-        - Include: Mean, Median, Standard Deviation, Variance
-        - Show: Confidence Intervals, p-values, Hypothesis tests
-        - Present statistical significance
-        - Use format: "Mean ± SD", "CI: [lower, upper]"
-        - Include interpretation of statistics
-        """,
-        'json': """
-        Format as **Structured JSON**:
-        - Return clean JSON structure
-        - Include: {findings: [], metrics: {}, sources: []}
-        - Use proper JSON syntax
-        - Make it parseable
-        """,
-        'action_plan': """
-        Format as a **Strategic Action Plan**:
-        - **Objective**: Clear statement of the goal
-        - **Phases**: Break down the implementation into 3-4 logical phases
-        - **Specific Steps**: Actionable tasks for each phase
-        - **Resources Needed**: Tools, skills, or data required
-        - **Timeline**: Estimated duration per phase
-        - **Risk Assessment**: Potential blockers and mitigation strategies
-        - **KPIs**: How to measure success
-        """,
-        'markdown': """
-        Format as **Comprehensive Markdown Report**:
-        - **Tone**: Academic, executive, high-level
-        - **Structure**:
-          1. **Executive Summary**: Concise overview
-          2. **Key Findings**: Bullet points
-          3. **Detailed Analysis**: Sections with headers (##)
-          4. **Conclusion**: Strategic implications
-        - **Formatting**: Use **bold**, clear headings, cite sources
-        """
-    }
-    
-    selected_format = formatting_instructions.get(format_type, formatting_instructions['markdown'])
+    selected_format = FORMATTING_INSTRUCTIONS.get(format_type, FORMATTING_INSTRUCTIONS['markdown'])
     
     # Construct Filtered Queries
     refined_query = query
@@ -302,24 +446,51 @@ async def deep_research(req: ResearchRequest):
     elif req.source_type == "news": refined_query += " site:reuters.com OR site:bloomberg.com OR site:wsj.com"
     
     # Summarize with format-specific instructions
-    # Stay within token limits (~12k for Groq free tier)
-    # 10k characters is roughly 2.5k - 3k tokens
-    combined_content = "\n\n".join(all_content[:10]) 
-    if len(combined_content) > 12000:
-        combined_content = combined_content[:12000] + "... [Truncated for Token Limits]"
+    template = f"Conduct a comprehensive deep research analysis on: '{query}'. {selected_format}\n\n**Source Material**:\n"
+    budget = context_packer.prompt_budget(DEFAULT_MODEL, template, cap=PROMPT_TOKEN_BUDGET)
+    packed = context_packer.pack(all_content, budget, DEFAULT_MODEL, query, min_ratio=SNIPPET_MIN_RELEVANCE)
+    return template + packed["text"], packed
 
-    prompt = f"Conduct a comprehensive deep research analysis on: '{query}'. {selected_format}\n\n**Source Material**:\n{combined_content}"
-    
-    report = generate_llm_response(prompt)
-    
-    response_data = {
+def _research_payload(req: ResearchRequest, report, all_emails, all_links, dedup, packed):
+    return {
         "explanation": report,
-        "format": format_type,
+        "format": req.format if hasattr(req, 'format') else 'markdown',
         "emails": list(set(all_emails)) if "extract_emails" in req.options else [],
         "links": list(set(all_links))[:20], # Return top 20 links for PDF generation even if 'extract_links' option wasn't checked by user (frontend can filter display) allow user to see citations
+        "dedup": dedup.report(),
+        "context": context_packer.summary(packed),
     }
-    
-    return JSONResponse(response_data)
+
+@router.post("/deep_research")
+async def deep_research(req: ResearchRequest):
+    all_content, all_emails, all_links, dedup = await _gather_sources(req)
+    prompt, packed = await asyncio.to_thread(_report_prompt, req, all_content)
+    report = await generate_llm_response(prompt)
+    return JSONResponse(_research_payload(req, report, all_emails, all_links, dedup, packed))
+
+@router.post("/deep_research/stream")
+async def deep_research_stream(req: ResearchRequest):
+    """Same as /deep_research, as Server-Sent Events (see sse.py): stages, fetch progress, report tokens, then done."""
+    channel = sse.EventChannel()
+
+    async def events():
+        try:
+            async for event in channel.run(_gather_sources(req, emit=channel.emit)):
+                yield event
+            all_content, all_emails, all_links, dedup = channel.result
+            prompt, packed = await asyncio.to_thread(_report_prompt, req, all_content)
+            yield sse.format_event("stage", {"stage": "writing", "sources": len(packed["included"]),
+                                             "context": context_packer.summary(packed)})
+            parts = []
+            async for piece in stream_llm_response(prompt):
+                parts.append(piece)
+                yield sse.format_event("token", {"text": piece})
+            yield sse.format_event("done", _research_payload(req, "".join(parts), all_emails, all_links, dedup, packed))
+        except Exception as e:
+            logging.error(f"Deep research stream failed: {e}")
+            yield sse.format_event("error", {"detail": str(e)})
+
+    return sse.streaming_response(events())
 
 @router.post("/generate_pdf")
 async def generate_pdf_endpoint(req: PDFRequest):
@@ -1,14 +1,14 @@
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-import requests
 from bs4 import BeautifulSoup
+import asyncio
 import logging
 import random
 from typing import Optional, List, Dict
 import re
 from urllib.parse import urljoin, quote_plus
-import concurrent.futures
+import async_fetch
 
 router = APIRouter(prefix="/api/tools", tags=["tools"])
 
@@ -24,12 +24,12 @@ def get_random_user_agent():
 class ProductRequest(BaseModel):
     query: str
 
-def scrape_product_details(url):
+async def scrape_product_details(url):
     try:
-        response = requests.get(url, headers={'User-Agent': get_random_user_agent()}, timeout=10)
-        if response.status_code != 200: return None
+        response = await async_fetch.fetch(url, headers={'User-Agent': get_random_user_agent()})
+        if response is None or response.status_code != 200: return None
 
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = await asyncio.to_thread(BeautifulSoup, response.text, 'html.parser')
         product_data = {'url': url}
         
         # 1. OpenGraph Strategy (Most reliable for Title/Image)
@@ -57,7 +57,7 @@ def scrape_product_details(url):
             try:
                 # Reuse the research helper
                 from routers.research import generate_llm_response
-                llm_data = generate_llm_response(prompt)
+                llm_data = await generate_llm_response(prompt)
                 import json
                 if "{" in llm_data:
                     json_str = llm_data[llm_data.find('{'):llm_data.rfind('}')+1]
@@ -80,16 +80,12 @@ async def search_products(request: ProductRequest):
     # Simplified logic: 1. Search (using DDG scraper) 2. Scrape Details
     from routers.research import scrape_search_engine 
     
-    urls = scrape_search_engine(request.query + " buy online", "duckduckgo")
+    urls = await scrape_search_engine(request.query + " buy online", "duckduckgo")
     if not urls: return {"error": "No products found"}
     
-    products = []
     # Limit to top 4 for speed, as we are doing deep scraping now
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        futures = {executor.submit(scrape_product_details, url): url for url in urls[:4]}
-        for future in concurrent.futures.as_completed(futures):
-            res = future.result()
-            if res: products.append(res)
+    results = await async_fetch.map_limited(scrape_product_details, urls[:4], limit=5)
+    products = [res for res in results if res]
             
     return {"products": products}
 
@@ -116,7 +112,7 @@ async def search_jobs(
     # Get search results from DuckDuckGo
     try:
         from routers.research import scrape_search_engine
-        urls = scrape_search_engine(search_terms, "duckduckgo")
+        urls = await scrape_search_engine(search_terms, "duckduckgo")
         print(f"DEBUG: Found {len(urls)} URLs")
     except Exception as e:
         print(f"DEBUG: Search failed: {e}")
@@ -165,7 +161,7 @@ Return ONLY a JSON array with this exact structure:
 Make them realistic and varied. Use real company names that might hire for this role."""
 
         try:
-            llm_response = generate_llm_response(prompt)
+            llm_response = await generate_llm_response(prompt)
             print(f"DEBUG: LLM Response length: {len(llm_response)}")
             
             # Extract JSON from response
@@ -197,16 +193,14 @@ Make them realistic and varied. Use real company names that might hire for this
             print(f"DEBUG: LLM generation failed: {e}")
     
     # Scrape individual job postings
-    from concurrent.futures import ThreadPoolExecutor, as_completed
-    
-    def scrape_job_posting(url):
+    async def scrape_job_posting(url):
         try:
             print(f"DEBUG: Scraping job: {url[:60]}")
-            res = requests.get(url, headers={'User-Agent': get_random_user_agent()}, timeout=5)
-            if res.status_code != 200:
+            res = await async_fetch.fetch(url, headers={'User-Agent': get_random_user_agent()}, timeout=5)
+            if res is None or res.status_code != 200:
                 return None
             
-            soup = BeautifulSoup(res.text, 'html.parser')
+            soup = await asyncio.to_thread(BeautifulSoup, res.text, 'html.parser')
             
             # Extract job details
             og_title = soup.find("meta", property="og:title")
@@ -252,22 +246,14 @@ Make them realistic and varied. Use real company names that might hire for this
             print(f"DEBUG: Error scraping {url[:30]}: {str(e)[:40]}")
             return None
     
-    jobs = []
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        futures = {executor.submit(scrape_job_posting, url): url for url in filtered_urls[:10]}
-        for future in as_completed(futures):
-            try:
-                job = future.result()
-                if job:
-                    jobs.append(job)
-            except Exception as e:
-                print(f"DEBUG: Future error: {e}")
+    results = await async_fetch.map_limited(scrape_job_posting, filtered_urls[:10], limit=4)
+    jobs = [job for job in results if job]
     
     print(f"DEBUG: Returning {len(jobs)} jobs")
     return {"jobs": jobs if jobs else []}
         
 # --- AI SUITE TOOLS ---
-from routers.research import fetch_page_content, generate_llm_response, groq_client, DEFAULT_MODEL
+from routers.research import fetch_page_content, generate_llm_response, async_groq_client, DEFAULT_MODEL
 import base64
 
 # 1. Sentiment Analysis
@@ -286,7 +272,7 @@ async def analyze_sentiment(request: SentimentRequest):
     Text: "{request.text}"
     """
     try:
-        response = generate_llm_response(prompt)
+        response = await generate_llm_response(prompt)
         # Simple parsing if LLM is chatty, but Groq usually follows JSON mode if prompted well
         # For now, let's trust Llama 3 or fallback
         import json
@@ -303,12 +289,12 @@ class WebRequest(BaseModel):
 
 @router.post("/summary")
 async def summarize_website(request: WebRequest):
-    text, _, _ = fetch_page_content(request.url)
+    text, _, _ = await fetch_page_content(request.url)
     if not text:
         return {"summary": "Could not fetch website content."}
     
     prompt = f"Summarize the following website content in concise Markdown:\n\n{text[:10000]}"
-    summary = generate_llm_response(prompt)
+    summary = await generate_llm_response(prompt)
     return {"summary": summary}
 
 # 3. Image Analysis
@@ -319,7 +305,7 @@ async def analyze_image(file: UploadFile = File(...)):
     image_url = f"data:{file.content_type};base64,{base64_image}"
 
     try:
-        completion = groq_client.chat.completions.create(
+        completion = await async_groq_client.chat.completions.create(
             messages=[
                 {
                     "role": "user",
@@ -0,0 +1,138 @@
+"""Persistent SQLite cache of search-engine result URLs.
+
+Entries are keyed by (engine, normalized query), so repeated or trivially
+re-spelled searches within an engine's TTL skip the engine round trip
+entirely. Anything else that changes an engine's results (e.g. the tools
+router's " buy online" suffix) is part of the query text. TTLs are per
+engine: general web results change slowly, while engines that block
+aggressively benefit from longer reuse. Empty result lists are not stored,
+since they are usually a block page or a parse failure rather than a real
+answer.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+DEFAULT_PATH = os.getenv("SEARCH_CACHE_PATH", "search_cache.db")
+DEFAULT_TTL = 1800
+ENGINE_TTLS = {
+    "google": 1800,
+    "bing": 1800,
+    "yahoo": 1800,
+    "brave": 1800,
+    "duckduckgo": 3600,
+    "linkedin": 6 * 3600,
+}
+MAX_AGE = 2 * 24 * 3600          # Entries older than this are purged
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases and collapses whitespace so equivalent queries share an entry."""
+    return _WHITESPACE.sub(" ", query).strip().lower()
+
+
+class SearchCache:
+    """Stores the result URLs of one engine for one query."""
+
+    def __init__(self, path: str = DEFAULT_PATH, ttls: Optional[Dict[str, int]] = None,
+                 default_ttl: int = DEFAULT_TTL):
+        self.path = path
+        self.ttls = dict(ENGINE_TTLS, **(ttls or {}))
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._init_db()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self) -> None:
+        with self._conn() as conn:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(search_results)")}
+            if "filters" in columns:  # Earlier schema keyed on an always-empty filters column; it's only a cache
+                conn.execute("DROP TABLE search_results")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_results ("
+                " engine TEXT,"
+                " query TEXT,"
+                " urls TEXT,"
+                " fetched_at REAL,"
+                " PRIMARY KEY (engine, query))"
+            )
+
+    def ttl_for(self, engine: str) -> int:
+        return self.ttls.get(engine, self.default_ttl)
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+    def get(self, engine: str, query: str) -> Optional[List[str]]:
+        """Returns cached URLs if the entry is within the engine's TTL, else None."""
+        try:
+            row = self._conn().execute(
+                "SELECT urls, fetched_at FROM search_results WHERE engine = ? AND query = ?",
+                (engine, normalize_query(query))).fetchone()
+        except sqlite3.Error as e:
+            logging.error(f"Search cache read failed for {engine}/{query}: {e}")
+            row = None
+        if row is None or time.time() - row[1] >= self.ttl_for(engine):
+            self._count(False)
+            return None
+        self._count(True)
+        return json.loads(row[0])
+
+    def put(self, engine: str, query: str, urls: List[str]) -> None:
+        if not urls:
+            return
+        try:
+            with self._conn() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO search_results (engine, query, urls, fetched_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    (engine, normalize_query(query), json.dumps(list(urls)), time.time()))
+        except sqlite3.Error as e:
+            logging.error(f"Search cache write failed for {engine}/{query}: {e}")
+
+    def purge_expired(self, max_age: int = MAX_AGE) -> int:
+        """Deletes entries older than max_age seconds. Returns the number removed."""
+        try:
+            with self._conn() as conn:
+                cursor = conn.execute("DELETE FROM search_results WHERE fetched_at < ?", (time.time() - max_age,))
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            logging.error(f"Search cache purge failed: {e}")
+            return 0
+
+    def stats(self) -> Dict:
+        try:
+            on_disk = self._conn().execute("SELECT COUNT(*) FROM search_results").fetchone()[0]
+        except sqlite3.Error:
+            on_disk = None
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "disk_entries": on_disk,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 3) if lookups else 0.0,
+                "ttls": self.ttls,
+            }
@@ -0,0 +1,154 @@
+"""Hedged multi-engine search for app.py.
+
+All requested engines are queried in parallel, but the caller only waits
+until one of these happens:
+
+    * ``target_urls`` unique URLs have been collected
+    * every engine has answered or used up its own latency budget
+    * the overall ``budget`` has run out
+
+Engines still running at that point are stragglers. If a straggler has not
+started yet it is cancelled. Otherwise its result is ignored for this
+request. Its latency is still recorded when it finishes, so the per-engine
+percentiles reflect real engine behaviour and can be used to tune the
+budgets.
+"""
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent import futures
+from typing import Callable, Dict, Iterable, List, Optional
+
+DEFAULT_TARGET_URLS = 20
+DEFAULT_BUDGET = 8.0            # Seconds the caller waits for all engines together
+LATENCY_WINDOW = 200            # Samples kept per engine for percentiles
+
+
+def _percentile(sorted_samples: List[float], pct: float) -> float:
+    rank = math.ceil(pct / 100 * len(sorted_samples))  # Nearest-rank method
+    return sorted_samples[max(0, rank - 1)]
+
+
+class EngineLatency:
+    """Rolling per-engine latency samples and outcome counters."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: Dict[str, deque] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def record(self, engine: str, seconds: float, outcome: str) -> None:
+        """Outcome is 'used' (counted toward a response), 'late' (straggler) or 'error'."""
+        with self._lock:
+            self._samples.setdefault(engine, deque(maxlen=self._window)).append(seconds)
+            counts = self._counts.setdefault(engine, {"used": 0, "late": 0, "error": 0, "cancelled": 0})
+            counts[outcome] += 1
+
+    def cancelled(self, engine: str) -> None:
+        with self._lock:
+            self._counts.setdefault(engine, {"used": 0, "late": 0, "error": 0, "cancelled": 0})["cancelled"] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            snapshot = {engine: sorted(samples) for engine, samples in self._samples.items()}
+            counts = {engine: dict(c) for engine, c in self._counts.items()}
+        result = {}
+        for engine, c in counts.items():
+            samples = snapshot.get(engine, [])
+            result[engine] = dict(c, samples=len(samples))
+            if samples:
+                result[engine].update({
+                    "p50": round(_percentile(samples, 50), 3),
+                    "p90": round(_percentile(samples, 90), 3),
+                    "p99": round(_percentile(samples, 99), 3),
+                    "max": round(samples[-1], 3),
+                })
+        return result
+
+
+class SearchCoordinator:
+    """Runs one query across engines on a shared executor and returns early."""
+
+    def __init__(self, executor_getter: Callable[[], futures.Executor], target_urls: int = DEFAULT_TARGET_URLS,
+                 budget: float = DEFAULT_BUDGET, engine_budgets: Optional[Dict[str, float]] = None):
+        self._executor_getter = executor_getter
+        self.target_urls = target_urls
+        self.budget = budget
+        self.engine_budgets = dict(engine_budgets or {})
+        self.latency = EngineLatency()
+
+    def _timed(self, search_fn: Callable[[str, str], List[str]], query: str, engine: str):
+        started = time.monotonic()
+        try:
+            return search_fn(query, engine), time.monotonic() - started
+        except Exception as e:
+            elapsed = time.monotonic() - started
+            self.latency.record(engine, elapsed, "error")
+            logging.error(f"{engine} search failed after {elapsed:.1f}s: {e}")
+            return None, elapsed
+
+    def search(self, query: str, engines: Iterable[str], search_fn: Callable[[str, str], List[str]],
+               target_urls: Optional[int] = None, budget: Optional[float] = None) -> List[str]:
+        """Returns unique result URLs (first-seen order) gathered within the budgets."""
+        by_engine = self.search_by_engine(query, engines, search_fn, target_urls, budget)
+        return list(dict.fromkeys(url for urls in by_engine.values() for url in urls))
+
+    def search_by_engine(self, query: str, engines: Iterable[str], search_fn: Callable[[str, str], List[str]],
+                         target_urls: Optional[int] = None, budget: Optional[float] = None) -> Dict[str, List[str]]:
+        """Like search(), but keeps each engine's results (in rank order) separate, for ranking."""
+        target_urls = target_urls or self.target_urls
+        start = time.monotonic()
+        deadline = start + (budget or self.budget)
+        executor = self._executor_getter()
+        pending = {}
+        for engine in dict.fromkeys(engines):
+            future = executor.submit(self._timed, search_fn, query, engine)
+            engine_deadline = min(deadline, start + self.engine_budgets.get(engine, self.budget))
+            pending[future] = (engine, engine_deadline)
+
+        urls: Dict[str, None] = {}
+        by_engine: Dict[str, List[str]] = {}
+        left_behind = 0
+        while pending and len(urls) < target_urls:
+            now = time.monotonic()
+            for future, (engine, engine_deadline) in list(pending.items()):
+                if now >= engine_deadline:
+                    self._abandon(future, engine)
+                    del pending[future]
+                    left_behind += 1
+            if not pending:
+                break
+            wait_until = min(engine_deadline for _, engine_deadline in pending.values())
+            done, _ = futures.wait(pending, timeout=max(0.0, wait_until - now), return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                engine, _ = pending.pop(future)
+                results, elapsed = future.result()
+                if results is None:
+                    continue
+                self.latency.record(engine, elapsed, "used")
+                if results:
+                    by_engine[engine] = list(results)
+                urls.update(dict.fromkeys(results))
+
+        for future, (engine, _) in pending.items():
+            self._abandon(future, engine)
+        left_behind += len(pending)
+        logging.info(f"Search for '{query}' collected {len(urls)} URLs in {time.monotonic() - start:.1f}s"
+                     f" ({left_behind} engines left behind)")
+        return by_engine
+
+    def _abandon(self, future: futures.Future, engine: str) -> None:
+        if future.cancel():
+            self.latency.cancelled(engine)
+            return
+
+        def record_late(f: futures.Future):
+            results, elapsed = f.result()
+            if results is not None:
+                self.latency.record(engine, elapsed, "late")
+
+        future.add_done_callback(record_late)
+        logging.info(f"Not waiting for {engine} search")
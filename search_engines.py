@@ -0,0 +1,172 @@
+"""Search engine plugins.
+
+Each engine is a ``SearchEngine`` registered in ``ENGINES``. A plugin
+declares how to build the engine's result-page URL, which elements hold
+results (parsed with a SoupStrainer so only those elements are built), how
+to unwrap the engine's redirect links, which hosts are the engine's own
+navigation, and how far apart requests to it must be spaced.
+
+Plugins only parse; fetching is done by the caller (``polite_get`` in
+app.py, ``async_fetch`` in the routers), so both share the same parsers.
+Saved result pages for every engine live in
+benchmarks/fixtures/search_engines and are checked by
+benchmarks/bench_search_parsers.py.
+"""
+import logging
+import re
+from typing import Callable, Dict, List, Optional, Sequence
+from urllib.parse import parse_qs, quote_plus, unquote, urljoin, urlparse
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+Decoder = Callable[[str], Optional[str]]
+
+
+def fix_url(url: str) -> Optional[str]:
+    """Adds a missing scheme and drops the query string. Returns None for unusable URLs."""
+    try:
+        parsed = urlparse(url)
+        if not parsed.scheme:
+            url = "https://" + url
+            parsed = urlparse(url)  # Re-parse with scheme
+        if not parsed.netloc:
+            return None  # Invalid URL
+        return url.split("?")[0] # Removes parameters
+    except Exception:
+        return None
+
+
+_YAHOO_REDIRECT = re.compile(r"/RU=(.*?)/RK=")
+
+
+def decode_yahoo_redirect(href: str) -> Optional[str]:
+    """r.search.yahoo.com/.../RU=<quoted target>/RK=... -> target."""
+    match = _YAHOO_REDIRECT.search(href)
+    return unquote(match.group(1)) if match else None
+
+
+def decode_duckduckgo_redirect(href: str) -> Optional[str]:
+    """duckduckgo.com/l/?uddg=<quoted target>&rut=... -> target."""
+    parsed = urlparse(href)
+    if parsed.path.startswith("/l/"):
+        target = parse_qs(parsed.query).get("uddg")
+        return target[0] if target else None
+    return None
+
+
+class SearchEngine:
+    """One engine's result-page URL, result selectors and redirect handling."""
+
+    def __init__(self, name: str, url_template: str, container: str, container_class,
+                 first_link_only: bool = False, base_url: Optional[str] = None,
+                 decoders: Sequence[Decoder] = (), exclude_hosts: Sequence[str] = (),
+                 min_interval: Optional[float] = None):
+        self.name = name
+        self.url_template = url_template
+        self.container = container
+        self.container_class = container_class
+        self.first_link_only = first_link_only
+        self.base_url = base_url
+        self.decoders = tuple(decoders)
+        self.exclude_hosts = tuple(exclude_hosts)
+        self.min_interval = min_interval  # Seconds between requests to this engine; None uses the default
+        self.strainer = SoupStrainer(container, class_=container_class)
+
+    @property
+    def host(self) -> str:
+        return urlparse(self.url_template).netloc.lower()
+
+    def build_url(self, query: str) -> str:
+        return self.url_template.format(query=quote_plus(query))
+
+    def resolve(self, href: Optional[str]) -> Optional[str]:
+        """Turns a result href into a clean absolute URL, unwrapping engine redirects."""
+        if not href:
+            return None
+        if self.base_url:
+            href = urljoin(self.base_url, href)  # Make absolute
+        for decoder in self.decoders:
+            try:
+                decoded = decoder(href)
+            except Exception:
+                logging.warning(f"Error decoding {self.name} URL: {href}")
+                decoded = None
+            if decoded:
+                href = decoded
+                break
+        url = fix_url(href)
+        if url and self.exclude_hosts:
+            host = urlparse(url).netloc.lower()
+            if any(host == excluded or host.endswith("." + excluded) for excluded in self.exclude_hosts):
+                return None
+        return url
+
+    def parse(self, html: str, query: str = "") -> List[str]:
+        """Returns the unique result URLs on a result page, in page order."""
+        soup = BeautifulSoup(html, "html.parser", parse_only=self.strainer)
+        urls: Dict[str, None] = {}
+        for node in soup.find_all(self.container, class_=self.container_class):
+            anchors = [node] if node.name == "a" else node.find_all("a", href=True)
+            if self.first_link_only:
+                anchors = anchors[:1]
+            for anchor in anchors:
+                url = self.resolve(anchor.get("href"))
+                if url:
+                    urls[url] = None
+        return list(urls)
+
+
+class LinkedInPeopleSearch(SearchEngine):
+    """LinkedIn people results; 'name at company' queries keep only matching profiles."""
+
+    def parse(self, html: str, query: str = "") -> List[str]:
+        soup = BeautifulSoup(html, "html.parser", parse_only=self.strainer)
+        context = query.lower().split(" at ", 1)[1].strip() if " at " in query.lower() else None
+        urls: Dict[str, None] = {}
+        for result in soup.find_all(self.container, class_=self.container_class):
+            link_tag = result.find("a", class_="app-aware-link", href=True)
+            profile_url = self.resolve(link_tag["href"]) if link_tag else None
+            if not profile_url or "/in/" not in profile_url: # Check for profile
+                continue
+            if context:
+                name = result.find("span", class_="entity-result__title-text")
+                title_company = result.find("div", class_="entity-result__primary-subtitle")
+                combined_text = " ".join(tag.get_text(strip=True).lower() for tag in (name, title_company) if tag)
+                if context not in combined_text: # Check if the company matches
+                    continue
+            urls[profile_url] = None
+        return list(urls)
+
+
+ENGINES: Dict[str, SearchEngine] = {}
+
+
+def register(engine: SearchEngine) -> SearchEngine:
+    ENGINES[engine.name] = engine
+    return engine
+
+
+def get_engine(name: str) -> Optional[SearchEngine]:
+    return ENGINES.get(name)
+
+
+register(SearchEngine(
+    "google", "https://www.google.com/search?q={query}&num=20",
+    "div", "tF2Cxc", first_link_only=True, exclude_hosts=("google.com",), min_interval=2.0))
+register(SearchEngine(
+    "duckduckgo", "https://html.duckduckgo.com/html/?q={query}",
+    "a", "result__a", base_url="https://html.duckduckgo.com/",
+    decoders=(decode_duckduckgo_redirect,), exclude_hosts=("duckduckgo.com",)))
+register(SearchEngine(
+    "bing", "https://www.bing.com/search?q={query}",
+    "li", "b_algo", exclude_hosts=("bing.com",)))
+register(SearchEngine(
+    "yahoo", "https://search.yahoo.com/search?p={query}",
+    "div", lambda x: x and x.startswith("dd"),
+    decoders=(decode_yahoo_redirect,), exclude_hosts=("yahoo.com",)))
+register(SearchEngine(
+    "brave", "https://search.brave.com/search?q={query}",
+    "a", "result-title", exclude_hosts=("brave.com",), min_interval=1.5))
+register(LinkedInPeopleSearch(
+    "linkedin", "https://www.linkedin.com/search/results/all/?keywords={query}",
+    "div", "entity-result__item", min_interval=3.0))
@@ -0,0 +1,103 @@
+"""In-flight request coalescing ("single flight").
+
+Concurrent calls that share a key wait for one execution instead of each
+issuing the same network request. The first caller for a key runs the work;
+callers arriving while it is still running get the same result (or
+exception). Once the call finishes the key is forgotten, so later calls run
+again and rely on the page cache for reuse.
+
+``SingleFlight`` is for the threaded code in app.py, ``AsyncSingleFlight``
+for the async routers.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Counters:
+    def __init__(self):
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
+
+    def as_dict(self, in_flight: int) -> Dict:
+        return {
+            "calls": self.calls,
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": in_flight,
+            "coalesced_ratio": round(self.coalesced / self.calls, 3) if self.calls else 0.0,
+        }
+
+
+class SingleFlight:
+    """Thread-safe single flight: ``do(key, fn, *args)`` runs fn once per in-flight key."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._counters = _Counters()
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            self._counters.calls += 1
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self._counters.executed += 1
+            else:
+                self._counters.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return self._counters.as_dict(len(self._calls))
+
+
+class AsyncSingleFlight:
+    """
+    Event-loop single flight: ``await do(key, coro_fn, *args)``.
+
+    The shared work runs as its own task, so a caller that is cancelled (for
+    example by a fetch timeout) stops waiting without cancelling it for the
+    other callers.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._counters = _Counters()
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        self._counters.calls += 1
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(fn(*args, **kwargs))
+            task.add_done_callback(lambda t: self._finished(key, t))
+            self._counters.executed += 1
+        else:
+            self._counters.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved even if every caller has gone away
+
+    def stats(self) -> Dict:
+        return self._counters.as_dict(len(self._calls))
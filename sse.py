@@ -0,0 +1,87 @@
+"""Server-Sent Events helpers for the streaming endpoints.
+
+Each event is an ``event: <name>`` line plus a ``data: <json>`` line.
+Streaming endpoints send:
+
+    stage     a pipeline step started: {"stage": "searching" | "fetching" | "summarizing" | "merging" | "refining" | "writing", ...}
+    progress  fetch progress: {"stage": "fetching", "done": n, "total": m}
+    token     a piece of LLM output: {"text": ...}
+    done      the final payload, with the same fields as the non-streaming endpoint
+    error     the request failed: {"detail": ...}
+
+Pipeline code emits events through an ``EventChannel``, from the event loop
+or from a worker thread, while the response generator forwards them. During
+long silent stretches a comment line is sent every HEARTBEAT_INTERVAL seconds
+so proxies don't close the connection as idle. When the client disconnects
+the channel sets ``cancelled``; a pipeline running in a worker thread can't be
+interrupted, so it polls the flag between stages with ``check_cancelled``.
+"""
+import asyncio
+import json
+import threading
+from typing import Any, AsyncIterator, Awaitable, Optional
+
+from fastapi.responses import StreamingResponse
+
+HEARTBEAT_INTERVAL = 15.0
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # No proxy buffering (nginx)
+HEARTBEAT = ": keep-alive\n\n"
+
+
+class Cancelled(Exception):
+    """Raised by pipeline code that notices its streaming client has gone."""
+
+
+def check_cancelled(cancelled: Optional[threading.Event]) -> None:
+    if cancelled is not None and cancelled.is_set():
+        raise Cancelled("Client disconnected")
+
+
+def format_event(event: str, data: Any = None) -> str:
+    return f"event: {event}\ndata: {json.dumps(data if data is not None else {})}\n\n"
+
+
+def streaming_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+class EventChannel:
+    """Queue of formatted events for one streaming response. Must be created on the event loop."""
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self.result: Optional[Any] = None
+        self.cancelled = threading.Event()  # Set if the consumer stops before ``work`` finishes
+
+    def emit(self, event: str, data: Any = None) -> None:
+        """Queues an event. Safe to call from any thread."""
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, format_event(event, data))
+
+    async def run(self, work: Awaitable) -> AsyncIterator[str]:
+        """
+        Yields emitted events (and heartbeats) until ``work`` finishes, then
+        leaves its return value in ``result``. Exceptions from ``work`` are
+        re-raised. If the consumer stops early (client disconnected), ``work``
+        is cancelled and ``cancelled`` is set for code running in threads.
+        """
+        task = asyncio.ensure_future(work)
+        try:
+            while True:
+                getter = asyncio.ensure_future(self._queue.get())
+                done, _ = await asyncio.wait({getter, task}, timeout=HEARTBEAT_INTERVAL,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    yield getter.result()
+                    continue
+                getter.cancel()
+                if task in done:
+                    break
+                yield HEARTBEAT
+            while not self._queue.empty():
+                yield self._queue.get_nowait()
+            self.result = task.result()
+        finally:
+            if not task.done():
+                self.cancelled.set()
+                task.cancel()
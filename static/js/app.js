@@ -116,6 +116,31 @@ function logout() {
     window.location.href = '/login';
 }
 
+// Reads a Server-Sent Events response (from a POST, so EventSource can't be used),
+// calling onEvent(name, data) for each event as it arrives. Heartbeat comments are skipped.
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while(true) {
+        const { value, done } = await reader.read();
+        if(done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message';
+            let data = '';
+            for(const line of block.split('\n')) {
+                if(line.startsWith('event:')) event = line.slice(6).trim();
+                else if(line.startsWith('data:')) data += line.slice(5).trim();
+            }
+            if(data) onEvent(event, JSON.parse(data));
+        }
+    }
+}
+
 // Check for URL params to open tools automatically (e.g. redirect from Research page)
 window.addEventListener('DOMContentLoaded', () => {
     const params = new URLSearchParams(window.location.search);
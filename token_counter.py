@@ -0,0 +1,145 @@
+"""Token counting for LLM prompts.
+
+Prompt sizes used to be estimated as ``len(text) // 4``, which is off by 2x
+or more for code, URLs, numbers and non-English text. ``count_tokens``
+counts with a real BPE tokenizer where possible. The backend is picked by
+the ``TOKEN_COUNTER_BACKEND`` environment variable:
+
+    auto      tiktoken if installed, otherwise the estimator (default)
+    tiktoken  the ``TOKENIZER_ENCODING`` BPE encoding (pip install tiktoken)
+    estimate  a regex estimator that splits text the way BPE tokenizers
+              roughly do: common words are one token, long words, digit
+              runs and non-ASCII text are split, punctuation counts per character
+
+Neither backend is the exact tokenizer of Llama or Gemini, so every count is
+multiplied by a per-model ratio. The ratio starts at MODEL_RATIOS and is
+calibrated by ``observe`` with the prompt token counts the providers report
+back. After a few calls, counts track the model's own tokenizer.
+"""
+import logging
+import math
+import os
+import re
+import threading
+from typing import Dict, Optional
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+TOKEN_COUNTER_BACKEND = os.getenv("TOKEN_COUNTER_BACKEND", "auto").lower()
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+
+MODEL_RATIOS = {  # Starting model-tokens per counted token, before calibration
+    "llama-3.3-70b-versatile": 0.95,  # Llama 3's vocabulary extends cl100k, so slightly fewer tokens
+    "gemini-2.0-flash": 1.0,
+    "gemini-2.0-flash-thinking-exp-01-21": 1.0,
+}
+CALIBRATION_WEIGHT = 0.2       # How far one observation moves the ratio (exponential moving average)
+MIN_CALIBRATION_TOKENS = 200   # Shorter prompts are dominated by chat-template overhead
+MIN_RATIO, MAX_RATIO = 0.5, 2.0
+
+LONG_WORD = 8                  # Estimator: longer ASCII words are split into subwords
+CHARS_PER_SUBWORD = 4
+DIGITS_PER_TOKEN = 3           # Llama 3 and cl100k split numbers into groups of up to three digits
+BYTES_PER_TOKEN = 3            # Non-ASCII words: about one token per CJK character or 1-2 accented letters
+
+_PIECE = re.compile(r"[A-Za-z]+|\d+|[^\W\d_]+|\S", re.UNICODE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Counts tokens without a tokenizer."""
+    tokens = 0
+    for piece in _PIECE.findall(text):
+        if piece.isascii():
+            if piece.isalpha():
+                tokens += 1 + max(0, len(piece) - LONG_WORD) // CHARS_PER_SUBWORD
+            elif piece.isdigit():
+                tokens += math.ceil(len(piece) / DIGITS_PER_TOKEN)
+            else:
+                tokens += 1
+        else:
+            tokens += math.ceil(len(piece.encode("utf-8")) / BYTES_PER_TOKEN)
+    return tokens
+
+
+def _load_encoding():
+    if TOKEN_COUNTER_BACKEND == "estimate" or tiktoken is None:
+        if TOKEN_COUNTER_BACKEND == "tiktoken":
+            logging.warning("TOKEN_COUNTER_BACKEND=tiktoken but tiktoken is not installed, estimating instead")
+        return None
+    try:
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:  # The BPE file is downloaded on first use and may be unavailable offline
+        logging.warning(f"Could not load tokenizer {TOKENIZER_ENCODING}, estimating instead: {e}")
+        return None
+
+
+class TokenCounter:
+    """Counts tokens per model and calibrates the count against reported usage."""
+
+    def __init__(self, ratios: Optional[Dict[str, float]] = None):
+        self._encoding = _load_encoding()
+        self.backend = "tiktoken" if self._encoding is not None else "estimate"
+        self._ratios = dict(MODEL_RATIOS if ratios is None else ratios)
+        self._observations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def raw_count(self, text: str) -> int:
+        """Tokens as counted by the backend, before the model ratio."""
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return estimate_tokens(text)
+
+    def ratio(self, model: Optional[str]) -> float:
+        with self._lock:
+            return self._ratios.get(model, 1.0)
+
+    def count(self, text: str, model: Optional[str] = None) -> int:
+        return math.ceil(self.raw_count(text) * self.ratio(model))
+
+    def observe(self, model: str, prompt: str, actual_tokens: Optional[int]) -> None:
+        """Moves the model's ratio towards the provider's reported prompt token count."""
+        if not actual_tokens:
+            return
+        raw = self.raw_count(prompt)
+        if raw < MIN_CALIBRATION_TOKENS:
+            return
+        observed = min(MAX_RATIO, max(MIN_RATIO, actual_tokens / raw))
+        with self._lock:
+            current = self._ratios.get(model, 1.0)
+            self._ratios[model] = current + CALIBRATION_WEIGHT * (observed - current)
+            self._observations[model] = self._observations.get(model, 0) + 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "encoding": TOKENIZER_ENCODING if self._encoding is not None else None,
+                "models": {model: {"ratio": round(ratio, 3), "observations": self._observations.get(model, 0)}
+                           for model, ratio in self._ratios.items()},
+            }
+
+
+_counter: Optional[TokenCounter] = None
+_counter_lock = threading.Lock()
+
+
+def get_counter() -> TokenCounter:
+    global _counter
+    if _counter is None:
+        with _counter_lock:
+            if _counter is None:
+                _counter = TokenCounter()
+    return _counter
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    return get_counter().count(text, model)
+
+
+def observe(model: str, prompt: str, actual_tokens: Optional[int]) -> None:
+    get_counter().observe(model, prompt, actual_tokens)
@@ -0,0 +1,105 @@
+"""Pre-fetch ranking of search-result URLs.
+
+Candidates from all engines are scored before anything is downloaded, and
+only the top K are fetched. A URL's score adds up:
+
+    position   sum over engines of 1 / (RANK_OFFSET + rank): higher-ranked and
+               cross-engine results score more (reciprocal rank fusion)
+    domain     +DOMAIN_BONUS for reference/primary sources, -DOMAIN_PENALTY
+               for social, aggregator and content-farm hosts
+    pattern    -PATTERN_PENALTY for each low-value URL shape (login pages,
+               tag/search listings, binary files, ...)
+
+At most MAX_PER_DOMAIN URLs from one host make the top K, so a single site
+cannot crowd out the others.
+"""
+import re
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+from urllib.parse import urlparse
+
+import page_download
+from page_cache import canonical_url
+
+RANK_OFFSET = 5
+DOMAIN_BONUS = 0.1
+DOMAIN_PENALTY = 0.15
+PATTERN_PENALTY = 0.1
+MAX_PER_DOMAIN = 2
+
+QUALITY_DOMAINS = (
+    "wikipedia.org", "britannica.com", "arxiv.org", "nature.com", "science.org", "sciencedirect.com",
+    "springer.com", "ieee.org", "acm.org", "nih.gov", "who.int", "reuters.com", "apnews.com",
+    "bbc.co.uk", "bbc.com", "github.com", "stackoverflow.com", "docs.python.org", "mozilla.org",
+)
+QUALITY_SUFFIXES = (".gov", ".edu", ".ac.uk", ".int")
+LOW_QUALITY_DOMAINS = (
+    "pinterest.com", "facebook.com", "instagram.com", "tiktok.com", "x.com", "twitter.com",
+    "quora.com", "scribd.com", "slideshare.net", "coursehero.com", "answers.com",
+)
+PENALTY_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r"/(login|signin|sign-in|signup|sign-up|register|account|cart|checkout)\b",
+    r"/(tag|tags|category|categories|search|archive|author)/",
+    r"/(page)/\d+",
+    r"/(amp)(/|$)",
+    r"/(privacy|terms|cookie|cookies|contact|about-us)(-policy)?/?$",
+)]
+
+
+def _matches(host: str, domains: Sequence[str]) -> bool:
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+
+def domain_score(host: str) -> float:
+    host = host.lower().split(":")[0]
+    if _matches(host, QUALITY_DOMAINS) or host.endswith(QUALITY_SUFFIXES):
+        return DOMAIN_BONUS
+    if _matches(host, LOW_QUALITY_DOMAINS):
+        return -DOMAIN_PENALTY
+    return 0.0
+
+
+def pattern_score(url: str) -> float:
+    path = urlparse(url).path
+    penalty = sum(PATTERN_PENALTY for pattern in PENALTY_PATTERNS if pattern.search(path))
+    if page_download.looks_binary_url(url):
+        penalty += PATTERN_PENALTY
+    return -penalty
+
+
+def score_urls(engine_results: Mapping[str, Sequence[str]]) -> List[Dict]:
+    """Scores every candidate URL; returns [{'url', 'score', 'engines'}] best first."""
+    candidates: Dict[str, Dict] = {}
+    for engine, urls in engine_results.items():
+        for rank, url in enumerate(urls):
+            key = canonical_url(url)
+            candidate = candidates.setdefault(key, {"url": url, "position": 0.0, "engines": []})
+            if engine in candidate["engines"]:
+                continue  # Same page listed twice by one engine
+            candidate["engines"].append(engine)
+            candidate["position"] += 1.0 / (RANK_OFFSET + rank)
+
+    scored = []
+    for key, candidate in candidates.items():
+        score = candidate["position"] + domain_score(urlparse(key).netloc) + pattern_score(candidate["url"])
+        scored.append({"url": candidate["url"], "score": round(score, 4), "engines": candidate["engines"]})
+    scored.sort(key=lambda c: c["score"], reverse=True)
+    return scored
+
+
+def rank_urls(engine_results: Mapping[str, Sequence[str]], top_k: Optional[int] = None,
+              max_per_domain: int = MAX_PER_DOMAIN, exclude: Iterable[str] = ()) -> List[str]:
+    """Returns the best ``top_k`` URLs to fetch (all of them if top_k is None), at most max_per_domain per host."""
+    excluded = {canonical_url(url) for url in exclude}
+    per_domain: Dict[str, int] = {}
+    ranked = []
+    for candidate in score_urls(engine_results):
+        if canonical_url(candidate["url"]) in excluded:
+            continue
+        host = urlparse(candidate["url"]).netloc.lower()
+        if per_domain.get(host, 0) >= max_per_domain:
+            continue
+        per_domain[host] = per_domain.get(host, 0) + 1
+        ranked.append(candidate["url"])
+        if top_k is not None and len(ranked) >= top_k:
+            break
+    return ranked